@@ -3,36 +3,157 @@ from django.contrib.auth.hashers import make_password
 from django.utils.html import format_html
 from django.utils import timezone
 from django.contrib.admin.sites import AdminSite
+from django.core.paginator import Paginator
+from django.db import connections
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.urls import reverse
+from django.utils.functional import cached_property
 from datetime import timedelta
 
 from .models import (
     Department, Employee, Task, Attendance, Role, BreakSession,
-    Announcement, Meeting, ITReport
+    Announcement, Meeting, ITReport, PunchDevice, PunchEvent, ShiftPolicy, Holiday
 )
-
-
-def create_daily_absent_records():
-    today = timezone.localdate()
-
-    if today.weekday() in (5, 6):
-        return
-
-    active_employees = Employee.objects.filter(is_active=True)
-
-    for employee in active_employees:
-        Attendance.objects.get_or_create(
-            employee=employee,
-            date=today,
-            defaults={
-                "status": "Absent",
-                "late_by": timedelta(),
-                "total_hours": timedelta(),
-                "break_time": timedelta(),
-                "net_working_hours": timedelta(),
-                "is_on_break": False,
-                "break_started_at": None,
+from .attendance import create_daily_absent_records
+from .counters import company_counters
+from .presence import presence_changed
+from .routers import is_pinned, with_replica_fallback
+
+
+# -----------------------------
+# LARGE TABLE HELPERS
+# -----------------------------
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that reads the planner's row estimate for unfiltered
+    changelists on PostgreSQL instead of running COUNT(*) over the table.
+    Filtered querysets (and other databases) still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        query = getattr(qs, "query", None)
+        if query is not None and not query.where:
+            connection = connections[qs.db]
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [qs.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] > 0:
+                    return int(row[0])
+        return super().count
+
+
+class ReplicaChangeListMixin:
+    """
+    Read changelist pages from the read replica. The response is rendered
+    inside the block so the lazily evaluated result list is read there too.
+    Actions (POST) and browsers that just wrote stay on the primary, and a
+    failing replica falls back to it.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET" or is_pinned(request):
+            return super().changelist_view(request, extra_context)
+
+        def render():
+            response = super(ReplicaChangeListMixin, self).changelist_view(request, extra_context)
+            if hasattr(response, "render"):
+                response.render()
+            return response
+
+        return with_replica_fallback(render)
+
+
+class EmployeeListFilter(admin.SimpleListFilter):
+    """
+    Employee filter with the admin's autocomplete box (the endpoint behind
+    autocomplete_fields) instead of the related-field filter, which
+    renders every employee into the sidebar. Needs EmployeeFilterMedia on
+    the model admin for its scripts.
+    """
+    title = "Employee"
+    parameter_name = "employee"
+    template = "admin/employee_autocomplete_filter.html"
+    lookup_path = "employee_id"
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.admin_site_name = model_admin.admin_site.name
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        # the choices come from the autocomplete endpoint
+        return ()
+
+    def choices(self, changelist):
+        value = self.value()
+        employee = Employee.objects.filter(pk=value).first() if value and value.isdigit() else None
+        yield {
+            "value": value or "",
+            "label": str(employee) if employee else "",
+            "parameter_name": self.parameter_name,
+            "other_params": [(key, item) for key, item in changelist.params.items() if key != self.parameter_name],
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+            "autocomplete_url": reverse("admin:autocomplete", current_app=self.admin_site_name),
+        }
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        if not value.isdigit():
+            raise IncorrectLookupParameters(f"Unknown employee {value!r}.")
+        return queryset.filter(**{self.lookup_path: value})
+
+
+class BreakEmployeeListFilter(EmployeeListFilter):
+    lookup_path = "attendance__employee_id"
+
+
+class EmployeeFilterMedia:
+    """Scripts and styles for EmployeeListFilter's autocomplete box."""
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(Attendance._meta.get_field("employee"), self.admin_site).media
+
+
+class CurrentMonthListFilter(admin.SimpleListFilter):
+    """
+    Opens the changelist on the current month, so the list and the date
+    hierarchy work on an indexed date range instead of the whole table.
+    The choice lives in the query string: "All time" (?period=all) lifts
+    it, and any date filter or hierarchy drill-down replaces it.
+    """
+    title = "Period"
+    parameter_name = "period"
+
+    def lookups(self, request, model_admin):
+        return (("month", "This month"), ("all", "All time"))
+
+    def choices(self, changelist):
+        current = self.value() or "month"
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": current == lookup,
+                "query_string": changelist.get_query_string({self.parameter_name: lookup}),
+                "display": title,
             }
-        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "all" or any(key.startswith("date__") for key in request.GET):
+            return queryset
+        first = timezone.localdate().replace(day=1)
+        following = (first + timedelta(days=32)).replace(day=1)
+        return queryset.filter(date__gte=first, date__lt=following)
 
 
 @admin.register(Department)
@@ -48,11 +169,34 @@ class RoleAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+@admin.register(ShiftPolicy)
+class ShiftPolicyAdmin(admin.ModelAdmin):
+    list_display = ('name', 'department', 'role', 'start_time', 'grace_time', 'min_hours', 'break_limit', 'working_days')
+    list_select_related = ('department', 'role')
+
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name', 'department')
+    list_filter = ('department',)
+    date_hierarchy = 'date'
+    search_fields = ('name',)
+
+
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
     list_display = ('employee_id', 'department', 'role', 'phone', 'is_active')
     list_filter = ('department', 'role', 'is_active')
     search_fields = ('employee_id', 'phone')
+    # the employee autocomplete pages through this
+    ordering = ('employee_id',)
+    actions = ['revoke_calendar_links']
+
+    @admin.action(description="Revoke calendar feed links")
+    def revoke_calendar_links(self, request, queryset):
+        for employee in queryset:
+            employee.rotate_calendar_key()
+        self.message_user(request, f"Calendar links revoked for {len(queryset)} employee(s).")
 
     def save_model(self, request, obj, form, change):
         if obj.password and not obj.password.startswith('pbkdf2_sha256$'):
@@ -66,7 +210,7 @@ class TaskAdmin(admin.ModelAdmin):
 
 
 @admin.register(Attendance)
-class AttendanceAdmin(admin.ModelAdmin):
+class AttendanceAdmin(EmployeeFilterMedia, ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = (
         'employee_id',
         'date',
@@ -77,10 +221,27 @@ class AttendanceAdmin(admin.ModelAdmin):
         'formatted_break',
         'formatted_net_work',
     )
-    list_filter = ('status', 'date', 'employee')
+    list_filter = (CurrentMonthListFilter, 'status', 'date', EmployeeListFilter)
+    list_select_related = ('employee',)
     search_fields = ('employee__employee_id',)
+    autocomplete_fields = ('employee',)
     date_hierarchy = 'date'
     ordering = ('-date',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # the live presence boards only hear about writes that publish()
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        presence_changed()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        presence_changed()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        presence_changed()
 
     def employee_id(self, obj):
         return obj.employee.employee_id
@@ -128,10 +289,36 @@ class AttendanceAdmin(admin.ModelAdmin):
 
 
 @admin.register(BreakSession)
-class BreakSessionAdmin(admin.ModelAdmin):
+class BreakSessionAdmin(EmployeeFilterMedia, ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ("attendance", "start_at", "end_at", "duration")
-    list_filter = ("start_at", "end_at")
+    list_filter = ("start_at", "end_at", BreakEmployeeListFilter)
+    list_select_related = ("attendance__employee",)
     search_fields = ("attendance__employee__employee_id",)
+    autocomplete_fields = ("attendance",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(PunchDevice)
+class PunchDeviceAdmin(admin.ModelAdmin):
+    list_display = ("device_id", "name", "is_active")
+    list_filter = ("is_active",)
+    search_fields = ("device_id", "name")
+
+    def save_model(self, request, obj, form, change):
+        if obj.api_key and not obj.api_key.startswith('pbkdf2_sha256$'):
+            obj.set_api_key(obj.api_key)
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(PunchEvent)
+class PunchEventAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ("idempotency_key", "employee", "kind", "occurred_at", "device", "received_at")
+    list_filter = ("kind", "work_date", "device")
+    list_select_related = ("employee", "device")
+    search_fields = ("idempotency_key", "employee__employee_id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Announcement)
@@ -156,22 +343,29 @@ class ITReportAdmin(admin.ModelAdmin):
 
 
 _old_each_context = AdminSite.each_context
+_old_index = AdminSite.index
 
-def _new_each_context(self, request):
+def _new_index(self, request, extra_context=None):
+    # not in each_context: that also runs for the changelists, which read
+    # from the replica and are retried on the primary if it fails
     create_daily_absent_records()
+    return _old_index(self, request, extra_context)
 
+def _new_each_context(self, request):
     ctx = _old_each_context(self, request)
     today = timezone.localdate()
 
     ctx["today_date"] = today.isoformat()
     ctx["card_total_employees"] = Employee.objects.filter(is_active=True).count()
-    ctx["card_present_today"] = Attendance.objects.filter(date=today, status="Present").count()
+    counters = company_counters(today)
+    ctx["card_present_today"] = counters["present"]
     ctx["card_tasks_completed_today"] = Task.objects.filter(
         assigned_date=today,
         is_completed=True
     ).count()
-    ctx["card_absent_today"] = Attendance.objects.filter(date=today, status="Absent").count()
+    ctx["card_absent_today"] = counters["absent"]
     ctx["card_open_it_reports"] = ITReport.objects.filter(status__in=["Open", "In Progress"]).count()
     return ctx
 
-AdminSite.each_context = _new_each_context
\ No newline at end of file
+AdminSite.each_context = _new_each_context
+AdminSite.index = _new_index
\ No newline at end of file
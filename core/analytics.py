@@ -0,0 +1,185 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import date, timedelta
+from itertools import accumulate, compress, repeat
+from operator import add, ge, mul
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import bump_version, versioned_key
+from .models import Attendance, Department, Employee
+
+
+VERSION_NAME = "analytics"
+ROLLING_DAYS = 30
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+NO_DEPARTMENT = 0
+
+
+# -----------------------------
+# COLUMNS
+# -----------------------------
+# Attendance is read as plain tuples and transposed into typed arrays, one
+# per column. Everything below works on whole columns with C-level helpers
+# (map, compress, Counter, accumulate, sort + bisect) instead of looping
+# over model instances.
+
+def _seconds(td):
+    return int(td.total_seconds()) if td else 0
+
+
+def _weekday(ordinal):
+    return (ordinal - 1) % 7
+
+
+class Columns:
+    __slots__ = ("day", "employee", "department", "late", "net", "breaks")
+
+    def __init__(self, rows=()):
+        days, employees, departments, late, net, breaks = zip(*rows) if rows else ((),) * 6
+        self.day = array("l", map(date.toordinal, days))
+        self.employee = array("q", employees)
+        self.department = array("l", (d or NO_DEPARTMENT for d in departments))
+        self.late = array("l", map(_seconds, late))
+        self.net = array("l", map(_seconds, net))
+        self.breaks = array("l", map(_seconds, breaks))
+
+    def __len__(self):
+        return len(self.day)
+
+    def since(self, first):
+        """Columns of the rows on or after `first`."""
+        subset = Columns()
+        selectors = array("b", map(ge, self.day, repeat(first.toordinal())))
+        for name in self.__slots__:
+            setattr(subset, name, array(getattr(self, name).typecode, compress(getattr(self, name), selectors)))
+        return subset
+
+
+def load_columns(start, end):
+    rows = list(
+        Attendance.objects.filter(date__range=(start, end), status="Present", login_time__isnull=False)
+        .order_by()
+        .values_list("date", "employee_id", "employee__department_id", "late_by", "net_working_hours", "break_time")
+    )
+    return Columns(rows)
+
+
+def group_sums(keys, values):
+    """{key: (count, total)} from one sort and one prefix-sum pass."""
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    sorted_keys = list(map(keys.__getitem__, order))
+    prefix = [0, *accumulate(map(values.__getitem__, order))]
+    result = {}
+    for key in dict.fromkeys(sorted_keys):
+        lo, hi = bisect_left(sorted_keys, key), bisect_right(sorted_keys, key)
+        result[key] = (hi - lo, prefix[hi] - prefix[lo])
+    return result
+
+
+# -----------------------------
+# METRICS
+# -----------------------------
+def lateness_heatmap(cols):
+    """Average late minutes and late share per department and weekday."""
+    keys = array("l", map(add, map(mul, cols.department, repeat(7)), map(_weekday, cols.day)))
+    late_flags = array("b", map(bool, cols.late))
+    sums = group_sums(keys, cols.late)
+    late_counts = Counter(compress(keys, late_flags))
+
+    names = dict(Department.objects.values_list("id", "name"))
+    names[NO_DEPARTMENT] = "No department"
+    heatmap = []
+    for department_id in sorted({key // 7 for key in sums}, key=lambda pk: names.get(pk, "")):
+        cells = []
+        for weekday in range(7):
+            count, total = sums.get(department_id * 7 + weekday, (0, 0))
+            cells.append({
+                "days": count,
+                "avg_late_minutes": round(total / count / 60, 1) if count else None,
+                "late_rate": round(100 * late_counts[department_id * 7 + weekday] / count) if count else None,
+            })
+        heatmap.append({"department": names.get(department_id, department_id), "cells": cells})
+    return heatmap
+
+
+def rolling_averages(cols, start, end, window=ROLLING_DAYS):
+    """
+    Rolling `window`-day averages of net working hours and late minutes per
+    attended day, for each date from start to end. `cols` must reach back
+    window - 1 days before start.
+    """
+    first = start.toordinal() - window + 1
+    span = end.toordinal() - first + 1
+
+    def dense(values):
+        counts, totals = [0] * span, [0] * span
+        for ordinal, (count, total) in group_sums(cols.day, values).items():
+            counts[ordinal - first] = count
+            totals[ordinal - first] = total
+        return [0, *accumulate(counts)], [0, *accumulate(totals)]
+
+    counts, net_totals = dense(cols.net)
+    _, late_totals = dense(cols.late)
+
+    labels, net_hours, late_minutes = [], [], []
+    for i in range(window, span + 1):
+        n = counts[i] - counts[i - window]
+        labels.append(date.fromordinal(first + i - 1).strftime("%d %b"))
+        net_hours.append(round((net_totals[i] - net_totals[i - window]) / n / 3600, 2) if n else None)
+        late_minutes.append(round((late_totals[i] - late_totals[i - window]) / n / 60, 1) if n else None)
+    return {"labels": labels, "net_hours": net_hours, "late_minutes": late_minutes}
+
+
+def chronic_late(cols, limit=10, min_days=None):
+    """Employees late most often, by share of attended days."""
+    min_days = settings.ANALYTICS_MIN_DAYS if min_days is None else min_days
+    attended = Counter(cols.employee)
+    late = Counter(compress(cols.employee, map(bool, cols.late)))
+    late_time = group_sums(cols.employee, cols.late)
+
+    ranked = sorted(
+        (pk for pk, days in attended.items() if days >= min_days and late[pk]),
+        key=lambda pk: (late[pk] / attended[pk], late_time[pk][1]),
+        reverse=True,
+    )[:limit]
+
+    employees = Employee.objects.select_related("department").in_bulk(ranked)
+    return [
+        {
+            "employee_id": employees[pk].employee_id,
+            "department": employees[pk].department.name if employees[pk].department else "",
+            "late_days": late[pk],
+            "days": attended[pk],
+            "late_rate": round(100 * late[pk] / attended[pk]),
+            "avg_late_minutes": round(late_time[pk][1] / late[pk] / 60, 1),
+        }
+        for pk in ranked
+        if pk in employees
+    ]
+
+
+# -----------------------------
+# CACHED REPORT
+# -----------------------------
+def compute_report(start, end):
+    cols = load_columns(start - timedelta(days=ROLLING_DAYS - 1), end)
+    period = cols.since(start)
+    return {
+        "rows": len(period),
+        "heatmap": lateness_heatmap(period),
+        "rolling": rolling_averages(cols, start, end),
+        "chronic_late": chronic_late(period),
+    }
+
+
+def analytics_report(start, end):
+    """The analytics of a period, cached per (start, end)."""
+    key = versioned_key("analytics", VERSION_NAME, extra=(start.isoformat(), end.isoformat()))
+    return cache.get_or_set(key, lambda: compute_report(start, end), timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+
+
+def invalidate_analytics():
+    bump_version(VERSION_NAME)
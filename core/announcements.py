@@ -0,0 +1,211 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .caching import bump_version, versioned_key
+from .models import Announcement, AnnouncementReceipt, Employee
+
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+GLOBAL_VERSION = "announcements:global"
+
+
+def department_version(department_id):
+    return f"announcements:dept:{department_id}"
+
+
+def unexpired(today=None):
+    today = today or timezone.localdate()
+    return Q(expiry_date__isnull=True) | Q(expiry_date__gte=today)
+
+
+def active_announcements(today=None):
+    return Announcement.objects.filter(unexpired(today), is_active=True).select_related("department", "created_by")
+
+
+# -----------------------------
+# CACHED FEEDS
+# -----------------------------
+def announcement_feed(department_id):
+    """
+    Active, unexpired announcements for everyone plus those of the given
+    department, newest first. Cached per department and day, and dropped
+    whenever an announcement of that department or a global one changes.
+    """
+    today = timezone.localdate()
+    versions = [GLOBAL_VERSION]
+    if department_id:
+        versions.append(department_version(department_id))
+    key = versioned_key("announcement_feed", *versions, extra=(department_id or 0, today.isoformat()))
+
+    feed = cache.get(key)
+    if feed is None:
+        audience = Q(is_for_all=True)
+        if department_id:
+            audience |= Q(department_id=department_id)
+        feed = list(active_announcements(today).filter(audience).order_by("-created_at"))
+        cache.set(key, feed, settings.ANNOUNCEMENT_FEED_TIMEOUT)
+    return feed
+
+
+def global_announcement_feed(limit=5):
+    """Latest active announcements across all departments (management view)."""
+    today = timezone.localdate()
+    key = versioned_key("announcement_feed_all", "announcements:any", extra=(limit, today.isoformat()))
+
+    feed = cache.get(key)
+    if feed is None:
+        feed = list(active_announcements(today).order_by("-created_at")[:limit])
+        cache.set(key, feed, settings.ANNOUNCEMENT_FEED_TIMEOUT)
+    return feed
+
+
+def invalidate_announcement_feeds(department_ids=(), is_for_all=False):
+    bump_version("announcements:any")
+    if is_for_all:
+        bump_version(GLOBAL_VERSION)
+    for department_id in set(department_ids):
+        if department_id:
+            bump_version(department_version(department_id))
+
+
+# -----------------------------
+# EXPIRY SWEEPER
+# -----------------------------
+def deactivate_expired_announcements(today=None):
+    """Flip is_active off for expired rows with one UPDATE. Returns the count."""
+    today = today or timezone.localdate()
+    expired = Announcement.objects.filter(is_active=True, expiry_date__lt=today)
+
+    affected = list(expired.values_list("id", "department_id", "is_for_all"))
+    with transaction.atomic():
+        retract_unread([pk for pk, _, _ in affected])
+        count = expired.update(is_active=False)
+    if count:
+        invalidate_announcement_feeds(
+            department_ids=[dept for _, dept, _ in affected],
+            is_for_all=any(for_all for _, _, for_all in affected),
+        )
+    return count
+
+
+# -----------------------------
+# INBOX / READ RECEIPTS
+# -----------------------------
+def _unread_count(announcement_filter):
+    """Subquery counting the outer employee's unread receipts matching the filter."""
+    return Coalesce(
+        Subquery(
+            AnnouncementReceipt.objects.filter(announcement_filter, employee=OuterRef("pk"), read_at__isnull=True)
+            .order_by()
+            .values("employee")
+            .annotate(n=Count("id"))
+            .values("n"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def recipients(announcement):
+    """Active employees the announcement is addressed to."""
+    employees = Employee.objects.filter(is_active=True)
+    if announcement.is_for_all:
+        return employees
+    if announcement.department_id is None:
+        # targeted, but at no department: nobody
+        return employees.none()
+    return employees.filter(department_id=announcement.department_id)
+
+
+def sync_announcement_receipts(announcement, was_active):
+    """
+    Bring the receipts and unread counters in line with a saved
+    announcement, whichever way it was written (views, admin, shell).
+    Only active announcements count as unread; expiry is left to the
+    sweeper, which retracts them when it switches them off.
+
+    New recipients get an unread receipt, FAN_OUT_BATCH_SIZE employees per
+    INSERT / UPDATE; receipts of employees no longer addressed are removed.
+    Returns the number of receipts created.
+    """
+    receipts = AnnouncementReceipt.objects.filter(announcement=announcement)
+    with transaction.atomic():
+        if not announcement.is_active:
+            if was_active:
+                retract_unread([announcement.pk])
+            return 0
+
+        audience = recipients(announcement)
+        stale = receipts.exclude(employee__in=audience)
+        if was_active:
+            Employee.objects.filter(
+                id__in=stale.filter(read_at__isnull=True).values("employee_id"),
+            ).update(unread_announcements=Greatest(F("unread_announcements") - 1, Value(0)))
+        stale.delete()
+        if not was_active:
+            # reactivated: what is still unread counts again
+            Employee.objects.filter(
+                id__in=receipts.filter(read_at__isnull=True).values("employee_id"),
+            ).update(unread_announcements=F("unread_announcements") + 1)
+
+        employee_ids = list(audience.exclude(id__in=receipts.values("employee_id")).values_list("id", flat=True))
+        for offset in range(0, len(employee_ids), FAN_OUT_BATCH_SIZE):
+            batch = employee_ids[offset:offset + FAN_OUT_BATCH_SIZE]
+            AnnouncementReceipt.objects.bulk_create(
+                [AnnouncementReceipt(announcement=announcement, employee_id=pk) for pk in batch],
+                ignore_conflicts=True,
+            )
+            Employee.objects.filter(id__in=batch).update(unread_announcements=F("unread_announcements") + 1)
+    return len(employee_ids)
+
+
+def mark_announcements_read(employee, announcement_ids):
+    with transaction.atomic():
+        count = AnnouncementReceipt.objects.filter(
+            employee=employee,
+            announcement_id__in=announcement_ids,
+            read_at__isnull=True,
+        ).update(read_at=timezone.now())
+        if count:
+            Employee.objects.filter(pk=employee.pk).update(
+                unread_announcements=Greatest(F("unread_announcements") - count, Value(0))
+            )
+    return count
+
+
+def retract_unread(announcement_ids):
+    """Take announcements that are going away out of everyone's unread counter."""
+    if not announcement_ids:
+        return 0
+    in_scope = Q(announcement_id__in=announcement_ids)
+    return Employee.objects.filter(
+        id__in=AnnouncementReceipt.objects.filter(in_scope, read_at__isnull=True).values("employee_id"),
+    ).update(
+        unread_announcements=Greatest(F("unread_announcements") - _unread_count(in_scope), Value(0))
+    )
+
+
+def rebuild_unread_counts():
+    """Recompute every counter from the receipts of currently visible announcements."""
+    today = timezone.localdate()
+    visible = Q(announcement__is_active=True) & (
+        Q(announcement__expiry_date__isnull=True) | Q(announcement__expiry_date__gte=today)
+    )
+    return Employee.objects.update(unread_announcements=_unread_count(visible))
+
+
+def announcement_read_stats(announcement_ids):
+    """{announcement_id: (read, recipients)} from one aggregate query."""
+    rows = (
+        AnnouncementReceipt.objects.filter(announcement_id__in=announcement_ids)
+        .values("announcement_id")
+        .annotate(recipients=Count("id"), read=Count("id", filter=Q(read_at__isnull=False)))
+        .order_by()
+    )
+    return {row["announcement_id"]: (row["read"], row["recipients"]) for row in rows}
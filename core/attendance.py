@@ -0,0 +1,286 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import (
+    Case, DateTimeField, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, TimeField, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .analytics import invalidate_analytics
+from .counters import rebuild_daily_counters
+from .dashboard import invalidate_dashboards
+from .models import Attendance, BreakSession, Employee
+from .policies import policy_groups
+from .presence import presence_changed
+from .presence_bitmaps import mark_days
+from .routers import primary_reads
+from .workdays import working_employees
+
+
+ZERO = timedelta()
+
+RECOMPUTED_FIELDS = ("total_hours", "break_time", "net_working_hours", "late_by")
+
+
+def auto_logout_time():
+    return time.fromisoformat(settings.ATTENDANCE_AUTO_LOGOUT_TIME)
+
+
+def closed_break_total(attendance_ref="pk"):
+    """Subquery summing the closed break durations of the outer attendance row."""
+    return Coalesce(
+        Subquery(
+            BreakSession.objects.filter(attendance=OuterRef(attendance_ref), end_at__isnull=False)
+            .order_by()
+            .values("attendance")
+            .annotate(total=Sum("duration"))
+            .values("total"),
+            output_field=DurationField(),
+        ),
+        Value(ZERO),
+    )
+
+
+# -----------------------------
+# DAILY ABSENT ROWS
+# -----------------------------
+def create_daily_absent_records(day=None):
+    """
+    Create an Absent row for `day` (today) for every employee whose shift
+    policy makes it a working day, who has no holiday and no row yet. Runs
+    on most page loads, so once the rows exist this is one query; missing
+    rows are inserted in bulk, and their counters, presence bitmaps and
+    dashboards are updated once for the batch. Returns the rows created.
+
+    Always reads from the primary, whatever view it is called from.
+    """
+    with primary_reads():
+        return _create_daily_absent_records(day or timezone.localdate())
+
+
+def _create_daily_absent_records(day):
+    missing = list(working_employees(day).exclude(attendance__date=day).values_list("id", "department_id"))
+    if not missing:
+        return 0
+
+    employee_ids = [pk for pk, _ in missing]
+    Attendance.objects.bulk_create(
+        [
+            Attendance(
+                employee_id=pk, date=day, status="Absent",
+                late_by=ZERO, total_hours=ZERO, break_time=ZERO, net_working_hours=ZERO,
+            )
+            for pk in employee_ids
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    # a login may have created some of the rows meanwhile, so the day is
+    # recounted and the bitmaps take the stored statuses
+    rebuild_daily_counters([day], department_ids={department_id for _, department_id in missing})
+    mark_days(Attendance.objects.filter(employee_id__in=employee_ids, date=day).values_list("employee_id", "date", "status"))
+    invalidate_dashboards(employee_ids)
+    transaction.on_commit(presence_changed)
+    return len(missing)
+
+
+# -----------------------------
+# OPTIMISTIC WRITES
+# -----------------------------
+class AttendanceConflict(Exception):
+    """The row kept changing underneath for every allowed attempt."""
+
+
+def cas_save(attendance, fields):
+    """
+    Write `fields` only if the row still carries the version it was read
+    with, moving it to the next version. Returns False when another
+    request wrote the row first. Sends post_save like
+    save(update_fields=...) would.
+    """
+    values = {name: getattr(attendance, name) for name in fields}
+    updated = Attendance.objects.filter(pk=attendance.pk, version=attendance.version).update(
+        version=F("version") + 1, **values,
+    )
+    if not updated:
+        return False
+    attendance.version += 1
+    post_save.send(
+        sender=Attendance, instance=attendance, created=False, raw=False,
+        using=router.db_for_write(Attendance), update_fields=frozenset(fields),
+    )
+    return True
+
+
+def update_attendance(attendance, change, attempts=None):
+    """
+    Run change(attendance) and write the fields it changed with cas_save.
+    `change` returns (fields, result); empty fields write nothing. When the
+    row moved on in between it is re-read and `change` runs again on the
+    fresh values, at most ATTENDANCE_WRITE_ATTEMPTS times in all. Returns
+    the result of the attempt that was written.
+    """
+    attempts = attempts or settings.ATTENDANCE_WRITE_ATTEMPTS
+    for _ in range(attempts):
+        fields, result = change(attendance)
+        if not fields or cas_save(attendance, fields):
+            return result
+        attendance.refresh_from_db()
+    raise AttendanceConflict(f"Attendance {attendance.pk} changed {attempts} times while being updated.")
+
+
+# -----------------------------
+# NIGHTLY FINALIZER
+# -----------------------------
+def finalize_attendance(before):
+    """
+    Close out attendance days before `before` that never went through
+    employee_logout. Runs as UPDATE statements per shift policy:
+
+    1. open break sessions are closed at whatever is left of the break cap,
+       but no later than the auto-logout moment of their day (one UPDATE
+       per day with open breaks)
+    2. logout_time is set to the auto-logout time (or login time if later),
+       totals are computed from the stored timestamps and the rows are
+       flagged auto_closed
+
+    The daily counters of the affected days are recounted afterwards.
+
+    Returns (closed_breaks, finalized_rows).
+    """
+    logout_at = auto_logout_time()
+    open_days = list(
+        Attendance.objects.filter(date__lt=before, login_time__isnull=False, logout_time__isnull=True)
+        .values_list("date", flat=True).distinct().order_by()
+    )
+    open_break_days = list(
+        BreakSession.objects.filter(end_at__isnull=True, attendance__date__lt=before)
+        .values_list("attendance__date", flat=True).distinct().order_by()
+    )
+
+    logout_expr = Case(
+        When(login_time__gt=logout_at, then=F("login_time")),
+        default=Value(logout_at),
+        output_field=TimeField(),
+    )
+    total_expr = ExpressionWrapper(logout_expr - F("login_time"), output_field=DurationField())
+    closed_breaks = finalized = 0
+
+    with transaction.atomic():
+        for policy, employees in policy_groups(prefix=""):
+            remaining = Greatest(
+                ExpressionWrapper(Value(policy.break_limit) - closed_break_total("attendance"), output_field=DurationField()),
+                Value(ZERO),
+            )
+            for day in open_break_days:
+                # a break started after the auto-logout (late login) ends
+                # where it started
+                logout_moment = Value(timezone.make_aware(datetime.combine(day, logout_at)), output_field=DateTimeField())
+                end_expr = Least(
+                    ExpressionWrapper(F("start_at") + remaining, output_field=DateTimeField()),
+                    Greatest(F("start_at"), logout_moment),
+                    output_field=DateTimeField(),
+                )
+                closed_breaks += BreakSession.objects.filter(
+                    end_at__isnull=True,
+                    attendance__date=day,
+                    attendance__employee__in=Employee.objects.filter(employees),
+                ).update(
+                    end_at=end_expr,
+                    duration=ExpressionWrapper(end_expr - F("start_at"), output_field=DurationField()),
+                )
+
+            break_expr = Least(closed_break_total(), Value(policy.break_limit))
+            net_expr = Greatest(
+                ExpressionWrapper(total_expr - break_expr, output_field=DurationField()),
+                Value(ZERO),
+            )
+            finalized += Attendance.objects.filter(
+                date__lt=before,
+                login_time__isnull=False,
+                logout_time__isnull=True,
+                employee__in=Employee.objects.filter(employees),
+            ).update(
+                logout_time=logout_expr,
+                total_hours=total_expr,
+                break_time=break_expr,
+                net_working_hours=net_expr,
+                is_on_break=False,
+                break_started_at=None,
+                auto_closed=True,
+                version=F("version") + 1,
+            )
+        rebuild_daily_counters(open_days)
+    invalidate_analytics()
+    presence_changed()
+
+    return closed_breaks, finalized
+
+
+# -----------------------------
+# BULK RECOMPUTE
+# -----------------------------
+def recomputed_totals(policy):
+    """
+    Expressions rebuilding the stored totals of a finished day from
+    login_time, logout_time and its break sessions under `policy`, keyed
+    by field name.
+    """
+    total_expr = ExpressionWrapper(F("logout_time") - F("login_time"), output_field=DurationField())
+    break_expr = Least(closed_break_total(), Value(policy.break_limit))
+    return {
+        "total_hours": total_expr,
+        "break_time": break_expr,
+        "net_working_hours": Greatest(
+            ExpressionWrapper(total_expr - break_expr, output_field=DurationField()),
+            Value(ZERO),
+        ),
+        "late_by": Greatest(
+            ExpressionWrapper(F("login_time") - Value(policy.grace_time, output_field=TimeField()), output_field=DurationField()),
+            Value(ZERO),
+        ),
+    }
+
+
+def recompute_queryset(start, end, department_id=None, no_department=False):
+    qs = Attendance.objects.filter(
+        date__range=(start, end),
+        login_time__isnull=False,
+        logout_time__isnull=False,
+    )
+    if no_department:
+        qs = qs.filter(employee__department__isnull=True)
+    elif department_id is not None:
+        qs = qs.filter(employee__department_id=department_id)
+    return qs
+
+
+def recompute_attendance(qs, dry_run=False):
+    """
+    Rewrite the totals of every row in `qs` with one UPDATE per shift
+    policy. With dry_run, nothing is written and the rows whose stored
+    values differ are returned as dicts holding the old and recomputed
+    values.
+    """
+    groups = [(recomputed_totals(policy), qs.filter(employees)) for policy, employees in policy_groups()]
+    if not dry_run:
+        updated = sum(group.update(version=F("version") + 1, **expressions) for expressions, group in groups)
+        invalidate_analytics()
+        presence_changed()
+        return updated
+
+    changed = Q()
+    for name in RECOMPUTED_FIELDS:
+        changed |= ~Q(**{name: F(f"new_{name}")}) | Q(**{f"{name}__isnull": True})
+    values = ["employee__employee_id", "date"]
+    for name in RECOMPUTED_FIELDS:
+        values += [name, f"new_{name}"]
+
+    rows = []
+    for expressions, group in groups:
+        annotated = group.order_by().annotate(**{f"new_{name}": expr for name, expr in expressions.items()})
+        rows += annotated.filter(changed).values(*values)
+    return sorted(rows, key=lambda row: (row["date"], row["employee__employee_id"]))
@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .attendance import ZERO, recompute_attendance
+from .models import Attendance, BreakSession
+
+
+ANOMALIES = {
+    "inverted": "ended before it started",
+    "before_login": "started before login",
+    "overlap": "overlapped an earlier break",
+    "extra_open": "was left open behind a later break",
+    "duration": "had a stale duration",
+}
+
+
+def login_moment(attendance):
+    if attendance.login_time is None:
+        return None
+    return timezone.make_aware(datetime.combine(attendance.date, attendance.login_time))
+
+
+# -----------------------------
+# REPAIR
+# -----------------------------
+def repair_sessions(sessions, login_at=None):
+    """
+    Bring the break sessions of one attendance row in line with the
+    constraints, in place: no end before its start, nothing before login,
+    no overlaps and only the latest session open. Clipped sessions keep
+    their row with zero length. Returns [(kind, session)] for every fix.
+    """
+    fixes = []
+    ordered = sorted(sessions, key=lambda bs: bs.start_at)
+    floor, floor_kind = login_at, "before_login"
+    for i, bs in enumerate(ordered):
+        fixed = False
+        if bs.end_at is not None and bs.end_at < bs.start_at:
+            bs.end_at = bs.start_at
+            fixes.append(("inverted", bs))
+            fixed = True
+        if bs.end_at is None and i < len(ordered) - 1:
+            bs.end_at = ordered[i + 1].start_at
+            fixes.append(("extra_open", bs))
+            fixed = True
+        if floor is not None and bs.start_at < floor:
+            bs.start_at = floor
+            if bs.end_at is not None and bs.end_at < bs.start_at:
+                bs.end_at = bs.start_at
+            fixes.append((floor_kind, bs))
+            fixed = True
+
+        if bs.end_at is not None:
+            duration = bs.end_at - bs.start_at
+            if bs.duration != duration:
+                bs.duration = duration
+                if not fixed:
+                    fixes.append(("duration", bs))
+            if floor is None or bs.end_at > floor:
+                floor, floor_kind = bs.end_at, "overlap"
+    return fixes
+
+
+# -----------------------------
+# VALIDATOR
+# -----------------------------
+def validate_break_sessions(start, end, repair=True):
+    """
+    Check the break sessions of every attendance day from start to end
+    (inclusive) with two queries. With repair, the fixes are written with
+    one bulk_update and the totals of the affected finished days are
+    recomputed. Returns a report dict.
+    """
+    attendances = {
+        a.pk: a
+        for a in Attendance.objects.filter(date__range=(start, end)).only("date", "login_time", "employee__employee_id")
+        .select_related("employee")
+    }
+    sessions = defaultdict(list)
+    for bs in BreakSession.objects.filter(attendance__date__range=(start, end)).order_by():
+        sessions[bs.attendance_id].append(bs)
+
+    found, changed, touched = [], {}, set()
+    for attendance_id, day_sessions in sessions.items():
+        attendance = attendances[attendance_id]
+        for kind, bs in repair_sessions(day_sessions, login_moment(attendance)):
+            found.append({
+                "employee_id": attendance.employee.employee_id,
+                "date": attendance.date,
+                "session": bs.pk,
+                "kind": kind,
+            })
+            changed[bs.pk] = bs
+            touched.add(attendance_id)
+
+    if repair and changed:
+        with transaction.atomic():
+            BreakSession.objects.bulk_update(changed.values(), ["start_at", "end_at", "duration"], batch_size=1000)
+            recompute_attendance(Attendance.objects.filter(pk__in=touched, logout_time__isnull=False, login_time__isnull=False))
+
+    return {
+        "days": len(attendances),
+        "sessions": sum(map(len, sessions.values())),
+        "counts": Counter(row["kind"] for row in found),
+        "anomalies": sorted(found, key=lambda row: (row["date"], row["employee_id"])),
+        "repaired": repair,
+    }
+
+
+def recent_range(days=None):
+    """The last BREAK_VALIDATION_DAYS days before today."""
+    days = days or settings.BREAK_VALIDATION_DAYS
+    today = timezone.localdate()
+    return today - timedelta(days=days), today - timedelta(days=1)
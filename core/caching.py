@@ -0,0 +1,79 @@
+import secrets
+import time
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+
+# -----------------------------
+# VERSIONED CACHE KEYS
+# -----------------------------
+# Cached data embeds the current version of whatever it depends on in its
+# key. Bumping the version makes every dependent entry unreachable, so
+# writers never need to know which keys exist.
+#
+# Versions live in the never-culled "versions" cache. A version is a stamp
+# (see _unique_stamp), never a counter: bumping is one plain set, which is
+# atomic on every backend, whereas cache.incr() is only atomic on Redis (the
+# database, file and locmem caches read and then write, so two concurrent
+# bumps can store the same number and the second change stays cached). A
+# version that is missing anyway (cache flushed) starts again from the
+# current time, so entries cached under an old version never come back.
+
+versions = ConnectionProxy(caches, "versions")
+
+
+def _version_key(name):
+    return f"ver:{name}"
+
+
+def get_version(name):
+    return versions.get_or_set(_version_key(name), _now_stamp, timeout=None)
+
+
+def get_versions(*names):
+    keys = [_version_key(name) for name in names]
+    found = versions.get_many(keys)
+    now = _now_stamp()
+    missing = {key: now for key in keys if key not in found}
+    if missing:
+        versions.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump_version(name):
+    stamp = _unique_stamp()
+    versions.set(_version_key(name), stamp, timeout=None)
+    return stamp
+
+
+def versioned_key(prefix, *names, extra=()):
+    versions = get_versions(*names)
+    parts = [prefix, *map(str, extra), *(f"{n}@{v}" for n, v in zip(names, versions))]
+    return ":".join(parts)
+
+
+# -----------------------------
+# TIMESTAMP VERSIONS
+# -----------------------------
+# Same idea, but the version is the time of the last change (in
+# microseconds), so it doubles as a Last-Modified value.
+
+def _now_stamp():
+    return time.time_ns() // 1000
+
+
+def _unique_stamp():
+    # concurrent bumps, even within one microsecond, must not agree
+    return _now_stamp() * 1000 + secrets.randbelow(1000)
+
+
+def get_stamp(name):
+    return versions.get_or_set(_version_key(name), _now_stamp, timeout=None)
+
+
+def stamp_versions(*names):
+    if names:
+        now = _now_stamp()
+        versions.set_many({_version_key(name): now for name in names}, timeout=None)
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .analytics import VERSION_NAME as ANALYTICS_VERSION
+from .caching import versioned_key
+from .models import Attendance
+
+
+GRANULARITIES = ("day", "week", "month")
+LABEL_FORMATS = {"day": "%d %b", "week": "Wk %d %b", "month": "%b %Y"}
+
+
+def _points(start, end, granularity):
+    days = (end - start).days + 1
+    if granularity == "day":
+        return days
+    if granularity == "week":
+        return days // 7 + 2
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def pick_granularity(start, end, requested=None):
+    """
+    The requested granularity, or the next coarser one while the range
+    would exceed CHART_MAX_POINTS. Returns (granularity, start); a range
+    too long even by month is cut to the latest CHART_MAX_POINTS months.
+    """
+    limit = settings.CHART_MAX_POINTS
+    index = GRANULARITIES.index(requested) if requested in GRANULARITIES else 0
+    while index < len(GRANULARITIES) - 1 and _points(start, end, GRANULARITIES[index]) > limit:
+        index += 1
+    granularity = GRANULARITIES[index]
+    if _points(start, end, granularity) > limit:
+        months_back = limit - 1
+        year, month = divmod(end.year * 12 + end.month - 1 - months_back, 12)
+        start = max(start, start.replace(year=year, month=month + 1, day=1))
+    return granularity, start
+
+
+def _bucket(granularity):
+    if granularity == "week":
+        return TruncWeek("date")
+    if granularity == "month":
+        return TruncMonth("date")
+    return F("date")
+
+
+def _hours(td, days):
+    return round(td.total_seconds() / days / 3600, 2) if td and days else 0
+
+
+def chart_series(employee_id, start, end, granularity):
+    """
+    Averages per present day for each bucket, computed with one GROUP BY.
+    Absent rows add nothing to the sums, so an absent day plots as zero.
+    """
+    rows = (
+        Attendance.objects.filter(employee_id=employee_id, date__range=(start, end))
+        .annotate(bucket=_bucket(granularity))
+        .values("bucket")
+        .annotate(
+            days=Count("id", filter=Q(status="Present")),
+            total=Sum("total_hours"),
+            breaks=Sum("break_time"),
+            net=Sum("net_working_hours"),
+            late=Sum("late_by"),
+        )
+        .order_by("bucket")
+    )
+    label_format = LABEL_FORMATS[granularity]
+    series = {"granularity": granularity, "start": start.isoformat(), "end": end.isoformat(),
+              "labels": [], "days": [], "total_hours": [], "break_hours": [], "net_hours": [], "late_minutes": []}
+    for row in rows:
+        days = row["days"]
+        series["labels"].append(row["bucket"].strftime(label_format))
+        series["days"].append(days)
+        series["total_hours"].append(_hours(row["total"], days))
+        series["break_hours"].append(_hours(row["breaks"], days))
+        series["net_hours"].append(_hours(row["net"], days))
+        series["late_minutes"].append(int(row["late"].total_seconds() / days / 60) if row["late"] and days else 0)
+    return series
+
+
+def cached_chart_series(employee_id, start, end, granularity=None):
+    granularity, start = pick_granularity(start, end, granularity)
+    key = versioned_key(
+        "chart", ANALYTICS_VERSION,
+        extra=(employee_id, start.isoformat(), end.isoformat(), granularity),
+    )
+    # ranges reaching today still change during the day
+    live = end >= timezone.localdate() - timedelta(days=1)
+    timeout = settings.CHART_CACHE_TIMEOUT if live else settings.CHART_HISTORY_CACHE_TIMEOUT
+    return cache.get_or_set(key, lambda: chart_series(employee_id, start, end, granularity), timeout=timeout)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+CACHED_SESSION_ENGINES = {
+    "django.contrib.sessions.backends.cache",
+    "django.contrib.sessions.backends.cached_db",
+}
+
+
+@register(Tags.security)
+def check_session_cache(app_configs, **kwargs):
+    """Cached sessions must live in a cache shared by every worker process."""
+    if settings.SESSION_ENGINE not in CACHED_SESSION_ENGINES:
+        return []
+    backend = settings.CACHES.get(settings.SESSION_CACHE_ALIAS, {}).get("BACKEND")
+    if backend != LOCMEM_BACKEND:
+        return []
+    return [Error(
+        f"SESSION_ENGINE {settings.SESSION_ENGINE!r} uses the per-process locmem cache "
+        f"{settings.SESSION_CACHE_ALIAS!r}; a logout would not reach the other workers.",
+        hint="Point CACHES[SESSION_CACHE_ALIAS] at a shared backend (file, Redis, Memcached) "
+             "or use ETAMS_SESSION_BACKEND=db.",
+        id="core.E001",
+    )]
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """Version bumps from commands and other workers only land in a shared cache."""
+    if settings.DEBUG:
+        return []
+    return [
+        Error(
+            f"CACHES[{alias!r}] is the per-process locmem cache; version bumps from other "
+            f"processes never reach it and cached pages go stale.",
+            hint="Set ETAMS_CACHE_URL or use the database cache from the default settings.",
+            id="core.E002",
+        )
+        for alias in ("default", "versions")
+        if settings.CACHES.get(alias, {}).get("BACKEND") == LOCMEM_BACKEND
+    ]
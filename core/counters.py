@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import Attendance, DailyAttendanceCounter
+
+
+COUNTER_FIELDS = ("present", "absent", "late", "on_break", "logged_out")
+
+
+def _counter_rows(day, department_id):
+    return DailyAttendanceCounter.objects.filter(date=day, department_id=department_id)
+
+
+# -----------------------------
+# LIVE UPDATES
+# -----------------------------
+def bump_counters(day, department_id, **deltas):
+    """
+    Apply deltas such as present=1, absent=-1 to the (day, department)
+    counter row with one UPDATE. Call after the attendance row is saved:
+    when the counter row does not exist yet it is built from the attendance
+    table, which already includes the change.
+
+    Counters are clamped at zero: admin edits and deletes are not tracked,
+    so a drifted counter must not turn a logout into a CHECK violation.
+    rebuild_daily_counters puts drifted days right.
+    """
+    updates = {name: Greatest(F(name) + delta, 0) for name, delta in deltas.items() if delta}
+    if not updates:
+        return
+    if _counter_rows(day, department_id).update(**updates):
+        return
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                rebuild_daily_counters([day], department_ids=[department_id])
+            return
+        except IntegrityError:
+            # another request built the row at the same time, possibly
+            # before this change was committed; count again rather than
+            # adding the delta on top of its totals
+            pass
+
+
+def attendance_flags(attendance):
+    """The counters an attendance row currently contributes to."""
+    present = attendance.status == "Present"
+    return {
+        "present": int(present),
+        "absent": int(attendance.status == "Absent"),
+        "late": int(present and bool(attendance.late_by) and attendance.late_by > timedelta()),
+        "on_break": int(attendance.is_on_break and attendance.logout_time is None),
+        "logged_out": int(attendance.logout_time is not None),
+    }
+
+
+def track_attendance(attendance, department_id, before=None):
+    """
+    Move the counters from the row's `before` flags (None for a new row)
+    to its current state.
+    """
+    after = attendance_flags(attendance)
+    before = before or dict.fromkeys(COUNTER_FIELDS, 0)
+    bump_counters(attendance.date, department_id, **{name: after[name] - before[name] for name in COUNTER_FIELDS})
+
+
+# -----------------------------
+# READS / RECONCILIATION
+# -----------------------------
+def daily_counters(day):
+    """{department_id: counter row} for the day, one indexed read."""
+    return {row.department_id: row for row in DailyAttendanceCounter.objects.filter(date=day).select_related("department")}
+
+
+def company_counters(day):
+    totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    for row in DailyAttendanceCounter.objects.filter(date=day).values(*COUNTER_FIELDS):
+        for name in COUNTER_FIELDS:
+            totals[name] += row[name]
+    return totals
+
+
+def rebuild_daily_counters(dates, department_ids=None):
+    """
+    Recount the given days from the attendance table with one GROUP BY and
+    replace their counter rows. Returns the number of rows written.
+    """
+    dates = list(dates)
+    rows = Attendance.objects.filter(date__in=dates)
+    counters = DailyAttendanceCounter.objects.filter(date__in=dates)
+    if department_ids is not None:
+        department_filter = Q(employee__department_id__in=[d for d in department_ids if d is not None])
+        counter_filter = Q(department_id__in=[d for d in department_ids if d is not None])
+        if None in department_ids:
+            department_filter |= Q(employee__department__isnull=True)
+            counter_filter |= Q(department__isnull=True)
+        rows = rows.filter(department_filter)
+        counters = counters.filter(counter_filter)
+
+    present = Q(status="Present")
+    grouped = (
+        rows.values("date", "employee__department_id")
+        .annotate(
+            present=Count("id", filter=present),
+            absent=Count("id", filter=Q(status="Absent")),
+            late=Count("id", filter=present & Q(late_by__gt=timedelta())),
+            on_break=Count("id", filter=Q(is_on_break=True, logout_time__isnull=True)),
+            logged_out=Count("id", filter=Q(logout_time__isnull=False)),
+        )
+        .order_by()
+    )
+    # counted inside the transaction, which also keeps the reads on the
+    # primary: a lagging replica would write stale totals back
+    with transaction.atomic():
+        fresh = [
+            DailyAttendanceCounter(
+                date=row["date"],
+                department_id=row["employee__department_id"],
+                **{name: row[name] for name in COUNTER_FIELDS},
+            )
+            for row in grouped
+        ]
+        counters.delete()
+        DailyAttendanceCounter.objects.bulk_create(fresh)
+    return len(fresh)
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .analytics import VERSION_NAME as ANALYTICS_VERSION
+from .announcements import GLOBAL_VERSION as ANNOUNCEMENTS_VERSION, announcement_feed, department_version
+from .caching import bump_version, versioned_key
+from .meetings import department_meetings_version, employee_meetings_version, upcoming_meetings_for
+from .models import Attendance
+
+
+# Saves that only refresh the running totals of today's row (the employee
+# dashboard does this on every hit) leave the cached sections alone; the
+# live timers show those values and the chart catches up within
+# DASHBOARD_SECTION_TIMEOUT.
+TOTALS_FIELDS = frozenset({"break_time", "net_working_hours", "total_hours", "status", "version"})
+
+
+def attendance_version(employee_id):
+    return f"dashboard:emp:{employee_id}"
+
+
+def invalidate_dashboards(employee_ids):
+    for employee_id in set(employee_ids):
+        bump_version(attendance_version(employee_id))
+
+
+def last_days_chart(employee_id, days=7):
+    records = list(Attendance.objects.filter(employee_id=employee_id).order_by("-date")[:days])[::-1]
+    chart = {"labels": [], "total_hours": [], "break_hours": [], "late_minutes": []}
+    for r in records:
+        chart["labels"].append(r.date.strftime("%d-%b"))
+        chart["total_hours"].append(round((r.total_hours.total_seconds() if r.total_hours else 0) / 3600, 2))
+        chart["break_hours"].append(round((r.break_time.total_seconds() if r.break_time else 0) / 3600, 2))
+        chart["late_minutes"].append(int((r.late_by.total_seconds() if r.late_by else 0) / 60))
+    return chart
+
+
+def dashboard_sections(employee, today):
+    """
+    The slow-moving parts of the employee dashboard: the 7-day chart,
+    announcements and upcoming meetings. Cached per employee and day, and
+    keyed by the versions of the attendance, announcements and meetings
+    they are built from.
+    """
+    # versions and meeting stamps share one key space, so a single
+    # get_many fetches them all
+    names = [
+        attendance_version(employee.pk), ANALYTICS_VERSION, ANNOUNCEMENTS_VERSION,
+        employee_meetings_version(employee.pk),
+    ]
+    if employee.department_id:
+        names += [department_version(employee.department_id), department_meetings_version(employee.department_id)]
+    key = versioned_key("dashboard", *names, extra=(employee.pk, today.isoformat()))
+
+    def build():
+        return {
+            "chart": last_days_chart(employee.pk),
+            "announcements": announcement_feed(employee.department_id)[:5],
+            "upcoming_meetings": list(upcoming_meetings_for(employee, today)),
+        }
+
+    return cache.get_or_set(key, build, timeout=settings.DASHBOARD_SECTION_TIMEOUT)
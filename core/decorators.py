@@ -1,6 +1,8 @@
 from django.shortcuts import redirect
 from django.contrib import messages
-from .models import Employee
+from django.http import JsonResponse
+from .models import Employee, PunchDevice
+from .routers import is_pinned, with_replica_fallback
 
 
 def employee_login_required(view_func):
@@ -23,4 +25,33 @@ def manager_required(view_func):
             return redirect('employee_dashboard')
 
         return view_func(request, *args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def device_key_required(view_func):
+    """Authenticate punch devices via the X-Device-Id / X-Device-Key headers."""
+    def wrapper(request, *args, **kwargs):
+        device_id = request.headers.get('X-Device-Id', '')
+        device_key = request.headers.get('X-Device-Key', '')
+
+        device = PunchDevice.objects.filter(device_id=device_id, is_active=True).first()
+        if not device or not device.check_api_key(device_key):
+            return JsonResponse({"ok": False, "msg": "Invalid device credentials."}, status=401)
+
+        request.punch_device = device
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def reads_from_replica(view_func):
+    """
+    Serve the reads of a GET view from the read replica, unless the browser
+    wrote something moments ago (see ReplicaPinMiddleware). Writes made by
+    the view still go to the primary; if the replica fails, the view runs
+    again on the primary.
+    """
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or is_pinned(request):
+            return view_func(request, *args, **kwargs)
+        return with_replica_fallback(lambda: view_func(request, *args, **kwargs))
+    return wrapper
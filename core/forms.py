@@ -1,7 +1,10 @@
 from django import forms
 from django.contrib.auth.models import User
+from django.urls import reverse_lazy
+from .scheduling import find_conflicts
+from .meetings import expand_attendees
 from .models import (
-    Employee, Task, Department,
+    Employee, Task, Department, Role,
     Announcement, Meeting, ITReport
 )
 
@@ -46,7 +49,40 @@ class AnnouncementForm(forms.ModelForm):
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
+class EmployeeAutocompleteWidget(forms.SelectMultiple):
+    """
+    Multi-select that renders only the selected employees. The page script
+    fills in search results page by page from the employee search endpoint.
+    """
+
+    def __init__(self, attrs=None):
+        attrs = {'data-autocomplete-url': reverse_lazy('employee_search'), **(attrs or {})}
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [v for v in value if v]
+        employees = Employee.objects.filter(pk__in=selected).order_by('employee_id').values_list('pk', 'employee_id')
+        options = [
+            self.create_option(name, pk, label, True, index, attrs=attrs)
+            for index, (pk, label) in enumerate(employees)
+        ]
+        return [(None, options, 0)]
+
+
 class MeetingForm(forms.ModelForm):
+    invite_departments = forms.ModelMultipleChoiceField(
+        queryset=Department.objects.all(),
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 4}),
+        help_text="Every active employee of these departments is added as a participant.",
+    )
+    invite_roles = forms.ModelMultipleChoiceField(
+        queryset=Role.objects.select_related('department'),
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 4}),
+        help_text="Every active employee with these roles is added as a participant.",
+    )
+
     class Meta:
         model = Meeting
         fields = [
@@ -63,10 +99,77 @@ class MeetingForm(forms.ModelForm):
             'meeting_link': forms.URLInput(attrs={'class': 'form-control', 'placeholder': 'https://meet.google.com/...'}),
             'location': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Conference Room / Office'}),
             'department': forms.Select(attrs={'class': 'form-select'}),
-            'participants': forms.SelectMultiple(attrs={'class': 'form-select', 'size': 8}),
+            'participants': EmployeeAutocompleteWidget(attrs={'class': 'form-select', 'size': 8}),
             'status': forms.Select(attrs={'class': 'form-select'}),
         }
 
+    MAX_LISTED_CLASHES = 10
+
+    def participant_ids(self):
+        """Picked participants plus the members of the invited departments and roles."""
+        if not hasattr(self, '_participant_ids'):
+            cleaned = self.cleaned_data
+            self._participant_ids = expand_attendees(
+                participant_ids=[p.pk for p in cleaned.get('participants') or []],
+                department_ids=[d.pk for d in cleaned.get('invite_departments') or []],
+                role_ids=[r.pk for r in cleaned.get('invite_roles') or []],
+            )
+        return self._participant_ids
+
+    @staticmethod
+    def describe_clash(day, clash):
+        verb = "is booked for" if clash.get('room') else "is busy in"
+        return (
+            f"{clash['who']} {verb} meeting #{clash['meeting_id']} \"{clash['title']}\" "
+            f"on {day:%Y-%m-%d}, {clash['start']:%H:%M}-{clash['end']:%H:%M}"
+        )
+
+    def room_taken_error(self):
+        """Error for a save the room constraint rejected after clean() passed."""
+        cleaned = self.cleaned_data
+        day = cleaned['date']
+        clashes, _ = find_conflicts(
+            day, cleaned['start_time'], cleaned['end_time'],
+            location=cleaned.get('location'), exclude_meeting_id=self.instance.pk,
+        )
+        if not clashes:
+            return "The room was booked by another meeting in the meantime. Please pick another slot."
+        return f"In the meantime, {self.describe_clash(day, clashes[0])}. Please pick another slot."
+
+    def clean(self):
+        cleaned = super().clean()
+        day = cleaned.get('date')
+        start = cleaned.get('start_time')
+        end = cleaned.get('end_time')
+        if not (day and start and end):
+            return cleaned
+
+        if end <= start:
+            self.add_error('end_time', "End time must be after the start time.")
+            return cleaned
+
+        if cleaned.get('status') == "Cancelled":
+            return cleaned
+
+        department = cleaned.get('department')
+        clashes, suggestion = find_conflicts(
+            day, start, end,
+            participant_ids=self.participant_ids(),
+            department_id=department.pk if department else None,
+            location=cleaned.get('location') if cleaned.get('mode') == "Offline" else None,
+            exclude_meeting_id=self.instance.pk,
+        )
+        if clashes:
+            lines = [self.describe_clash(day, c) for c in clashes[:self.MAX_LISTED_CLASHES]]
+            if len(clashes) > self.MAX_LISTED_CLASHES:
+                lines.append(f"...and {len(clashes) - self.MAX_LISTED_CLASHES} more clash(es).")
+            if suggestion:
+                lines.append(f"Nearest free slot: {suggestion[0]:%H:%M}-{suggestion[1]:%H:%M}.")
+            else:
+                lines.append("No free slot of this length is left on that day.")
+            raise forms.ValidationError(lines)
+        return cleaned
+
 class ITReportForm(forms.ModelForm):
     class Meta:
         model = ITReport
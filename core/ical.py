@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .models import Employee, Meeting
+
+
+FEED_SALT = "core.ical.feed"
+FEED_CHUNK_SIZE = 500
+
+
+# -----------------------------
+# FEED TOKENS
+# -----------------------------
+# Tokens are timestamped "<kind>:<id>:<employee pk>" strings signed with the
+# employee's calendar_key. Rotating the key (EmployeeAdmin action) revokes
+# every link handed to that employee, deactivating the employee or moving
+# them to another department revokes the feeds they no longer see, and
+# links expire after CALENDAR_FEED_MAX_AGE.
+
+def _signer(employee):
+    return signing.TimestampSigner(salt=f"{FEED_SALT}:{employee.calendar_key}")
+
+
+def feed_token(employee, kind, pk):
+    return _signer(employee).sign(f"{kind}:{pk}:{employee.pk}")
+
+
+def read_feed_token(token):
+    """Return (kind, id) for a valid, current token, or None."""
+    # the employee is read from the unverified value to find the key the
+    # token must be signed with
+    kind, _, rest = token.partition(":")
+    pk, _, rest = rest.partition(":")
+    employee_pk = rest.split(":", 1)[0]
+    if kind not in ("employee", "department") or not pk.isdigit() or not employee_pk.isdigit():
+        return None
+    employee = (
+        Employee.objects.filter(pk=int(employee_pk), is_active=True)
+        .only("calendar_key", "department_id").first()
+    )
+    if employee is None:
+        return None
+    try:
+        _signer(employee).unsign(token, max_age=settings.CALENDAR_FEED_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    pk = int(pk)
+    if kind == "employee" and pk != employee.pk:
+        return None
+    if kind == "department" and pk != employee.department_id:
+        return None
+    return kind, pk
+
+
+# -----------------------------
+# ICS WRITER
+# -----------------------------
+def _escape(text):
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Fold content lines at 75 octets as RFC 5545 requires."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _utc(day, clock):
+    local = timezone.make_aware(datetime.combine(day, clock))
+    return local.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event_lines(meeting, host):
+    yield "BEGIN:VEVENT"
+    yield f"UID:meeting-{meeting.pk}@{host}"
+    yield f"DTSTAMP:{meeting.created_at.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}"
+    yield f"DTSTART:{_utc(meeting.date, meeting.start_time)}"
+    yield f"DTEND:{_utc(meeting.date, meeting.end_time)}"
+    yield f"SUMMARY:{_escape(meeting.title)}"
+    yield f"DESCRIPTION:{_escape(meeting.agenda)}"
+    if meeting.mode == "Online" and meeting.meeting_link:
+        yield f"URL:{meeting.meeting_link}"
+        yield f"LOCATION:{_escape(meeting.meeting_link)}"
+    elif meeting.location:
+        yield f"LOCATION:{_escape(meeting.location)}"
+    yield "STATUS:CANCELLED" if meeting.status == "Cancelled" else "STATUS:CONFIRMED"
+    yield "END:VEVENT"
+
+
+def feed_window_start():
+    """First day a feed lists; the window moves forward every midnight."""
+    return timezone.localdate() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS)
+
+
+def feed_meetings(kind, pk):
+    since = feed_window_start()
+    if kind == "employee":
+        qs = Meeting.objects.filter(visibility__employee_id=pk, visibility__date__gte=since)
+    else:
+        qs = Meeting.objects.filter(department_id=pk, date__gte=since)
+    return qs.order_by("date", "start_time").only(
+        "title", "agenda", "date", "start_time", "end_time", "mode",
+        "meeting_link", "location", "status", "created_at",
+    )
+
+
+def stream_calendar(meetings, name, host):
+    """Yield the calendar one line at a time, reading meetings in chunks."""
+    yield _fold("BEGIN:VCALENDAR")
+    yield _fold("VERSION:2.0")
+    yield _fold("PRODID:-//ETAMS//Meetings//EN")
+    yield _fold("CALSCALE:GREGORIAN")
+    yield _fold(f"X-WR-CALNAME:{_escape(name)}")
+    for meeting in meetings.iterator(chunk_size=FEED_CHUNK_SIZE):
+        for line in _event_lines(meeting, host):
+            yield _fold(line)
+    yield _fold("END:VCALENDAR")
@@ -0,0 +1,291 @@
+import json
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .attendance import ZERO
+from .breaks import login_moment, repair_sessions
+from .counters import rebuild_daily_counters
+from .dashboard import invalidate_dashboards
+from .presence_bitmaps import mark_days
+from .models import Attendance, BreakSession, Employee, PunchEvent
+from .policies import policy_table
+from .presence import publish_attendances
+
+
+PUNCH_KINDS = {kind for kind, _ in PunchEvent.KIND_CHOICES}
+# each event is checked against the columns it is stored in, so one bad
+# line is rejected on its own instead of failing the batch in the database
+EVENT_FIELDS = {
+    "key": PunchEvent._meta.get_field("idempotency_key"),
+    "employee_id": Employee._meta.get_field("employee_id"),
+}
+EMPLOYEES_PER_TRANSACTION = 500
+
+
+# -----------------------------
+# PARSING
+# -----------------------------
+def parse_punch_batch(body):
+    """
+    Parse a newline-delimited JSON batch. Each line looks like
+    {"key": "...", "employee_id": "EMP001", "type": "login", "at": "2026-03-10T10:02:11+05:30"}.
+
+    Returns (events, rejected) where rejected holds {"line", "error"} dicts.
+    """
+    events, rejected = [], []
+    for line_no, line in enumerate(body.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            event = {
+                "line": line_no,
+                "key": str(data["key"]),
+                "employee_id": str(data["employee_id"]),
+                "kind": data["type"],
+                "at": parse_datetime(data["at"]),
+            }
+        except (ValueError, KeyError, TypeError) as exc:
+            rejected.append({"line": line_no, "error": f"Malformed event: {exc}"})
+            continue
+
+        invalid = next((name for name, field in EVENT_FIELDS.items() if _invalid(field, event[name])), None)
+        if invalid:
+            rejected.append({"line": line_no, "error": f"Invalid {invalid}"})
+            continue
+        if event["kind"] not in PUNCH_KINDS:
+            rejected.append({"line": line_no, "error": f"Unknown type {event['kind']!r}"})
+            continue
+        if event["at"] is None:
+            rejected.append({"line": line_no, "error": "Invalid timestamp"})
+            continue
+        if timezone.is_naive(event["at"]):
+            event["at"] = timezone.make_aware(event["at"])
+        events.append(event)
+    return events, rejected
+
+
+def _invalid(field, value):
+    if not value or "\x00" in value:
+        return True
+    try:
+        field.run_validators(value)
+    except ValidationError:
+        return True
+    return False
+
+
+# -----------------------------
+# INGESTION
+# -----------------------------
+def ingest_punches(device, events):
+    """
+    Store a parsed batch and fold it into Attendance / BreakSession.
+
+    Duplicate keys (inside the batch or already stored) are skipped. Every
+    touched employee-day is rebuilt from all of its stored punches, so the
+    order in which events arrive does not matter. Work is grouped into one
+    transaction per EMPLOYEES_PER_TRANSACTION employees.
+    """
+    result = {"accepted": 0, "duplicates": 0, "rejected": []}
+
+    unique = {}
+    for event in events:
+        if event["key"] in unique:
+            result["duplicates"] += 1
+        else:
+            unique[event["key"]] = event
+
+    employees = Employee.objects.filter(
+        employee_id__in={e["employee_id"] for e in unique.values()},
+        is_active=True,
+    ).in_bulk(field_name="employee_id")
+
+    by_employee = defaultdict(list)
+    for event in unique.values():
+        employee = employees.get(event["employee_id"])
+        if employee is None:
+            result["rejected"].append({"line": event["line"], "error": "Unknown employee"})
+            continue
+        by_employee[employee.id].append(event)
+
+    employee_ids = list(by_employee)
+    for offset in range(0, len(employee_ids), EMPLOYEES_PER_TRANSACTION):
+        group = employee_ids[offset:offset + EMPLOYEES_PER_TRANSACTION]
+        batch_id = uuid.uuid4()
+        rows = [
+            PunchEvent(
+                idempotency_key=event["key"],
+                batch_id=batch_id,
+                device=device,
+                employee_id=employee_id,
+                kind=event["kind"],
+                occurred_at=event["at"],
+                work_date=timezone.localtime(event["at"]).date(),
+            )
+            for employee_id in group
+            for event in by_employee[employee_id]
+        ]
+        with transaction.atomic():
+            PunchEvent.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+            stored = list(PunchEvent.objects.filter(batch_id=batch_id).values_list("employee_id", "work_date"))
+            apply_punch_days(set(stored))
+        result["accepted"] += len(stored)
+        result["duplicates"] += len(rows) - len(stored)
+
+    return result
+
+
+def apply_punch_days(days):
+    """
+    Rebuild the attendance of each (employee_id, work_date) from its
+    punches. Must run inside a transaction: the attendance rows are locked
+    first, so a second batch for the same day waits and then rebuilds from
+    both batches' punches, and browser writes (compare-and-swap on the
+    version) retry against the result.
+    """
+    if not days:
+        return
+
+    employee_ids = {employee_id for employee_id, _ in days}
+    dates = {day for _, day in days}
+    rows = Attendance.objects.filter(employee_id__in=employee_ids, date__in=dates)
+
+    existing = set(rows.values_list("employee_id", "date"))
+    missing = [Attendance(employee_id=e, date=d) for e, d in days if (e, d) not in existing]
+    if missing:
+        # a browser login may create the same row concurrently
+        Attendance.objects.bulk_create(missing, ignore_conflicts=True)
+    attendances = {
+        (a.employee_id, a.date): a
+        for a in rows.select_for_update().order_by("pk")
+        if (a.employee_id, a.date) in days
+    }
+
+    # read after the lock, so punches committed by a concurrent batch count
+    punches = defaultdict(list)
+    for punch in PunchEvent.objects.filter(employee_id__in=employee_ids, work_date__in=dates).order_by("occurred_at"):
+        key = (punch.employee_id, punch.work_date)
+        if key in days:
+            punches[key].append(punch)
+
+    employees = Employee.objects.only("employee_id", "department_id", "role_id").in_bulk(employee_ids)
+    table = policy_table()
+    policies = {pk: table.lookup(e.department_id, e.role_id) for pk, e in employees.items()}
+
+    sessions = defaultdict(list)
+    for bs in BreakSession.objects.filter(attendance__in=attendances.values()):
+        sessions[bs.attendance_id].append(bs)
+
+    new_sessions, changed_sessions = [], []
+    for key, attendance in attendances.items():
+        day_sessions = sessions[attendance.id]
+        created, changed = _apply_day(attendance, punches[key], day_sessions)
+        # device and browser sessions of the same day must not overlap
+        for _, bs in repair_sessions(day_sessions, login_moment(attendance)):
+            if bs.pk is not None and bs not in changed:
+                changed.append(bs)
+        new_sessions += created
+        changed_sessions += changed
+        _refresh_totals(attendance, day_sessions, policies[attendance.employee_id])
+        attendance.version = F("version") + 1
+
+    # shorten existing sessions before inserting the ones that follow them
+    BreakSession.objects.bulk_update(changed_sessions, ["start_at", "end_at", "duration"], batch_size=1000)
+    BreakSession.objects.bulk_create(new_sessions, batch_size=1000)
+    Attendance.objects.bulk_update(
+        attendances.values(),
+        [
+            "login_time", "logout_time", "status", "late_by", "total_hours",
+            "break_time", "net_working_hours", "is_on_break", "break_started_at", "version",
+        ],
+        batch_size=1000,
+    )
+
+    # device punches touch many rows at once, so their days are recounted
+    # rather than bumped row by row
+    rebuild_daily_counters(dates, department_ids={e.department_id for e in employees.values()})
+    mark_days((a.employee_id, a.date, a.status) for a in attendances.values())
+    invalidate_dashboards(employee_ids)
+
+    # the live board only hears about rows that were actually committed
+    published = [(attendance, employees[employee_id]) for (employee_id, _), attendance in attendances.items()]
+    transaction.on_commit(lambda: publish_attendances(published))
+
+
+def _apply_day(attendance, day_punches, day_sessions):
+    logins = [p.occurred_at for p in day_punches if p.kind == "login"]
+    logouts = [p.occurred_at for p in day_punches if p.kind == "logout"]
+
+    if logins:
+        login_time = timezone.localtime(min(logins)).time()
+        if attendance.login_time is None or login_time < attendance.login_time:
+            attendance.login_time = login_time
+        attendance.status = "Present"
+    if logouts:
+        logout_time = timezone.localtime(max(logouts)).time()
+        if attendance.logout_time is None or logout_time > attendance.logout_time:
+            attendance.logout_time = logout_time
+
+    # Pair starts with the next end; repeated starts (two readers) collapse
+    # and an end without a start waits until the start arrives.
+    pairs = []
+    open_start = None
+    for punch in day_punches:
+        if punch.kind == "break_start" and open_start is None:
+            open_start = punch.occurred_at
+        elif punch.kind == "break_end" and open_start is not None:
+            pairs.append((open_start, punch.occurred_at))
+            open_start = None
+    if open_start is not None:
+        end = max(logouts) if logouts and max(logouts) > open_start else None
+        pairs.append((open_start, end))
+
+    # Device sessions are keyed by their start time, so replays update
+    # them in place and browser-created sessions are left untouched.
+    by_start = {bs.start_at: bs for bs in day_sessions}
+    created, changed = [], []
+    for start, end in pairs:
+        bs = by_start.get(start)
+        if bs is None:
+            bs = BreakSession(attendance=attendance, start_at=start, end_at=end, duration=(end - start) if end else ZERO)
+            created.append(bs)
+            day_sessions.append(bs)
+        elif end is not None and bs.end_at != end:
+            bs.end_at = end
+            bs.duration = end - start
+            changed.append(bs)
+    return created, changed
+
+
+def _refresh_totals(attendance, day_sessions, policy):
+    if attendance.login_time is None:
+        return
+
+    open_sessions = [bs for bs in day_sessions if bs.end_at is None]
+    if open_sessions and attendance.logout_time is None:
+        attendance.is_on_break = True
+        attendance.break_started_at = max(bs.start_at for bs in open_sessions)
+    else:
+        attendance.is_on_break = False
+        attendance.break_started_at = None
+
+    total_break = sum((bs.duration for bs in day_sessions if bs.end_at), ZERO)
+    attendance.break_time = min(total_break, policy.break_limit)
+
+    dt_login = datetime.combine(attendance.date, attendance.login_time)
+    dt_grace = datetime.combine(attendance.date, policy.grace_time)
+    attendance.late_by = max(dt_login - dt_grace, ZERO)
+
+    if attendance.logout_time:
+        total_work = max(datetime.combine(attendance.date, attendance.logout_time) - dt_login, ZERO)
+        attendance.total_hours = total_work
+        attendance.net_working_hours = max(total_work - attendance.break_time, ZERO)
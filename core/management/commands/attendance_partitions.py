@@ -0,0 +1,339 @@
+import gzip
+import re
+from datetime import date, datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+# table -> (partition column, column is a timestamp)
+PARTITIONED_TABLES = {
+    "core_attendance": ("date", False),
+    "core_breaksession": ("start_at", True),
+}
+
+# PostgreSQL requires every unique and exclusion constraint of a
+# partitioned table to include the partition key. The BreakSession
+# constraints from migration 0020 cannot, so each partition carries its own
+# copy: they hold within a month, which is where a day's breaks live, and
+# validate_break_sessions catches the rest. Formatted with the partition
+# table and the name of the copy.
+LOCAL_CONSTRAINTS = {
+    "core_breaksession": {
+        "breaksession_one_open": "CREATE UNIQUE INDEX {name} ON {table} (attendance_id) WHERE end_at IS NULL",
+        "breaksession_no_overlap": (
+            "ALTER TABLE {table} ADD CONSTRAINT {name} EXCLUDE USING gist ("
+            "attendance_id WITH =, tstzrange(start_at, end_at, '[)') WITH &&"
+            ") DEFERRABLE INITIALLY DEFERRED"
+        ),
+    },
+}
+
+PARTITION_NAME_RE = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def add_months(day, months):
+    index = day.year * 12 + (day.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def partition_bound(month, is_timestamp):
+    if not is_timestamp:
+        return month.isoformat()
+    # Month boundaries follow the office timezone so a partition holds
+    # exactly the breaks of that month's attendance days.
+    return timezone.make_aware(datetime.combine(month, datetime.min.time())).isoformat()
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage monthly range partitions of Attendance and BreakSession on PostgreSQL: convert "
+        "the tables, create partitions ahead of time, detach and archive old months, and restore "
+        "archived months."
+    )
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="action", required=True)
+
+        setup = sub.add_parser("setup", help="Convert the tables to monthly partitions (takes an exclusive lock).")
+        setup.add_argument("--ahead", type=int, default=settings.ATTENDANCE_PARTITION_AHEAD_MONTHS)
+
+        create = sub.add_parser("create", help="Create partitions for the coming months.")
+        create.add_argument("--ahead", type=int, default=settings.ATTENDANCE_PARTITION_AHEAD_MONTHS)
+
+        detach = sub.add_parser("detach", help="Detach, archive and drop months older than the retention window.")
+        detach.add_argument("--retain-months", type=int, default=settings.ATTENDANCE_RETENTION_MONTHS)
+        detach.add_argument("--archive-dir", default=str(settings.ATTENDANCE_ARCHIVE_DIR))
+        detach.add_argument("--keep-tables", action="store_true", help="Leave detached tables in place after archiving.")
+        detach.add_argument("--dry-run", action="store_true")
+
+        restore = sub.add_parser("restore", help="Re-import an archived month as a partition.")
+        restore.add_argument("archive", help="Path to a <partition>.csv.gz archive file.")
+
+        sub.add_parser("list", help="List existing partitions.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Attendance partitioning requires PostgreSQL.")
+
+        action = options["action"]
+        if action != "setup" and not all(self.is_partitioned(t) for t in PARTITIONED_TABLES):
+            raise CommandError("Tables are not partitioned yet. Run 'attendance_partitions setup' first.")
+
+        getattr(self, f"handle_{action}")(**options)
+
+    # -----------------------------
+    # CATALOG HELPERS
+    # -----------------------------
+    def fetch_sql(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params or [])
+            return cursor.fetchall()
+
+    def run_sql(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params or [])
+
+    def is_partitioned(self, table):
+        rows = self.fetch_sql("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        return bool(rows) and rows[0][0] == "p"
+
+    def partitions(self, table):
+        rows = self.fetch_sql(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [table],
+        )
+        result = []
+        for (name,) in rows:
+            match = PARTITION_NAME_RE.match(name)
+            if match and match["table"] == table:
+                result.append((name, date(int(match["year"]), int(match["month"]), 1)))
+        return result
+
+    def create_partition(self, parent, table, month, local_constraints=True):
+        column, is_timestamp = PARTITIONED_TABLES[table]
+        name = partition_name(table, month)
+        # DDL cannot take bind parameters; the bounds are generated ISO strings.
+        low = partition_bound(month, is_timestamp)
+        high = partition_bound(add_months(month, 1), is_timestamp)
+        self.run_sql(
+            f"CREATE TABLE {qn(name)} PARTITION OF {qn(parent)} "
+            f"FOR VALUES FROM ('{low}') TO ('{high}')"
+        )
+        if local_constraints:
+            self.add_local_constraints(table, name)
+        return name
+
+    def add_local_constraints(self, table, partition):
+        for conname, template in LOCAL_CONSTRAINTS.get(table, {}).items():
+            self.run_sql(template.format(table=qn(partition), name=qn(f"{partition}_{conname}")))
+
+    # -----------------------------
+    # SETUP
+    # -----------------------------
+    def handle_setup(self, ahead, **options):
+        current = month_start(timezone.localdate())
+        for table in PARTITIONED_TABLES:
+            if self.is_partitioned(table):
+                self.stdout.write(f"{table} is already partitioned.")
+                continue
+            with transaction.atomic():
+                self.convert_table(table, current, ahead)
+            self.stdout.write(self.style.SUCCESS(f"{table} converted to monthly partitions."))
+
+    def convert_table(self, table, current, ahead):
+        column, _ = PARTITIONED_TABLES[table]
+        staging = f"{table}_partitioned"
+        attnum = self.fetch_sql(
+            "SELECT attnum FROM pg_attribute WHERE attrelid = %s::regclass AND attname = %s",
+            [table, column],
+        )[0][0]
+
+        # (name, definition, target table, is unique without the partition column)
+        constraints = self.fetch_sql(
+            "SELECT conname, pg_get_constraintdef(oid), confrelid::regclass::text, "
+            "contype IN ('u', 'x') AND NOT %s = ANY(conkey) "
+            "FROM pg_constraint WHERE conrelid = %s::regclass AND contype IN ('u', 'x', 'c', 'f')",
+            [attnum, table],
+        )
+        indexes = self.fetch_sql(
+            "SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique AND NOT %s = ANY(i.indkey) "
+            "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = %s::regclass "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)",
+            [attnum, table],
+        )
+        local = {name for name, _, _, is_local in constraints if is_local}
+        local |= {name for name, _, is_local in indexes if is_local}
+        unknown = local - set(LOCAL_CONSTRAINTS.get(table, {}))
+        if unknown:
+            raise CommandError(
+                f"{table} has unique constraints without {column} that cannot be kept per partition: "
+                f"{', '.join(sorted(unknown))}. Add them to LOCAL_CONSTRAINTS first."
+            )
+
+        # A plain id can no longer be unique across partitions, so foreign
+        # keys pointing at this table have to go.
+        referencing = self.fetch_sql(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE confrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        unexpected = [conname for ref_table, conname in referencing if ref_table not in PARTITIONED_TABLES]
+        if unexpected:
+            raise CommandError(f"Foreign keys outside the partitioned tables point at {table}: {', '.join(unexpected)}.")
+
+        self.run_sql(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        for ref_table, conname in referencing:
+            self.run_sql(f"ALTER TABLE {qn(ref_table)} DROP CONSTRAINT {qn(conname)}")
+            self.stdout.write(self.style.WARNING(f"Dropped foreign key {conname} on {ref_table}."))
+
+        first, last = current, add_months(current, ahead)
+        bounds = self.fetch_sql(f"SELECT min({qn(column)}), max({qn(column)}) FROM {qn(table)}")[0]
+        if bounds[0] is not None:
+            low, high = (
+                timezone.localtime(value).date() if isinstance(value, datetime) else value
+                for value in bounds
+            )
+            first = min(first, month_start(low))
+            last = max(last, month_start(high))
+
+        self.run_sql(
+            f"CREATE TABLE {qn(staging)} (LIKE {qn(table)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({qn(column)})"
+        )
+        # a serial default would still belong to the old table's sequence
+        self.run_sql(f"ALTER TABLE {qn(staging)} ALTER COLUMN id DROP DEFAULT")
+        partitions = []
+        month = first
+        while month <= last:
+            partitions.append(self.create_partition(staging, table, month, local_constraints=False))
+            month = add_months(month, 1)
+
+        self.run_sql(f"INSERT INTO {qn(staging)} SELECT * FROM {qn(table)}")
+        self.run_sql(f"DROP TABLE {qn(table)}")
+        self.run_sql(f"ALTER TABLE {qn(staging)} RENAME TO {qn(table)}")
+
+        self.run_sql(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + '_pkey')} PRIMARY KEY (id, {qn(column)})")
+        for conname, definition, target, _ in constraints:
+            if target in PARTITIONED_TABLES or conname in local:
+                continue
+            self.run_sql(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(conname)} {definition}")
+        for name, definition, _ in indexes:
+            if name not in local:
+                self.run_sql(definition)
+        # built after the copy, which is faster than checking row by row
+        for partition in partitions:
+            self.add_local_constraints(table, partition)
+
+        sequence = f"{table}_id_seq"
+        self.run_sql(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id")
+        self.run_sql(
+            f"SELECT setval(%s, COALESCE((SELECT max(id) FROM {qn(table)}), 0) + 1, false)",
+            [sequence],
+        )
+        self.run_sql(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+
+    # -----------------------------
+    # CREATE / LIST
+    # -----------------------------
+    def handle_create(self, ahead, **options):
+        current = month_start(timezone.localdate())
+        for table in PARTITIONED_TABLES:
+            existing = {name for name, _ in self.partitions(table)}
+            for offset in range(ahead + 1):
+                name = partition_name(table, add_months(current, offset))
+                if name not in existing:
+                    self.create_partition(table, table, add_months(current, offset))
+                    self.stdout.write(f"Created {name}")
+
+    def handle_list(self, **options):
+        for table in PARTITIONED_TABLES:
+            for name, _ in self.partitions(table):
+                self.stdout.write(name)
+
+    # -----------------------------
+    # DETACH + ARCHIVE
+    # -----------------------------
+    def handle_detach(self, retain_months, archive_dir, keep_tables, dry_run, **options):
+        cutoff = add_months(month_start(timezone.localdate()), -retain_months)
+        archive_dir = Path(archive_dir)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+
+        for table in PARTITIONED_TABLES:
+            for name, month in self.partitions(table):
+                if month >= cutoff:
+                    continue
+                if dry_run:
+                    self.stdout.write(f"Would archive {name}")
+                    continue
+
+                path = archive_dir / f"{name}.csv.gz"
+                with transaction.atomic():
+                    self.run_sql(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+                    with gzip.open(path, "wb") as fh:
+                        self.copy_out(f"COPY {qn(name)} TO STDOUT WITH (FORMAT csv, HEADER true)", fh)
+                    if not keep_tables:
+                        self.run_sql(f"DROP TABLE {qn(name)}")
+                self.stdout.write(self.style.SUCCESS(f"Archived {name} -> {path}"))
+
+    def handle_restore(self, archive, **options):
+        path = Path(archive)
+        if not path.exists():
+            raise CommandError(f"Archive {path} not found.")
+
+        match = PARTITION_NAME_RE.match(path.name.split(".")[0])
+        if not match or match["table"] not in PARTITIONED_TABLES:
+            raise CommandError(f"Cannot tell which partition {path.name} belongs to.")
+        table = match["table"]
+        month = date(int(match["year"]), int(match["month"]), 1)
+
+        with gzip.open(path, "rt", newline="") as fh:
+            header = fh.readline().strip()
+        columns = ", ".join(qn(col) for col in header.split(","))
+
+        with transaction.atomic():
+            name = partition_name(table, month)
+            if self.fetch_sql("SELECT to_regclass(%s)", [name])[0][0]:
+                raise CommandError(f"Partition {name} already exists.")
+            self.create_partition(table, table, month)
+            with gzip.open(path, "rb") as fh:
+                self.copy_in(f"COPY {qn(name)} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)", fh)
+        self.stdout.write(self.style.SUCCESS(f"Restored {name} from {path}"))
+
+    # psycopg2 and psycopg 3 expose COPY differently.
+    def copy_out(self, sql, fh):
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, "copy_expert"):
+                raw.copy_expert(sql, fh)
+                return
+            with raw.copy(sql) as copy:
+                for block in copy:
+                    fh.write(block)
+
+    def copy_in(self, sql, fh):
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, "copy_expert"):
+                raw.copy_expert(sql, fh, size=COPY_BLOCK_SIZE)
+                return
+            with raw.copy(sql) as copy:
+                while block := fh.read(COPY_BLOCK_SIZE):
+                    copy.write(block)
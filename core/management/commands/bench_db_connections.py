@@ -0,0 +1,115 @@
+import copy
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+
+# stands in for the handful of indexed lookups a page does
+REQUEST_SQL = "SELECT id, employee_id FROM core_employee ORDER BY id LIMIT 1"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request database latency (request_started cleanup, one query, request_finished "
+        "cleanup) for each strategy in DB_CONNECTION_PROFILES against the default PostgreSQL database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=1, help="Worker threads issuing requests.")
+        parser.add_argument("--strategy", action="append", choices=sorted(settings.DB_CONNECTION_PROFILES),
+                            help="Limit to these strategies (repeatable).")
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != "postgresql":
+            raise CommandError("The connection benchmark needs PostgreSQL.")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+
+        strategies = options["strategy"] or list(settings.DB_CONNECTION_PROFILES)
+        self.stdout.write(
+            f"{'strategy':<12}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'mean (ms)':>11}"
+            f"{'req/s':>10}{'connects':>10}"
+        )
+        for strategy in strategies:
+            samples, elapsed, connects = self.run_strategy(strategy, options["requests"], options["concurrency"])
+            samples.sort()
+            self.stdout.write(
+                f"{strategy:<12}{statistics.median(samples):>10.2f}{self.percentile(samples, 0.95):>10.2f}"
+                f"{self.percentile(samples, 0.99):>10.2f}{statistics.fmean(samples):>11.2f}"
+                f"{len(samples) / elapsed:>10.0f}{connects:>10}"
+            )
+
+    @staticmethod
+    def percentile(samples, fraction):
+        return samples[max(0, int(len(samples) * fraction) - 1)]
+
+    def settings_for(self, strategy):
+        settings_dict = copy.deepcopy(connections.settings[DEFAULT_DB_ALIAS])
+        settings_dict["OPTIONS"].pop("pool", None)
+        profile = copy.deepcopy(settings.DB_CONNECTION_PROFILES[strategy])
+        settings_dict["OPTIONS"].update(profile.pop("OPTIONS", {}))
+        settings_dict.update(profile)
+        return settings_dict
+
+    def run_strategy(self, strategy, count, concurrency):
+        alias = f"bench_{strategy}"
+        settings_dict = self.settings_for(strategy)
+        wrapper_class = type(connections[DEFAULT_DB_ALIAS])
+
+        # each thread gets its own wrapper, as each request thread does in Django
+        local = threading.local()
+        wrappers = []
+        lock = threading.Lock()
+        connects = 0
+
+        def wrapper():
+            if not hasattr(local, "wrapper"):
+                local.wrapper = wrapper_class(settings_dict, alias)
+                with lock:
+                    wrappers.append(local.wrapper)
+            return local.wrapper
+
+        def on_connect(sender, connection, **kwargs):
+            nonlocal connects
+            if connection.alias == alias:
+                with lock:
+                    connects += 1
+
+        def one_request(_):
+            db = wrapper()
+            start = time.perf_counter()
+            db.close_if_unusable_or_obsolete()
+            with db.cursor() as cursor:
+                cursor.execute(REQUEST_SQL)
+                cursor.fetchall()
+            db.close_if_unusable_or_obsolete()
+            return (time.perf_counter() - start) * 1000
+
+        connection_created.connect(on_connect)
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                samples = list(executor.map(one_request, range(count)))
+            elapsed = time.perf_counter() - start
+        finally:
+            connection_created.disconnect(on_connect)
+            pool = wrappers[0].pool if wrappers else None
+            if pool is not None:
+                # Django reports every checkout as a new connection; the
+                # pool knows how many it really opened
+                connects = pool.get_stats().get("connections_num", 0)
+            for db in wrappers:
+                # opened in the worker threads, closed from this one
+                db.inc_thread_sharing()
+                db.close()
+                db.dec_thread_sharing()
+            if pool is not None:
+                wrappers[0].close_pool()
+        return samples, elapsed, connects
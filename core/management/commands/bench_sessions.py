@@ -0,0 +1,77 @@
+import statistics
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+
+# Session caches are shared with the running site, so the benchmark keeps
+# its keys apart and deletes only the session it created.
+BENCH_KEY_PREFIX = "bench_sessions."
+
+
+def bench_store(store_class):
+    if not hasattr(store_class, "cache_key_prefix"):
+        return store_class
+    return type(
+        f"Bench{store_class.__name__}", (store_class,),
+        {"cache_key_prefix": BENCH_KEY_PREFIX + store_class.cache_key_prefix},
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request session overhead (load the session, read employee_id) "
+        "of each backend in SESSION_ENGINES, plus the cost of a login write and a logout flush."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--backend", action="append", choices=sorted(settings.SESSION_ENGINES),
+                            help="Limit to these backends (repeatable).")
+
+    def handle(self, *args, **options):
+        backends = options["backend"] or list(settings.SESSION_ENGINES)
+        count = options["requests"]
+        if count < 1:
+            raise CommandError("--requests must be at least 1.")
+
+        self.stdout.write(f"{'backend':<16}{'login (us)':>12}{'request p50 (us)':>18}{'request p95 (us)':>18}{'logout (us)':>13}")
+        for name in backends:
+            engine = settings.SESSION_ENGINES[name]
+            with override_settings(SESSION_ENGINE=engine):
+                login, samples, logout = self.run_backend(bench_store(import_module(engine).SessionStore), count)
+            samples.sort()
+            self.stdout.write(
+                f"{name:<16}{login:>12.1f}{statistics.median(samples):>18.1f}"
+                f"{samples[int(len(samples) * 0.95) - 1]:>18.1f}{logout:>13.1f}"
+            )
+
+    def run_backend(self, store_class, count):
+        # employee_login; a new session key is never cached yet
+        start = time.perf_counter()
+        store = store_class()
+        store["employee_id"] = 1
+        store.save()
+        login = (time.perf_counter() - start) * 1e6
+        session_key = store.session_key
+
+        try:
+            # @employee_login_required on every page: a fresh store per request
+            samples = []
+            for _ in range(count):
+                start = time.perf_counter()
+                request_store = store_class(session_key)
+                request_store.get("employee_id")
+                samples.append((time.perf_counter() - start) * 1e6)
+
+            # employee_logout
+            start = time.perf_counter()
+            store_class(session_key).flush()
+            logout = (time.perf_counter() - start) * 1e6
+        finally:
+            if session_key:
+                store_class().delete(session_key)
+        return login, samples, logout
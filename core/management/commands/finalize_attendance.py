@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.attendance import finalize_attendance
+
+
+class Command(BaseCommand):
+    help = (
+        "Close attendance days that never went through logout: end dangling breaks, "
+        "write logout time and totals, and flag the rows as auto-closed. Run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            type=date.fromisoformat,
+            default=None,
+            help="Finalize days before this date (YYYY-MM-DD). Defaults to today.",
+        )
+
+    def handle(self, *args, **options):
+        before = options["before"] or timezone.localdate()
+        closed_breaks, finalized = finalize_attendance(before)
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {closed_breaks} break session(s), finalized {finalized} attendance row(s) before {before}."
+        ))
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired rows from django_session in small batches, so the purge never "
+        "holds a long lock against logins. Run daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith("signed_cookies"):
+            self.stdout.write("Signed-cookie sessions keep nothing on the server; nothing to purge.")
+            return
+
+        now = timezone.now()
+        batch_size = options["batch_size"]
+        total = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .order_by()
+                .values_list("session_key", flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            self.stdout.write(f"Deleted {total} expired session(s) so far...")
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} expired session(s)."))
@@ -0,0 +1,24 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.counters import rebuild_daily_counters
+
+
+class Command(BaseCommand):
+    help = "Recount the per-department daily attendance counters from the attendance table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day (YYYY-MM-DD). Defaults to --start.")
+
+    def handle(self, *args, **options):
+        start = options["start"] or timezone.localdate()
+        end = options["end"] or start
+        if end < start:
+            raise CommandError("--end must not be before --start.")
+
+        days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+        count = rebuild_daily_counters(days)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} counter row(s) for {start} to {end}."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Attendance
+from core.presence_bitmaps import rebuild_presence_bitmaps
+
+
+class Command(BaseCommand):
+    help = "Rebuild the yearly presence bitmaps from the attendance rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("years", nargs="*", type=int, help="Years to rebuild. Defaults to the current year.")
+        parser.add_argument("--all", action="store_true", help="Rebuild every year that has attendance.")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            years = sorted(d.year for d in Attendance.objects.dates("date", "year"))
+        else:
+            years = options["years"] or [timezone.localdate().year]
+
+        for year in years:
+            count = rebuild_presence_bitmaps(year)
+            self.stdout.write(f"{year}: {count} employee bitmap(s)")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt presence bitmaps for {len(years)} year(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.announcements import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute every employee's unread announcement counter from the read receipts."
+
+    def handle(self, *args, **options):
+        count = rebuild_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt unread counters for {count} employee(s)."))
@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.attendance import RECOMPUTED_FIELDS, recompute_attendance, recompute_queryset
+from core.counters import rebuild_daily_counters
+from core.models import Department
+
+
+def _init_worker():
+    import django
+    django.setup()
+    # never reuse a connection inherited from the parent process
+    connections.close_all()
+
+
+def _run_chunk(chunk, dry_run):
+    start, end, department_id, no_department = chunk
+    qs = recompute_queryset(start, end, department_id=department_id, no_department=no_department)
+    return recompute_attendance(qs, dry_run=dry_run)
+
+
+def _run_chunk_in_worker(chunk, dry_run):
+    # only pool workers drop their connection; in-process runs keep the caller's
+    try:
+        return _run_chunk(chunk, dry_run)
+    finally:
+        connections.close_all()
+
+
+def _describe(chunk):
+    start, end, department_id, no_department = chunk
+    scope = "no department" if no_department else f"department {department_id}" if department_id else "all departments"
+    return f"{start}..{end}, {scope}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute total_hours, break_time, net_working_hours and late_by for a date "
+        "range from login/logout times and break sessions, in parallel chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("start", type=date.fromisoformat, help="First date (YYYY-MM-DD).")
+        parser.add_argument("end", type=date.fromisoformat, help="Last date (YYYY-MM-DD).")
+        parser.add_argument("--split", choices=["department", "date"], default="department")
+        parser.add_argument("--chunk-days", type=int, default=7, help="Days per chunk with --split date.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--dry-run", action="store_true", help="Show the rows that would change.")
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if end < start:
+            raise CommandError("end must not be before start.")
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days must be at least 1.")
+
+        chunks = self.build_chunks(start, end, options["split"], options["chunk_days"])
+        workers = max(1, min(options["workers"], len(chunks)))
+        if connection.vendor == "sqlite" and workers > 1:
+            self.stdout.write("SQLite allows one writer at a time; running with a single worker.")
+            workers = 1
+
+        dry_run = options["dry_run"]
+        total = 0
+        if workers == 1:
+            for index, chunk in enumerate(chunks, 1):
+                total += self.report(index, len(chunks), chunk, _run_chunk(chunk, dry_run), dry_run)
+        else:
+            # children open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = {pool.submit(_run_chunk_in_worker, chunk, dry_run): chunk for chunk in chunks}
+                for index, future in enumerate(as_completed(futures), 1):
+                    total += self.report(index, len(chunks), futures[future], future.result(), dry_run)
+
+        if not dry_run:
+            # late_by may have moved, which the daily "late" counters follow
+            rebuild_daily_counters(start + timedelta(days=n) for n in range((end - start).days + 1))
+
+        verb = "would change" if dry_run else "recomputed"
+        self.stdout.write(self.style.SUCCESS(f"{total} attendance row(s) {verb}."))
+
+    def build_chunks(self, start, end, split, chunk_days):
+        if split == "department":
+            chunks = [(start, end, dept_id, False) for dept_id in Department.objects.values_list("id", flat=True)]
+            chunks.append((start, end, None, True))
+            return chunks
+
+        chunks = []
+        day = start
+        while day <= end:
+            last = min(end, day + timedelta(days=chunk_days - 1))
+            chunks.append((day, last, None, False))
+            day = last + timedelta(days=1)
+        return chunks
+
+    def report(self, index, count, chunk, result, dry_run):
+        if not dry_run:
+            self.stdout.write(f"[{index}/{count}] {_describe(chunk)}: {result} row(s)")
+            return result
+
+        self.stdout.write(f"[{index}/{count}] {_describe(chunk)}: {len(result)} row(s) differ")
+        for row in result:
+            changes = ", ".join(
+                f"{name}: {row[name]} -> {row['new_' + name]}"
+                for name in RECOMPUTED_FIELDS
+                if row[name] != row["new_" + name]
+            )
+            self.stdout.write(f"  {row['employee__employee_id']} {row['date']}: {changes}")
+        return len(result)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Meeting
+from core.scheduling import room_double_bookings
+
+
+def describe(meeting):
+    return (
+        f"meeting {meeting.pk} \"{meeting.title}\" ({meeting.date} "
+        f"{meeting.start_time:%H:%M}-{meeting.end_time:%H:%M}, {meeting.location})"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "List offline meetings that double-book a room, which migration 0013 refuses to "
+        "constrain. With --cancel-later, cancel the later booking of every clash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cancel-later", action="store_true",
+            help="Cancel each clashing meeting that was booked after the one it clashes with.",
+        )
+
+    def handle(self, *args, **options):
+        clashes = room_double_bookings()
+        for meeting, other in clashes:
+            self.stdout.write(f"{describe(meeting)} clashes with {describe(other)}")
+        if not clashes:
+            self.stdout.write(self.style.SUCCESS("No room is double-booked."))
+            return
+
+        if not options["cancel_later"]:
+            self.stdout.write(
+                f"{len(clashes)} clash(es). Reschedule or cancel them, or rerun with --cancel-later."
+            )
+            return
+
+        Meeting.objects.filter(pk__in=[meeting.pk for meeting, _ in clashes]).update(status="Cancelled")
+        self.stdout.write(self.style.SUCCESS(f"Cancelled {len(clashes)} later booking(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.announcements import deactivate_expired_announcements
+
+
+class Command(BaseCommand):
+    help = "Deactivate expired announcements in bulk so the active feed query stays small. Run daily."
+
+    def handle(self, *args, **options):
+        count = deactivate_expired_announcements()
+        self.stdout.write(self.style.SUCCESS(f"Deactivated {count} expired announcement(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.meetings import complete_finished_meetings
+
+
+class Command(BaseCommand):
+    help = 'Mark every scheduled meeting that has already ended as "Completed". Run every few minutes or hourly.'
+
+    def handle(self, *args, **options):
+        count = complete_finished_meetings()
+        self.stdout.write(self.style.SUCCESS(f"Completed {count} finished meeting(s)."))
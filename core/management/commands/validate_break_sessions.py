@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.breaks import ANOMALIES, recent_range, validate_break_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Check recent break sessions for overlaps, open sessions left behind, breaks before login "
+        "and stale durations, and repair them. Run nightly after finalize_attendance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Days back from yesterday to scan (default BREAK_VALIDATION_DAYS).")
+        parser.add_argument("--start", type=date.fromisoformat, help="First day to scan (YYYY-MM-DD).")
+        parser.add_argument("--end", type=date.fromisoformat, help="Last day to scan (YYYY-MM-DD).")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be repaired.")
+
+    def handle(self, *args, **options):
+        start, end = recent_range(options["days"])
+        start, end = options["start"] or start, options["end"] or end
+
+        report = validate_break_sessions(start, end, repair=not options["dry_run"])
+
+        for row in report["anomalies"]:
+            self.stdout.write(
+                f"{row['date']}  {row['employee_id']:<12} session {row['session']}: {ANOMALIES[row['kind']]}"
+            )
+        summary = ", ".join(f"{count} {kind}" for kind, count in sorted(report["counts"].items())) or "none"
+        verb = "Repaired" if report["repaired"] else "Found"
+        self.stdout.write(self.style.SUCCESS(
+            f"{start} to {end}: {report['sessions']} session(s) on {report['days']} day(s). {verb}: {summary}."
+        ))
@@ -0,0 +1,148 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import stamp_versions
+from .models import Employee, Meeting, MeetingVisibility
+
+
+VISIBILITY_BATCH_SIZE = 1000
+
+
+def employee_meetings_version(employee_id):
+    return f"meetings:emp:{employee_id}"
+
+
+def department_meetings_version(department_id):
+    return f"meetings:dept:{department_id}"
+
+
+def touch_meeting_versions(employee_ids=(), department_ids=()):
+    """Mark the meeting lists (and calendar feeds) of these employees / departments as changed."""
+    stamp_versions(
+        *(employee_meetings_version(pk) for pk in set(employee_ids)),
+        *(department_meetings_version(pk) for pk in set(department_ids) if pk),
+    )
+
+
+def visible_meetings(employee, since=None):
+    """Meetings the employee takes part in or that belong to their department."""
+    # all visibility lookups go into one filter() so they share a single join
+    lookups = {"visibility__employee": employee}
+    if since is not None:
+        lookups["visibility__date__gte"] = since
+    return (
+        Meeting.objects.filter(**lookups)
+        .select_related("department")
+        .order_by("visibility__date", "visibility__start_time")
+    )
+
+
+def upcoming_meetings_for(employee, today, limit=5):
+    return visible_meetings(employee, since=today).filter(status="Scheduled")[:limit]
+
+
+# -----------------------------
+# PARTICIPANT EXPANSION
+# -----------------------------
+def expand_attendees(participant_ids=(), department_ids=(), role_ids=()):
+    """Employee ids of the picked participants plus every active member of the departments / roles."""
+    employee_ids = set(participant_ids)
+    group = Q()
+    if department_ids:
+        group |= Q(department_id__in=department_ids)
+    if role_ids:
+        group |= Q(role_id__in=role_ids)
+    if group:
+        employee_ids.update(Employee.objects.filter(group, is_active=True).values_list("id", flat=True))
+    return employee_ids
+
+
+def set_participants(meeting, employee_ids):
+    """
+    Replace the meeting's participants with one DELETE and one batched
+    INSERT into the through table, then rebuild its visibility rows.
+    """
+    through = Meeting.participants.through
+    with transaction.atomic():
+        through.objects.filter(meeting=meeting).exclude(employee_id__in=employee_ids).delete()
+        through.objects.bulk_create(
+            [through(meeting_id=meeting.pk, employee_id=pk) for pk in employee_ids],
+            batch_size=VISIBILITY_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # bulk_create does not send m2m_changed
+        rebuild_meeting_visibility(meeting)
+
+
+# -----------------------------
+# MAINTENANCE
+# -----------------------------
+def rebuild_meeting_visibility(meeting):
+    employee_ids = set(meeting.participants.values_list("id", flat=True))
+    if meeting.department_id:
+        employee_ids.update(Employee.objects.filter(department_id=meeting.department_id).values_list("id", flat=True))
+
+    with transaction.atomic():
+        previous = set(MeetingVisibility.objects.filter(meeting=meeting).values_list("employee_id", flat=True))
+        MeetingVisibility.objects.filter(meeting=meeting).delete()
+        MeetingVisibility.objects.bulk_create(
+            [
+                MeetingVisibility(employee_id=pk, meeting=meeting, date=meeting.date, start_time=meeting.start_time)
+                for pk in employee_ids
+            ],
+            batch_size=VISIBILITY_BATCH_SIZE,
+        )
+    touch_meeting_versions(previous | employee_ids, [meeting.department_id])
+
+
+def rebuild_employee_visibility(employee):
+    meetings = Meeting.objects.filter(participants=employee).values_list("id", "date", "start_time")
+    rows = {pk: (day, start) for pk, day, start in meetings}
+    if employee.department_id:
+        for pk, day, start in Meeting.objects.filter(department_id=employee.department_id).values_list(
+            "id", "date", "start_time"
+        ):
+            rows[pk] = (day, start)
+
+    with transaction.atomic():
+        MeetingVisibility.objects.filter(employee=employee).delete()
+        MeetingVisibility.objects.bulk_create(
+            [
+                MeetingVisibility(employee=employee, meeting_id=pk, date=day, start_time=start)
+                for pk, (day, start) in rows.items()
+            ],
+            batch_size=VISIBILITY_BATCH_SIZE,
+        )
+    touch_meeting_versions([employee.pk])
+
+
+# -----------------------------
+# LIFECYCLE SWEEPER
+# -----------------------------
+def complete_finished_meetings(now=None):
+    """
+    Move every scheduled meeting that has ended to "Completed" with one
+    UPDATE. Keeps the scheduled-meetings partial index down to what is
+    actually upcoming. Returns the number of meetings moved.
+    """
+    now = timezone.localtime(now or timezone.now())
+    finished = Meeting.objects.filter(
+        Q(date__lt=now.date()) | Q(date=now.date(), end_time__lte=now.time()),
+        status="Scheduled",
+    )
+
+    with transaction.atomic():
+        meeting_ids = list(finished.values_list("id", flat=True))
+        if not meeting_ids:
+            return 0
+        department_ids = set(
+            Meeting.objects.filter(id__in=meeting_ids).values_list("department_id", flat=True)
+        )
+        employee_ids = set(
+            MeetingVisibility.objects.filter(meeting_id__in=meeting_ids).values_list("employee_id", flat=True)
+        )
+        count = Meeting.objects.filter(id__in=meeting_ids, status="Scheduled").update(status="Completed")
+
+    touch_meeting_versions(employee_ids, department_ids)
+    return count
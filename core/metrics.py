@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import connections
+
+
+# (metric, type, help, value from psycopg_pool's get_stats()). Counters the
+# pool has not touched yet are missing from the stats and read as 0.
+POOL_METRICS = (
+    ("etams_db_pool_size", "gauge", "Connections open in the pool.",
+     lambda s: s.get("pool_size", 0)),
+    ("etams_db_pool_max", "gauge", "Largest size the pool may grow to.",
+     lambda s: s.get("pool_max", 0)),
+    ("etams_db_pool_in_use", "gauge", "Connections checked out by requests.",
+     lambda s: s.get("pool_size", 0) - s.get("pool_available", 0)),
+    ("etams_db_pool_waiting", "gauge", "Requests waiting for a free connection.",
+     lambda s: s.get("requests_waiting", 0)),
+    ("etams_db_pool_requests_total", "counter", "Connections handed out.",
+     lambda s: s.get("requests_num", 0)),
+    ("etams_db_pool_queued_total", "counter", "Requests that had to wait for a connection.",
+     lambda s: s.get("requests_queued", 0)),
+    ("etams_db_pool_wait_seconds_total", "counter", "Time requests spent waiting for a connection.",
+     lambda s: s.get("requests_wait_ms", 0) / 1000),
+    ("etams_db_pool_timeouts_total", "counter", "Requests that gave up waiting for a connection.",
+     lambda s: s.get("requests_errors", 0)),
+    ("etams_db_pool_connections_total", "counter", "Connections the pool opened.",
+     lambda s: s.get("connections_num", 0)),
+    ("etams_db_pool_connections_lost_total", "counter", "Connections dropped by the health check or returned broken.",
+     lambda s: s.get("connections_lost", 0) + s.get("returns_bad", 0)),
+)
+
+
+def pool_stats():
+    """{alias: stats} for every database of this process that uses a connection pool."""
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        if connection.vendor == "postgresql" and connection.settings_dict["OPTIONS"].get("pool"):
+            stats[alias] = connection.pool.get_stats()
+    return stats
+
+
+def render_metrics():
+    """The metrics of this worker process in the Prometheus text format."""
+    lines = [
+        "# HELP etams_db_connections_strategy Connection strategy in use (ETAMS_DB_CONNECTIONS).",
+        "# TYPE etams_db_connections_strategy gauge",
+        f'etams_db_connections_strategy{{strategy="{settings.DB_CONNECTIONS}"}} 1',
+    ]
+    stats = pool_stats()
+    for name, kind, help_text, value in POOL_METRICS if stats else ():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for alias, alias_stats in stats.items():
+            lines.append(f'{name}{{database="{alias}"}} {value(alias_stats):g}')
+    return "\n".join(lines) + "\n"
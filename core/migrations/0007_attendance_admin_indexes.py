@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_breaksession_options_announcement_itreport_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date'], name='attendance_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='breaksession',
+            index=models.Index(fields=['start_at'], name='breaksession_start_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_attendance_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='auto_closed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_attendance_auto_closed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PunchDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('api_key', models.CharField(max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PunchEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('batch_id', models.UUIDField(db_index=True)),
+                ('kind', models.CharField(choices=[('login', 'Login'), ('break_start', 'Break start'), ('break_end', 'Break end'), ('logout', 'Logout')], max_length=20)),
+                ('occurred_at', models.DateTimeField()),
+                ('work_date', models.DateField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='events', to='core.punchdevice')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='punch_events', to='core.employee')),
+            ],
+            options={
+                'ordering': ['occurred_at'],
+                'indexes': [models.Index(fields=['employee', 'work_date'], name='punchevent_emp_day_idx')],
+            },
+        ),
+    ]
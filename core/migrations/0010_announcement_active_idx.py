@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_punch_devices'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='announcement_active_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_visibility(apps, schema_editor):
+    Meeting = apps.get_model('core', 'Meeting')
+    Employee = apps.get_model('core', 'Employee')
+    MeetingVisibility = apps.get_model('core', 'MeetingVisibility')
+
+    dept_members = {}
+    for pk, dept_id in Employee.objects.exclude(department_id=None).values_list('id', 'department_id'):
+        dept_members.setdefault(dept_id, []).append(pk)
+
+    rows = []
+    for meeting in Meeting.objects.prefetch_related('participants'):
+        employee_ids = {p.id for p in meeting.participants.all()}
+        employee_ids.update(dept_members.get(meeting.department_id, []))
+        rows += [
+            MeetingVisibility(employee_id=pk, meeting_id=meeting.id, date=meeting.date, start_time=meeting.start_time)
+            for pk in employee_ids
+        ]
+    MeetingVisibility.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_announcement_receipts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeetingVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meeting_visibility', to='core.employee')),
+                ('meeting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='core.meeting')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'date', 'start_time'], name='meetingvis_emp_date_idx')],
+                'unique_together': {('employee', 'meeting')},
+            },
+        ),
+        migrations.RunPython(backfill_visibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:18
+
+from collections import defaultdict
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+from django.db.models import F
+
+
+CONSTRAINT_SQL = """
+ALTER TABLE core_meeting ADD CONSTRAINT meeting_room_no_overlap EXCLUDE USING gist (
+    lower(location) WITH =,
+    tsrange(date + start_time, date + end_time, '[)') WITH &&
+) WHERE (
+    status <> 'Cancelled'
+    AND mode = 'Offline'
+    AND location IS NOT NULL
+    AND location <> ''
+    AND end_time > start_time
+);
+"""
+
+
+def double_bookings(Meeting):
+    # Frozen copy of core.scheduling.room_double_bookings.
+    bookings = (
+        Meeting.objects.filter(mode='Offline', end_time__gt=F('start_time'))
+        .exclude(status='Cancelled')
+        .exclude(location__isnull=True)
+        .exclude(location='')
+        .order_by('created_at', 'id')
+    )
+    kept = defaultdict(list)
+    clashes = []
+    for meeting in bookings.iterator(chunk_size=2000):
+        booked = kept[meeting.location.lower(), meeting.date]
+        other = next(
+            (m for m in booked if m.start_time < meeting.end_time and meeting.start_time < m.end_time),
+            None,
+        )
+        if other is None:
+            booked.append(meeting)
+        else:
+            clashes.append((meeting, other))
+    return clashes
+
+
+def add_room_exclusion(apps, schema_editor):
+    # Range exclusion constraints are PostgreSQL only; other databases rely
+    # on the conflict check in MeetingForm.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Nothing prevented double-booking before this constraint, and an
+    # exclusion constraint cannot be added NOT VALID. Existing clashes are
+    # users' meetings, so they are reported for the operator to resolve
+    # (manage.py resolve_room_clashes) rather than cancelled here.
+    clashes = double_bookings(apps.get_model('core', 'Meeting'))
+    if clashes:
+        lines = [
+            f"  meeting {m.pk} {m.title!r} ({m.date} {m.start_time:%H:%M}-{m.end_time:%H:%M}, {m.location}) "
+            f"clashes with meeting {other.pk} {other.title!r} ({other.start_time:%H:%M}-{other.end_time:%H:%M})"
+            for m, other in clashes
+        ]
+        raise RuntimeError(
+            f"Cannot add meeting_room_no_overlap: {len(clashes)} offline meeting(s) double-book a room.\n"
+            + "\n".join(lines)
+            + "\nReschedule or cancel them, or run 'manage.py resolve_room_clashes --cancel-later', then migrate again."
+        )
+    schema_editor.execute(CONSTRAINT_SQL)
+
+
+def remove_room_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE core_meeting DROP CONSTRAINT IF EXISTS meeting_room_no_overlap")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_meeting_visibility'),
+    ]
+
+    operations = [
+        # For "lower(location) WITH =" (and breaksession_no_overlap in 0020).
+        # No-op outside PostgreSQL. Creating the extension needs a superuser,
+        # or on PostgreSQL 13+ a role with CREATE on the database, as
+        # btree_gist is a trusted extension; otherwise have a superuser run
+        # "CREATE EXTENSION btree_gist" in the database before migrating.
+        BtreeGistExtension(),
+        migrations.RunPython(add_room_exclusion, remove_room_exclusion),
+    ]
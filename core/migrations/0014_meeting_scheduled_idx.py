@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_meeting_room_exclusion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(condition=models.Q(('status', 'Scheduled')), fields=['date', 'start_time'], name='meeting_scheduled_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:21
+
+import datetime
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_meeting_scheduled_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('start_time', models.TimeField(default=datetime.time(10, 0), help_text='Login allowed from')),
+                ('grace_time', models.TimeField(default=datetime.time(10, 10), help_text='No lateness counted until')),
+                ('min_hours', models.DurationField(default=datetime.timedelta(seconds=28800), help_text='Total time before logout is allowed')),
+                ('break_limit', models.DurationField(default=datetime.timedelta(seconds=3600))),
+                ('working_days', models.CharField(default='01234', help_text='Weekday numbers, Monday=0 ... Sunday=6, e.g. 01234', max_length=7, validators=[django.core.validators.RegexValidator('^[0-6]{1,7}$', 'Use weekday numbers, Monday=0 ... Sunday=6.')])),
+                ('department', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shift_policy', to='core.department')),
+                ('role', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shift_policy', to='core.role')),
+            ],
+            options={
+                'verbose_name_plural': 'shift policies',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_holidays'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('on_break', models.PositiveIntegerField(default=0)),
+                ('logged_out', models.PositiveIntegerField(default=0)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_counters', to='core.department')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'department'), name='daily_counter_department_uniq'), models.UniqueConstraint(condition=models.Q(('department__isnull', True)), fields=('date',), name='daily_counter_no_department_uniq')],
+            },
+        ),
+    ]
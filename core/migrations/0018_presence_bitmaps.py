@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:30
+
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_daily_attendance_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PresenceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('present', models.BinaryField(default=core.models.empty_year_bitmap)),
+                ('absent', models.BinaryField(default=core.models.empty_year_bitmap)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presence_bitmaps', to='core.employee')),
+            ],
+            options={
+                'unique_together': {('employee', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_presence_bitmaps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
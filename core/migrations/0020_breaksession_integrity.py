@@ -0,0 +1,121 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:36
+
+from datetime import datetime
+from itertools import groupby
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# btree_gist (for "attendance_id WITH =") is installed by migration 0013.
+POSTGRES_SQL = """
+ALTER TABLE core_breaksession ADD CONSTRAINT breaksession_no_overlap EXCLUDE USING gist (
+    attendance_id WITH =,
+    tstzrange(start_at, end_at, '[)') WITH &&
+) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+# SQLite has no exclusion constraints; the same rule as triggers. An open
+# session reaches to infinity and zero-length sessions never overlap.
+SQLITE_OVERLAP = """
+(NEW.end_at IS NULL OR NEW.end_at > NEW.start_at) AND EXISTS (
+    SELECT 1 FROM core_breaksession b
+    WHERE b.attendance_id = NEW.attendance_id
+      AND b.id IS NOT NEW.id
+      AND (b.end_at IS NULL OR b.end_at > b.start_at)
+      AND (b.end_at IS NULL OR b.end_at > NEW.start_at)
+      AND (NEW.end_at IS NULL OR NEW.end_at > b.start_at)
+)
+"""
+
+SQLITE_SQL = [
+    f"""
+    CREATE TRIGGER breaksession_no_overlap_insert BEFORE INSERT ON core_breaksession
+    WHEN {SQLITE_OVERLAP}
+    BEGIN SELECT RAISE(ABORT, 'breaksession_no_overlap'); END;
+    """,
+    f"""
+    CREATE TRIGGER breaksession_no_overlap_update BEFORE UPDATE OF attendance_id, start_at, end_at ON core_breaksession
+    WHEN {SQLITE_OVERLAP}
+    BEGIN SELECT RAISE(ABORT, 'breaksession_no_overlap'); END;
+    """,
+]
+
+
+def repair_sessions(sessions, login_at):
+    # Frozen copy of core.breaks.repair_sessions as of this migration:
+    # no end before its start, nothing before login, no overlaps and only
+    # the latest session open. Returns the sessions it changed.
+    changed = []
+    floor = login_at
+    ordered = sorted(sessions, key=lambda bs: bs.start_at)
+    for i, bs in enumerate(ordered):
+        before = (bs.start_at, bs.end_at, bs.duration)
+        if bs.end_at is not None and bs.end_at < bs.start_at:
+            bs.end_at = bs.start_at
+        if bs.end_at is None and i < len(ordered) - 1:
+            bs.end_at = ordered[i + 1].start_at
+        if floor is not None and bs.start_at < floor:
+            bs.start_at = floor
+            if bs.end_at is not None and bs.end_at < bs.start_at:
+                bs.end_at = bs.start_at
+        if bs.end_at is not None:
+            bs.duration = bs.end_at - bs.start_at
+            if floor is None or bs.end_at > floor:
+                floor = bs.end_at
+        if (bs.start_at, bs.end_at, bs.duration) != before:
+            changed.append(bs)
+    return changed
+
+
+def repair_existing(apps, schema_editor):
+    # Existing rows must satisfy the new constraints before they are added.
+    BreakSession = apps.get_model('core', 'BreakSession')
+    rows = BreakSession.objects.select_related('attendance').order_by('attendance_id', 'start_at')
+    changed = []
+    for _, sessions in groupby(rows.iterator(chunk_size=2000), key=lambda bs: bs.attendance_id):
+        sessions = list(sessions)
+        attendance = sessions[0].attendance
+        login_at = None
+        if attendance.login_time is not None:
+            login_at = timezone.make_aware(datetime.combine(attendance.date, attendance.login_time))
+        changed += repair_sessions(sessions, login_at)
+    BreakSession.objects.bulk_update(changed, ['start_at', 'end_at', 'duration'], batch_size=1000)
+
+
+def add_overlap_exclusion(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_SQL)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_SQL:
+            schema_editor.execute(sql)
+
+
+def remove_overlap_exclusion(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE core_breaksession DROP CONSTRAINT IF EXISTS breaksession_no_overlap")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TRIGGER IF EXISTS breaksession_no_overlap_insert")
+        schema_editor.execute("DROP TRIGGER IF EXISTS breaksession_no_overlap_update")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_attendance_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(repair_existing, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='breaksession',
+            constraint=models.UniqueConstraint(condition=models.Q(('end_at__isnull', True)), fields=('attendance',), name='breaksession_one_open'),
+        ),
+        migrations.AddConstraint(
+            model_name='breaksession',
+            constraint=models.CheckConstraint(condition=models.Q(('end_at__isnull', True), ('end_at__gte', models.F('start_at')), _connector='OR'), name='breaksession_end_after_start'),
+        ),
+        migrations.RunPython(add_overlap_exclusion, remove_overlap_exclusion),
+    ]
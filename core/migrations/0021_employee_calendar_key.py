@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:52
+
+import core.models
+from django.db import migrations, models
+
+
+def distinct_keys(apps, schema_editor):
+    # AddField gave every existing employee the same default key
+    Employee = apps.get_model('core', 'Employee')
+    employees = list(Employee.objects.only('pk'))
+    for employee in employees:
+        employee.calendar_key = core.models.new_calendar_key()
+    Employee.objects.bulk_update(employees, ['calendar_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_breaksession_integrity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='calendar_key',
+            field=models.CharField(default=core.models.new_calendar_key, editable=False, max_length=32),
+        ),
+        migrations.RunPython(distinct_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:05
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+COUNTER_FIELDS = ('present', 'absent', 'late', 'on_break', 'logged_out')
+
+
+def backfill_counters(apps, schema_editor):
+    # 0017 created the counters empty, and the views only build the row of
+    # a day they write to, so every earlier day read as zeros. Count all
+    # days once from the attendance table (frozen copy of
+    # core.counters.rebuild_daily_counters). Safe to rerun.
+    Attendance = apps.get_model('core', 'Attendance')
+    DailyAttendanceCounter = apps.get_model('core', 'DailyAttendanceCounter')
+    present = Q(status='Present')
+    grouped = (
+        Attendance.objects.values('date', 'employee__department_id')
+        .annotate(
+            present=Count('id', filter=present),
+            absent=Count('id', filter=Q(status='Absent')),
+            late=Count('id', filter=present & Q(late_by__gt=timedelta())),
+            on_break=Count('id', filter=Q(is_on_break=True, logout_time__isnull=True)),
+            logged_out=Count('id', filter=Q(logout_time__isnull=False)),
+        )
+        .order_by()
+    )
+    DailyAttendanceCounter.objects.all().delete()
+    DailyAttendanceCounter.objects.bulk_create(
+        (
+            DailyAttendanceCounter(
+                date=row['date'],
+                department_id=row['employee__department_id'],
+                **{name: row[name] for name in COUNTER_FIELDS},
+            )
+            for row in grouped.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_employee_calendar_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
-from datetime import timedelta
+from django.db import models, router, transaction
+from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
+from datetime import datetime, time, timedelta
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
+from django.utils.crypto import get_random_string
 
 ROLE_CHOICES = (
     ('ADMIN', 'Admin'),
@@ -23,6 +26,66 @@ class Role(models.Model):
         return self.name
 
 
+class ShiftPolicy(models.Model):
+    """
+    Office timing rules. A policy with a role wins over one with only a
+    department, which wins over the default policy (no department or role).
+    """
+    name = models.CharField(max_length=100)
+    department = models.OneToOneField(Department, on_delete=models.CASCADE, null=True, blank=True, related_name='shift_policy')
+    role = models.OneToOneField('Role', on_delete=models.CASCADE, null=True, blank=True, related_name='shift_policy')
+
+    start_time = models.TimeField(default=time(10, 0), help_text="Login allowed from")
+    grace_time = models.TimeField(default=time(10, 10), help_text="No lateness counted until")
+    min_hours = models.DurationField(default=timedelta(hours=8), help_text="Total time before logout is allowed")
+    break_limit = models.DurationField(default=timedelta(hours=1))
+    working_days = models.CharField(
+        max_length=7,
+        default="01234",
+        validators=[RegexValidator(r'^[0-6]{1,7}$', "Use weekday numbers, Monday=0 ... Sunday=6.")],
+        help_text="Weekday numbers, Monday=0 ... Sunday=6, e.g. 01234",
+    )
+
+    class Meta:
+        verbose_name_plural = "shift policies"
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.department_id and self.role_id:
+            raise ValidationError("Choose a department or a role, not both.")
+        if not self.department_id and not self.role_id:
+            others = ShiftPolicy.objects.filter(department__isnull=True, role__isnull=True).exclude(pk=self.pk)
+            if others.exists():
+                raise ValidationError("A default policy already exists.")
+
+
+class Holiday(models.Model):
+    """A day off for the whole company, or for one department when set."""
+    name = models.CharField(max_length=100)
+    date = models.DateField(db_index=True)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True, related_name='holidays')
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "department"], name="holiday_department_date_uniq"),
+            models.UniqueConstraint(
+                fields=["date"],
+                condition=models.Q(department__isnull=True),
+                name="holiday_company_date_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+
+
+def new_calendar_key():
+    return get_random_string(32)
+
+
 class Employee(models.Model):
     employee_id = models.CharField(max_length=20, unique=True)
     department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True)
@@ -32,9 +95,19 @@ class Employee(models.Model):
     password = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
 
+    # maintained by the announcement fan-out / read receipts
+    unread_announcements = models.PositiveIntegerField(default=0)
+
+    # salts the employee's calendar feed links; rotating it revokes them
+    calendar_key = models.CharField(max_length=32, default=new_calendar_key, editable=False)
+
     def set_password(self, raw_password):
         self.password = make_password(raw_password)
 
+    def rotate_calendar_key(self):
+        self.calendar_key = new_calendar_key()
+        self.save(update_fields=["calendar_key"])
+
     def check_password(self, raw_password):
         return check_password(raw_password, self.password)
 
@@ -82,6 +155,13 @@ class Attendance(models.Model):
     is_on_break = models.BooleanField(default=False)
     break_started_at = models.DateTimeField(null=True, blank=True)
 
+    # set by the nightly finalizer when the employee never logged out
+    auto_closed = models.BooleanField(default=False)
+
+    # bumped by every write; the views update with compare-and-swap on it
+    # (core.attendance.update_attendance) instead of locking the row
+    version = models.PositiveIntegerField(default=0, editable=False)
+
     STATUS_CHOICES = [
         ('Present', 'Present'),
         ('Absent', 'Absent'),
@@ -95,11 +175,110 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ('employee', 'date')
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='attendance_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the stored status, so saves that keep it skip the presence bitmap
+        instance._stored_status = instance.__dict__.get("status")
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or "status" in fields:
+            self._stored_status = self.__dict__.get("status")
+
+    def save(self, *args, **kwargs):
+        # plain saves (admin, get_or_create) win outright but still move the
+        # version so that an optimistic writer holding the old one retries.
+        # The increment happens in the database: a stale instance must
+        # never move the version backwards.
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self.version = models.F("version") + 1
+            super().save(*args, **kwargs)
+            # the row stays locked until commit, so this reads our version
+            self.refresh_from_db(using=using, fields=["version"])
 
     def __str__(self):
         return f"{self.employee.employee_id} - {self.date}"
 
 
+class DailyAttendanceCounter(models.Model):
+    """
+    Per-department attendance counts for one day, kept current with F()
+    updates by the attendance views and rebuilt by rebuild_daily_counters.
+    """
+    date = models.DateField()
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_counters')
+
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    on_break = models.PositiveIntegerField(default=0)
+    logged_out = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "department"], name="daily_counter_department_uniq"),
+            models.UniqueConstraint(
+                fields=["date"],
+                condition=models.Q(department__isnull=True),
+                name="daily_counter_no_department_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.department or 'No department'}"
+
+
+def empty_year_bitmap():
+    return bytes(PresenceBitmap.BYTES)
+
+
+class PresenceBitmap(models.Model):
+    """
+    One employee's year as two bitmaps (bit n = day n of the year, Jan 1 =
+    bit 0): days with a Present row and days with an Absent row. Days with
+    no attendance row (weekends, holidays) are in neither.
+    """
+    BYTES = 46  # 366 bits
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='presence_bitmaps')
+    year = models.PositiveSmallIntegerField()
+    present = models.BinaryField(default=empty_year_bitmap)
+    absent = models.BinaryField(default=empty_year_bitmap)
+
+    class Meta:
+        unique_together = ("employee", "year")
+
+    def __str__(self):
+        return f"{self.employee.employee_id} - {self.year}"
+
+    @property
+    def present_bits(self):
+        return int.from_bytes(self.present, "little")
+
+    @present_bits.setter
+    def present_bits(self, value):
+        self.present = value.to_bytes(self.BYTES, "little")
+
+    @property
+    def absent_bits(self):
+        return int.from_bytes(self.absent, "little")
+
+    @absent_bits.setter
+    def absent_bits(self, value):
+        self.absent = value.to_bytes(self.BYTES, "little")
+
+
 class BreakSession(models.Model):
     attendance = models.ForeignKey(Attendance, on_delete=models.CASCADE, related_name="break_sessions")
     start_at = models.DateTimeField()
@@ -108,19 +287,103 @@ class BreakSession(models.Model):
 
     class Meta:
         ordering = ["-start_at"]
-
-    def close(self):
+        indexes = [
+            models.Index(fields=["start_at"], name="breaksession_start_idx"),
+        ]
+        # Overlaps are excluded by breaksession_no_overlap (migration 0020):
+        # a gist exclusion constraint on PostgreSQL, triggers on SQLite.
+        # Sessions starting before login are caught by clean() and by the
+        # validate_break_sessions sweep.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["attendance"],
+                condition=models.Q(end_at__isnull=True),
+                name="breaksession_one_open",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(end_at__isnull=True) | models.Q(end_at__gte=models.F("start_at")),
+                name="breaksession_end_after_start",
+            ),
+        ]
+
+    def clean(self):
+        if self.end_at is not None and self.end_at < self.start_at:
+            raise ValidationError("A break cannot end before it starts.")
+        if not self.attendance_id or self.start_at is None:
+            return
+        attendance = self.attendance
+        if attendance.login_time is not None:
+            login_at = timezone.make_aware(datetime.combine(attendance.date, attendance.login_time))
+            if self.start_at < login_at:
+                raise ValidationError("A break cannot start before the login time.")
+        siblings = BreakSession.objects.filter(attendance_id=self.attendance_id).exclude(pk=self.pk)
+        if self.end_at is None and siblings.filter(end_at__isnull=True).exists():
+            raise ValidationError("This attendance already has an open break.")
+        overlapping = siblings.filter(models.Q(end_at__isnull=True) | models.Q(end_at__gt=self.start_at))
+        if self.end_at is not None:
+            overlapping = overlapping.filter(start_at__lt=self.end_at)
+        if self.end_at != self.start_at and overlapping.exclude(end_at=models.F("start_at")).exists():
+            raise ValidationError("This break overlaps another break of the same day.")
+
+    def close(self, save=True):
         if self.end_at is None:
             self.end_at = timezone.now()
         if self.end_at < self.start_at:
             self.end_at = self.start_at
         self.duration = self.end_at - self.start_at
-        self.save(update_fields=["end_at", "duration"])
+        if save:
+            self.save(update_fields=["end_at", "duration"])
 
     def __str__(self):
         return f"Break({self.attendance_id}) {self.start_at} - {self.end_at}"
 
 
+# -----------------------------
+# PUNCH DEVICES (biometric readers / kiosks)
+# -----------------------------
+class PunchDevice(models.Model):
+    device_id = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=100, blank=True)
+    api_key = models.CharField(max_length=255)
+    is_active = models.BooleanField(default=True)
+
+    def set_api_key(self, raw_key):
+        self.api_key = make_password(raw_key)
+
+    def check_api_key(self, raw_key):
+        return check_password(raw_key, self.api_key)
+
+    def __str__(self):
+        return self.device_id
+
+
+class PunchEvent(models.Model):
+    KIND_CHOICES = [
+        ("login", "Login"),
+        ("break_start", "Break start"),
+        ("break_end", "Break end"),
+        ("logout", "Logout"),
+    ]
+
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    batch_id = models.UUIDField(db_index=True)
+    device = models.ForeignKey(PunchDevice, on_delete=models.PROTECT, related_name="events")
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="punch_events")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    occurred_at = models.DateTimeField()
+    work_date = models.DateField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["occurred_at"]
+        indexes = [
+            models.Index(fields=["employee", "work_date"], name="punchevent_emp_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.kind} {self.occurred_at}"
+
+
 # -----------------------------
 # NEW: ANNOUNCEMENT
 # -----------------------------
@@ -143,11 +406,39 @@ class Announcement(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # expired rows are switched off by the sweeper, so this stays
+            # limited to what the feeds actually show
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(is_active=True),
+                name="announcement_active_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class AnnouncementReceipt(models.Model):
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name="receipts")
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="announcement_receipts")
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("announcement", "employee")
+        indexes = [
+            models.Index(
+                fields=["employee", "announcement"],
+                condition=models.Q(read_at__isnull=True),
+                name="receipt_unread_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.announcement_id} -> {self.employee_id}"
+
+
 # -----------------------------
 # NEW: MEETING
 # -----------------------------
@@ -179,11 +470,41 @@ class Meeting(models.Model):
 
     class Meta:
         ordering = ["date", "start_time"]
+        indexes = [
+            # finished meetings are moved out of "Scheduled" by the sweeper,
+            # so this only covers upcoming ones
+            models.Index(
+                fields=["date", "start_time"],
+                condition=models.Q(status="Scheduled"),
+                name="meeting_scheduled_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date}"
 
 
+class MeetingVisibility(models.Model):
+    """
+    One row per (employee, meeting) the employee can see, either as a
+    participant or through the meeting's department. Replaces the
+    participants OR department lookup with an index range scan.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="meeting_visibility")
+    meeting = models.ForeignKey(Meeting, on_delete=models.CASCADE, related_name="visibility")
+    date = models.DateField()
+    start_time = models.TimeField()
+
+    class Meta:
+        unique_together = ("employee", "meeting")
+        indexes = [
+            models.Index(fields=["employee", "date", "start_time"], name="meetingvis_emp_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} -> {self.meeting_id}"
+
+
 # -----------------------------
 # NEW: IT REPORT / TICKET
 # -----------------------------
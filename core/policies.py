@@ -0,0 +1,159 @@
+import threading
+import time as monotonic_clock
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from .caching import bump_version, get_version
+from .models import ShiftPolicy
+
+
+VERSION_NAME = "shift_policies"
+
+
+class CompiledPolicy:
+    __slots__ = ("pk", "name", "start_time", "grace_time", "min_hours", "break_limit", "working_days")
+
+    def __init__(self, pk, name, start_time, grace_time, min_hours, break_limit, working_days):
+        self.pk = pk
+        self.name = name
+        self.start_time = start_time
+        self.grace_time = grace_time
+        self.min_hours = min_hours
+        self.break_limit = break_limit
+        self.working_days = frozenset(int(d) for d in working_days)
+
+    @classmethod
+    def from_model(cls, policy):
+        return cls(
+            policy.pk, policy.name, policy.start_time, policy.grace_time,
+            policy.min_hours, policy.break_limit, policy.working_days,
+        )
+
+    def is_working_day(self, day):
+        return day.weekday() in self.working_days
+
+
+def describe_duration(td):
+    """Human wording for a policy duration, e.g. "8 hours" or "1 hour 30 minutes"."""
+    minutes = int(td.total_seconds()) // 60
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+    if minutes or not parts:
+        parts.append(f"{minutes} minute{'s' if minutes != 1 else ''}")
+    return " ".join(parts)
+
+
+# used when no default ShiftPolicy row exists
+BUILTIN_POLICY = CompiledPolicy(None, "Default", time(10, 0), time(10, 10), timedelta(hours=8), timedelta(hours=1), "01234")
+
+
+class PolicyTable:
+    """
+    All shift policies compiled into dicts keyed by role and department id.
+    Loaded with one query on first use and reloaded when the
+    "shift_policies" cache version moves (bumped on every policy change) or
+    after SHIFT_POLICY_TTL seconds, whichever comes first. The version is
+    looked up at most every VERSION_CHECK_SECONDS, as on the database cache
+    that lookup is a query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._checked_at = None
+        self._version = None
+        self.by_role = {}
+        self.by_department = {}
+        self.default = BUILTIN_POLICY
+
+    def _stale(self):
+        if self._loaded_at is None:
+            return True
+        now = monotonic_clock.monotonic()
+        if now - self._loaded_at > settings.SHIFT_POLICY_TTL:
+            return True
+        if now - self._checked_at < settings.VERSION_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        return get_version(VERSION_NAME) != self._version
+
+    def _load(self):
+        by_role, by_department, default = {}, {}, BUILTIN_POLICY
+        version = get_version(VERSION_NAME)
+        for policy in ShiftPolicy.objects.all():
+            compiled = CompiledPolicy.from_model(policy)
+            if policy.role_id:
+                by_role[policy.role_id] = compiled
+            elif policy.department_id:
+                by_department[policy.department_id] = compiled
+            else:
+                default = compiled
+        self.by_role, self.by_department, self.default = by_role, by_department, default
+        self._version = version
+        self._loaded_at = self._checked_at = monotonic_clock.monotonic()
+
+    def refresh(self, force=False):
+        if force or self._stale():
+            with self._lock:
+                if force or self._stale():
+                    self._load()
+        return self
+
+    def policies(self):
+        return [self.default, *self.by_department.values(), *self.by_role.values()]
+
+    def lookup(self, department_id=None, role_id=None):
+        return self.by_role.get(role_id) or self.by_department.get(department_id) or self.default
+
+
+_table = PolicyTable()
+
+
+def policy_table():
+    return _table.refresh()
+
+
+def policy_for(employee):
+    return policy_table().lookup(employee.department_id, employee.role_id)
+
+
+def default_policy():
+    return policy_table().default
+
+
+def earliest_start(day):
+    """Policy with the earliest start among those working on `day`, or None."""
+    working = [p for p in policy_table().policies() if p.is_working_day(day)]
+    return min(working, key=lambda p: p.start_time, default=None)
+
+
+def invalidate_policies():
+    bump_version(VERSION_NAME)
+    _table.refresh(force=True)
+
+
+def policy_groups(prefix="employee__"):
+    """
+    Split employees by the policy that applies to them, for set-based
+    updates. Yields (policy, Q) with the Q relative to `prefix`.
+    """
+    table = policy_table()
+    role_ids = list(table.by_role)
+    department_ids = list(table.by_department)
+
+    for role_id, policy in table.by_role.items():
+        yield policy, Q(**{f"{prefix}role_id": role_id})
+    for department_id, policy in table.by_department.items():
+        yield policy, Q(**{f"{prefix}department_id": department_id}) & ~Q(**{f"{prefix}role_id__in": role_ids})
+
+    rest = Q()
+    if role_ids:
+        rest &= ~Q(**{f"{prefix}role_id__in": role_ids})
+    if department_ids:
+        rest &= ~Q(**{f"{prefix}department_id__in": department_ids})
+    yield table.default, rest
+
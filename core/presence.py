@@ -0,0 +1,269 @@
+import threading
+import time as monotonic_clock
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import FilteredRelation, Q
+from django.utils import timezone
+
+from .caching import bump_version, get_version
+from .models import Attendance, Employee
+
+
+# Shared stamp of "attendance changed somewhere": every process compares it
+# with the stamp its board was seeded at and reseeds when they differ.
+PRESENCE_VERSION = "presence"
+
+
+def presence_entry(employee_pk, code, department_id, login_time, logout_time, is_on_break, late_by):
+    if login_time is None:
+        status = "absent"
+    elif logout_time is not None:
+        status = "out"
+    elif is_on_break:
+        status = "break"
+    else:
+        status = "in"
+    return {
+        "pk": employee_pk,
+        "employee_id": code,
+        "department_id": department_id,
+        "status": status,
+        "late": bool(late_by and late_by > timedelta()),
+        "login_time": login_time.strftime("%H:%M") if login_time else None,
+        "logout_time": logout_time.strftime("%H:%M") if logout_time else None,
+    }
+
+
+class PresenceBoard:
+    """
+    Today's presence of every active employee, grouped by department.
+
+    Seeded with one query on first use, then kept current by publish()
+    calls from the attendance views. Every change gets a sequence number
+    and goes into a bounded log, so a stream can ask for "what changed in
+    department X since N" and block until there is something.
+
+    The board lives in this process only. Writes made elsewhere (other
+    worker processes, bulk updates, the admin, management commands) bump
+    the shared PRESENCE_VERSION stamp; the board compares it at most every
+    PRESENCE_RECHECK_SECONDS and reseeds when it moved, when the date
+    changes, and in any case after PRESENCE_RESEED_SECONDS.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._day = None
+        self._stamp = None
+        self._seeded_at = self._checked_at = 0.0
+        self._seq = 0
+        self._floor = 0
+        self._by_department = {}
+        self._department_of = {}
+        self._log = deque(maxlen=settings.PRESENCE_LOG_SIZE)
+
+    def _seed(self, day, stamp):
+        rows = (
+            Employee.objects.filter(is_active=True)
+            .annotate(today=FilteredRelation("attendance", condition=Q(attendance__date=day)))
+            .values_list(
+                "id", "employee_id", "department_id",
+                "today__login_time", "today__logout_time", "today__is_on_break", "today__late_by",
+            )
+        )
+        by_department, department_of = {}, {}
+        for row in rows:
+            entry = presence_entry(*row)
+            by_department.setdefault(entry["department_id"], {})[entry["pk"]] = entry
+            department_of[entry["pk"]] = entry["department_id"]
+
+        self._by_department, self._department_of = by_department, department_of
+        self._day, self._stamp = day, stamp
+        self._seeded_at = monotonic_clock.monotonic()
+        self._seq += 1
+        self._floor = self._seq
+        self._log.clear()
+        self._cond.notify_all()
+
+    def _current(self):
+        today = timezone.localdate()
+        now = monotonic_clock.monotonic()
+        if self._day == today and now < self._checked_at + settings.PRESENCE_RECHECK_SECONDS:
+            return
+        self._checked_at = now
+        # read before seeding, so a write during the seed triggers another
+        stamp = get_version(PRESENCE_VERSION)
+        if self._day != today or stamp != self._stamp or now >= self._seeded_at + settings.PRESENCE_RESEED_SECONDS:
+            self._seed(today, stamp)
+
+    def _announce(self):
+        """
+        Bump the shared stamp after a local change so other processes
+        reseed. This board keeps its state when nobody else wrote since it
+        last looked.
+        """
+        seen = self._stamp
+        before = get_version(PRESENCE_VERSION)
+        stamp = bump_version(PRESENCE_VERSION)
+        with self._cond:
+            if before == seen == self._stamp:
+                self._stamp = stamp
+
+    def snapshot(self, department_id):
+        """(seq, entries) for the department."""
+        with self._cond:
+            self._current()
+            entries = sorted(self._by_department.get(department_id, {}).values(), key=lambda e: e["employee_id"])
+            return self._seq, entries
+
+    def publish(self, *entries):
+        with self._cond:
+            self._current()
+            for entry in entries:
+                departments = {entry["department_id"]}
+                previous = self._department_of.get(entry["pk"])
+                if previous is not None and previous != entry["department_id"]:
+                    # the old department's streams get the entry too, so
+                    # their boards drop the employee
+                    self._by_department.get(previous, {}).pop(entry["pk"], None)
+                    departments.add(previous)
+                self._by_department.setdefault(entry["department_id"], {})[entry["pk"]] = entry
+                self._department_of[entry["pk"]] = entry["department_id"]
+                self._append(entry, departments)
+        self._announce()
+
+    def drop(self, employee_pk):
+        """Take a deactivated employee off the boards."""
+        with self._cond:
+            self._current()
+            previous = self._department_of.pop(employee_pk, None)
+            if previous is None:
+                return
+            self._by_department.get(previous, {}).pop(employee_pk, None)
+            self._append({"pk": employee_pk, "department_id": None, "status": "absent"}, {previous})
+        self._announce()
+
+    def _append(self, entry, departments):
+        self._seq += 1
+        self._log.append((self._seq, entry, departments))
+        self._cond.notify_all()
+
+    def _changes(self, department_id, after):
+        if after < self._floor or (self._log and after < self._log[0][0] - 1):
+            return None
+        changes = []
+        for seq, entry, departments in reversed(self._log):
+            if seq <= after:
+                break
+            if department_id in departments:
+                changes.append((seq, entry))
+        changes.reverse()
+        return changes
+
+    def wait(self, department_id, after, timeout):
+        """
+        Changes to the department after sequence `after`, waiting up to
+        `timeout` seconds for one. Returns None when `after` is too old to
+        answer from the log (the caller should take a new snapshot).
+        """
+        deadline = monotonic_clock.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._current()
+                changes = self._changes(department_id, after)
+                if changes is None or changes:
+                    return changes
+                remaining = deadline - monotonic_clock.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+
+board = PresenceBoard()
+
+
+def presence_changed():
+    """Make every process reseed its board; for writes that do not publish()."""
+    bump_version(PRESENCE_VERSION)
+
+
+class StreamSlots:
+    """
+    Caps the presence streams this process serves at once: each one holds
+    a worker thread for up to PRESENCE_STREAM_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._open >= settings.PRESENCE_MAX_STREAMS:
+                return False
+            self._open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._open -= 1
+
+
+stream_slots = StreamSlots()
+
+
+class SlotStream:
+    """
+    Streaming content that gives its slot back when the response is
+    closed, which the server does even if the stream never started.
+    """
+
+    def __init__(self, events):
+        self._events = events
+        self._closed = False
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._events.close()
+            stream_slots.release()
+
+
+def publish_employee(employee):
+    """Move an employee to their current department's board, or off the boards."""
+    if not employee.is_active:
+        board.drop(employee.pk)
+        return
+    today = (
+        Attendance.objects.filter(employee_id=employee.pk, date=timezone.localdate())
+        .values_list("login_time", "logout_time", "is_on_break", "late_by").first()
+    )
+    board.publish(presence_entry(
+        employee.pk, employee.employee_id, employee.department_id, *(today or (None, None, False, None)),
+    ))
+
+
+def attendance_entry(attendance, employee):
+    return presence_entry(
+        employee.pk, employee.employee_id, employee.department_id,
+        attendance.login_time, attendance.logout_time, attendance.is_on_break, attendance.late_by,
+    )
+
+
+def publish_attendance(attendance, employee=None):
+    """Push an Attendance row of today onto the board."""
+    if attendance.date != timezone.localdate():
+        return
+    board.publish(attendance_entry(attendance, employee or attendance.employee))
+
+
+def publish_attendances(rows):
+    """Push today's rows of (attendance, employee) pairs onto the board at once."""
+    today = timezone.localdate()
+    entries = [attendance_entry(attendance, employee) for attendance, employee in rows if attendance.date == today]
+    if entries:
+        board.publish(*entries)
@@ -0,0 +1,153 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Attendance, PresenceBitmap
+from .workdays import day_bit, span_mask, year_length
+
+
+# -----------------------------
+# MAINTENANCE
+# -----------------------------
+def _apply(bitmap, day, status):
+    """Set the day in one of the two bitmaps; any other status clears it."""
+    bit = 1 << day_bit(day)
+    present, absent = bitmap.present_bits, bitmap.absent_bits
+    new_present = present | bit if status == "Present" else present & ~bit
+    new_absent = absent | bit if status == "Absent" else absent & ~bit
+    if (new_present, new_absent) == (present, absent):
+        return False
+    bitmap.present_bits, bitmap.absent_bits = new_present, new_absent
+    return True
+
+
+def mark_days(marks):
+    """
+    Record (employee_id, day, status) triples, status None meaning the row
+    is gone. The affected bitmaps are locked, changed in memory and written
+    back with one bulk_update (plus one bulk_create for new years).
+    """
+    by_key = defaultdict(list)
+    for employee_id, day, status in marks:
+        by_key[(employee_id, day.year)].append((day, status))
+    if not by_key:
+        return
+
+    with transaction.atomic():
+        existing = {
+            (b.employee_id, b.year): b
+            for b in PresenceBitmap.objects.select_for_update().filter(
+                employee_id__in={e for e, _ in by_key},
+                year__in={y for _, y in by_key},
+            )
+        }
+        created, changed = [], []
+        for key, days in by_key.items():
+            bitmap = existing.get(key)
+            is_new = bitmap is None
+            if is_new:
+                bitmap = PresenceBitmap(employee_id=key[0], year=key[1])
+            dirty = False
+            for day, status in days:
+                dirty = _apply(bitmap, day, status) or dirty
+            if is_new:
+                created.append(bitmap)
+            elif dirty:
+                changed.append(bitmap)
+        # a concurrent writer may have created the year meanwhile; the
+        # nightly rebuild settles that rare case
+        PresenceBitmap.objects.bulk_create(created, ignore_conflicts=True)
+        PresenceBitmap.objects.bulk_update(changed, ["present", "absent"])
+
+
+def mark_day(employee_id, day, status):
+    mark_days([(employee_id, day, status)])
+
+
+def rebuild_presence_bitmaps(year):
+    """Derive every bitmap of the year from the attendance rows."""
+    bits = defaultdict(lambda: [0, 0])
+    rows = Attendance.objects.filter(date__year=year).values_list("employee_id", "date", "status")
+    for employee_id, day, status in rows.iterator(chunk_size=5000):
+        if status == "Present":
+            bits[employee_id][0] |= 1 << day_bit(day)
+        elif status == "Absent":
+            bits[employee_id][1] |= 1 << day_bit(day)
+
+    bitmaps = []
+    for employee_id, (present, absent) in bits.items():
+        bitmap = PresenceBitmap(employee_id=employee_id, year=year)
+        bitmap.present_bits, bitmap.absent_bits = present, absent
+        bitmaps.append(bitmap)
+
+    with transaction.atomic():
+        PresenceBitmap.objects.filter(year=year).delete()
+        PresenceBitmap.objects.bulk_create(bitmaps, batch_size=1000)
+    return len(bitmaps)
+
+
+# -----------------------------
+# QUERIES
+# -----------------------------
+# Each query loads the bitmaps of the years it touches with one query and
+# answers with AND / popcount / bit_length on the ints.
+
+def _year_spans(start, end):
+    for year in range(start.year, end.year + 1):
+        lo = day_bit(start) if year == start.year else 0
+        hi = day_bit(end) if year == end.year else year_length(year) - 1
+        yield year, span_mask(lo, hi)
+
+
+def _load(years, employee_ids=None):
+    qs = PresenceBitmap.objects.filter(year__in=list(years))
+    if employee_ids is not None:
+        qs = qs.filter(employee_id__in=employee_ids)
+    return {
+        (employee_id, year): (int.from_bytes(present, "little"), int.from_bytes(absent, "little"))
+        for employee_id, year, present, absent in qs.values_list("employee_id", "year", "present", "absent")
+    }
+
+
+def presence_counts(start, end, employee_ids=None):
+    """{employee_id: (days present, days absent)} between start and end inclusive."""
+    spans = dict(_year_spans(start, end))
+    counts = defaultdict(lambda: [0, 0])
+    for (employee_id, year), (present, absent) in _load(spans, employee_ids).items():
+        mask = spans[year]
+        counts[employee_id][0] += (present & mask).bit_count()
+        counts[employee_id][1] += (absent & mask).bit_count()
+    return {employee_id: tuple(c) for employee_id, c in counts.items()}
+
+
+def absent_more_than(threshold, start, end):
+    """[(employee_id, absences)] of employees absent more than `threshold` days, most first."""
+    found = [(pk, absent) for pk, (_, absent) in presence_counts(start, end).items() if absent > threshold]
+    return sorted(found, key=lambda item: item[1], reverse=True)
+
+
+def absence_streaks(day, employee_ids=None):
+    """
+    {employee_id: consecutive absences up to and including `day`} for
+    employees currently on a streak. Days without an attendance row do not
+    break a streak. Looks back at most into the previous year.
+    """
+    mask = span_mask(0, day_bit(day))
+    bitmaps = _load({day.year, day.year - 1}, employee_ids)
+    streaks = {}
+    for (employee_id, year), (present, absent) in bitmaps.items():
+        if year != day.year:
+            continue
+        present &= mask
+        absent &= mask
+        if present:
+            # absences after the last present day
+            streak = (absent >> present.bit_length()).bit_count()
+        else:
+            streak = absent.bit_count()
+            prev_present, prev_absent = bitmaps.get((employee_id, year - 1), (0, 0))
+            streak += (prev_absent >> prev_present.bit_length()).bit_count()
+        if streak:
+            streaks[employee_id] = streak
+    return streaks
+
@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+# Reads only go to the replica inside replica_reads(); everything else,
+# including every write, stays on the primary. Sessions and auth are always
+# read from the primary so a fresh login is never lost to replication lag.
+_replica_reads = ContextVar("replica_reads", default=None)
+REPLICA_APPS = {"core"}
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def replica_alias():
+    """The replica's alias, or None when no replica is configured."""
+    alias = settings.REPLICA_DB_ALIAS
+    return alias if alias in settings.DATABASES else None
+
+
+# -----------------------------
+# LAG CHECK
+# -----------------------------
+def replica_lag(alias):
+    """Seconds the replica is behind the primary. Non-PostgreSQL stand-ins never lag."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+class ReplicaHealth:
+    """
+    Whether the replica may serve reads, measured at most once per
+    REPLICA_LAG_CHECK_SECONDS per process. A replica that lags more than
+    REPLICA_MAX_LAG_SECONDS or cannot be reached is skipped until the next
+    check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._usable = False
+
+    def usable(self, alias):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+            return self._usable
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+                try:
+                    lag = replica_lag(alias)
+                except DatabaseError:
+                    logger.warning("Replica %r unreachable; reading from the primary.", alias, exc_info=True)
+                    self._usable = False
+                else:
+                    self._usable = lag <= settings.REPLICA_MAX_LAG_SECONDS
+                    if not self._usable:
+                        logger.warning("Replica %r is %.1fs behind; reading from the primary.", alias, lag)
+                self._checked_at = now
+        return self._usable
+
+    def mark_down(self, alias):
+        """A query on the replica failed: skip it until the next check."""
+        with self._lock:
+            self._usable = False
+            self._checked_at = time.monotonic()
+        logger.warning("Replica %r failed a query; reading from the primary.", alias, exc_info=True)
+
+
+health = ReplicaHealth()
+
+
+class ReplicaBlock:
+    """State of one replica_reads() block; used once a read went to the replica."""
+
+    used = False
+
+
+@contextmanager
+def replica_reads():
+    """Route the reads of the block to the replica while it is usable."""
+    block = ReplicaBlock()
+    token = _replica_reads.set(block)
+    try:
+        yield block
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary inside the block even within replica_reads():
+    work that writes must never decide what to write from lagged rows.
+    """
+    token = _replica_reads.set(None)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def with_replica_fallback(func):
+    """
+    Call func() with replica_reads(). If it fails with a database error
+    after reading from the replica, mark the replica down and call func()
+    again on the primary, so a replica that dies between two lag checks
+    costs one retry instead of failing every request until the next check.
+    Only use it for side-effect free work such as GET views.
+    """
+    try:
+        with replica_reads() as block:
+            return func()
+    except DatabaseError:
+        if not block.used:
+            raise
+        alias = replica_alias()
+        health.mark_down(alias)
+        with suppress(DatabaseError):
+            connections[alias].close()
+    return func()
+
+
+# -----------------------------
+# ROUTER
+# -----------------------------
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        block = _replica_reads.get()
+        if (
+            alias
+            and block is not None
+            and model._meta.app_label in REPLICA_APPS
+            # reads inside a transaction must see its own writes
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+            and health.usable(alias)
+        ):
+            block.used = True
+            return alias
+        # never fall back to the instance hint: objects loaded from the
+        # replica (or unpickled from a cache) would keep reading from it
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
+
+
+# -----------------------------
+# READ-YOUR-WRITES
+# -----------------------------
+def is_pinned(request):
+    """True while the browser wrote something within REPLICA_PIN_SECONDS."""
+    return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+
+class ReplicaPinMiddleware:
+    """
+    After a request that wrote to the primary, pin the browser to the
+    primary for REPLICA_PIN_SECONDS with a short-lived cookie, so its next
+    report shows what it just did even if the replica has not caught up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_alias():
+            return self.get_response(request)
+
+        wrote = False
+        # filling the database cache is not a write the browser has to see
+        cache_tables = [
+            config["LOCATION"] for config in settings.CACHES.values()
+            if config["BACKEND"] == "django.core.cache.backends.db.DatabaseCache"
+        ]
+
+        def track(execute, sql, params, many, context):
+            nonlocal wrote
+            wrote = wrote or (
+                sql.lstrip()[:6].upper() in WRITE_STATEMENTS
+                and not any(table in sql for table in cache_tables)
+            )
+            return execute(sql, params, many, context)
+
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(track):
+            response = self.get_response(request)
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, "1",
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax",
+            )
+        return response
@@ -0,0 +1,196 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import time
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import Employee, Meeting, MeetingVisibility
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def from_minutes(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+# -----------------------------
+# INTERVAL INDEX
+# -----------------------------
+class IntervalIndex:
+    """
+    Static interval index: per key, intervals sorted by start plus a running
+    maximum of their ends. An overlap query bisects to the last interval
+    starting before the query end and walks back only while the running
+    maximum can still reach the query start.
+    """
+
+    def __init__(self):
+        self._pending = defaultdict(list)
+        self._built = {}
+
+    def add(self, key, start, end, item):
+        self._pending[key].append((start, end, item))
+        self._built.pop(key, None)
+
+    def _entries(self, key):
+        if key not in self._built:
+            entries = sorted(self._pending.get(key, ()), key=lambda e: (e[0], e[1]))
+            starts = [e[0] for e in entries]
+            max_ends = []
+            running = None
+            for _, end, _ in entries:
+                running = end if running is None else max(running, end)
+                max_ends.append(running)
+            self._built[key] = (entries, starts, max_ends)
+        return self._built[key]
+
+    def overlapping(self, key, start, end):
+        entries, starts, max_ends = self._entries(key)
+        found = []
+        i = bisect_left(starts, end) - 1
+        while i >= 0 and max_ends[i] > start:
+            e_start, e_end, item = entries[i]
+            if e_end > start:
+                found.append(item)
+            i -= 1
+        found.reverse()
+        return found
+
+    def busy(self, keys):
+        """Merged busy intervals across the given keys."""
+        intervals = sorted(
+            (s, e) for key in keys for s, e, _ in self._entries(key)[0]
+        )
+        merged = []
+        for s, e in intervals:
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        return merged
+
+
+# -----------------------------
+# MEETING CONFLICTS
+# -----------------------------
+def build_day_index(day, attendee_ids, location, exclude_meeting_id=None):
+    """
+    Index the day's non-cancelled meetings of the given attendees and room
+    with two queries, keyed by ("employee", id) and ("room", name).
+    Attendance of existing meetings comes from MeetingVisibility, so
+    department-wide meetings count for every member.
+    """
+    index = IntervalIndex()
+    meetings = Meeting.objects.filter(date=day).exclude(status="Cancelled")
+    if exclude_meeting_id:
+        meetings = meetings.exclude(pk=exclude_meeting_id)
+
+    if attendee_ids:
+        rows = MeetingVisibility.objects.filter(
+            date=day,
+            meeting__in=meetings,
+            employee_id__in=attendee_ids,
+        ).values_list(
+            "employee_id", "employee__employee_id", "meeting_id",
+            "meeting__title", "meeting__start_time", "meeting__end_time",
+        )
+        for employee_pk, employee_code, meeting_pk, title, start, end in rows:
+            index.add(
+                ("employee", employee_pk),
+                to_minutes(start), to_minutes(end),
+                {"who": employee_code, "meeting_id": meeting_pk, "title": title, "start": start, "end": end},
+            )
+
+    if location:
+        for meeting_pk, title, start, end in meetings.filter(location__iexact=location).values_list(
+            "id", "title", "start_time", "end_time"
+        ):
+            index.add(
+                ("room", location.lower()),
+                to_minutes(start), to_minutes(end),
+                {"who": location, "room": True, "meeting_id": meeting_pk, "title": title, "start": start, "end": end},
+            )
+    return index
+
+
+def find_conflicts(day, start, end, participant_ids=(), department_id=None, location=None, exclude_meeting_id=None):
+    """
+    Every clash of the proposed slot with the attendees' other meetings and
+    the room, plus the nearest free slot of the same length that day (None
+    when the day is full). Attendees are the participants plus everyone in
+    the department. Returns (clashes, suggestion).
+    """
+    attendee_ids = set(participant_ids)
+    if department_id:
+        attendee_ids.update(Employee.objects.filter(department_id=department_id).values_list("id", flat=True))
+
+    location = (location or "").strip()
+    index = build_day_index(day, attendee_ids, location, exclude_meeting_id)
+    keys = [("employee", pk) for pk in attendee_ids]
+    if location:
+        keys.append(("room", location.lower()))
+
+    lo, hi = to_minutes(start), to_minutes(end)
+    clashes = []
+    for key in keys:
+        clashes.extend(index.overlapping(key, lo, hi))
+    if not clashes:
+        return [], None
+    return clashes, nearest_free_slot(index.busy(keys), lo, hi - lo)
+
+
+def nearest_free_slot(busy, requested_start, duration):
+    day_start = to_minutes(time.fromisoformat(settings.MEETING_DAY_START))
+    day_end = to_minutes(time.fromisoformat(settings.MEETING_DAY_END))
+
+    gaps = []
+    cursor = day_start
+    for s, e in busy:
+        if s > cursor:
+            gaps.append((cursor, min(s, day_end)))
+        cursor = max(cursor, e)
+    if cursor < day_end:
+        gaps.append((cursor, day_end))
+
+    best = None
+    for gap_start, gap_end in gaps:
+        if gap_end - gap_start < duration:
+            continue
+        candidate = min(max(requested_start, gap_start), gap_end - duration)
+        if best is None or abs(candidate - requested_start) < abs(best - requested_start):
+            best = candidate
+    if best is None:
+        return None
+    return from_minutes(best), from_minutes(best + duration)
+
+
+def room_double_bookings():
+    """
+    Existing offline bookings that share a room with an earlier booking,
+    as (meeting, earlier meeting) pairs in booking order. Keeping the
+    earlier meeting of every pair leaves each room free of overlaps, which
+    is what the meeting_room_no_overlap constraint (migration 0013) needs.
+    """
+    bookings = (
+        Meeting.objects.filter(mode="Offline", end_time__gt=F("start_time"))
+        .exclude(status="Cancelled")
+        .exclude(location__isnull=True)
+        .exclude(location="")
+        .order_by("created_at", "id")
+    )
+    kept = defaultdict(list)
+    clashes = []
+    for meeting in bookings.iterator(chunk_size=2000):
+        booked = kept[meeting.location.lower(), meeting.date]
+        other = next(
+            (m for m in booked if m.start_time < meeting.end_time and meeting.start_time < m.end_time),
+            None,
+        )
+        if other is None:
+            booked.append(meeting)
+        else:
+            clashes.append((meeting, other))
+    return clashes
@@ -0,0 +1,128 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .announcements import invalidate_announcement_feeds, retract_unread, sync_announcement_receipts
+from .dashboard import TOTALS_FIELDS, invalidate_dashboards
+from .meetings import rebuild_employee_visibility, rebuild_meeting_visibility, touch_meeting_versions
+from .models import Announcement, Attendance, Employee, Holiday, Meeting, ShiftPolicy
+from .policies import invalidate_policies
+from .presence import publish_employee
+from .presence_bitmaps import mark_day
+from .workdays import invalidate_holidays
+
+
+@receiver(pre_save, sender=Announcement)
+def remember_announcement_audience(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Announcement.objects.filter(pk=instance.pk).values("department_id", "is_for_all", "is_active").first()
+    instance._previous_audience = previous
+
+
+@receiver(post_save, sender=Announcement)
+def announcement_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_audience", None)
+    sync_announcement_receipts(instance, was_active=bool(previous and previous["is_active"]))
+
+
+@receiver(pre_delete, sender=Announcement)
+def announcement_deleted(sender, instance, **kwargs):
+    # before the receipts go with it
+    if instance.is_active:
+        retract_unread([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Announcement)
+def announcement_changed(sender, instance, **kwargs):
+    department_ids = [instance.department_id]
+    is_for_all = instance.is_for_all
+    previous = getattr(instance, "_previous_audience", None)
+    if previous:
+        department_ids.append(previous["department_id"])
+        is_for_all = is_for_all or previous["is_for_all"]
+    invalidate_announcement_feeds(department_ids=department_ids, is_for_all=is_for_all)
+
+
+@receiver(pre_save, sender=Meeting)
+def remember_meeting_department(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Meeting.objects.filter(pk=instance.pk).values_list("department_id", flat=True).first()
+    instance._previous_department_id = previous
+
+
+@receiver(post_save, sender=Meeting)
+def meeting_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rebuild_meeting_visibility(instance)
+        touch_meeting_versions(department_ids=[getattr(instance, "_previous_department_id", None)])
+
+
+@receiver(pre_delete, sender=Meeting)
+def meeting_deleted(sender, instance, **kwargs):
+    touch_meeting_versions(
+        employee_ids=instance.visibility.values_list("employee_id", flat=True),
+        department_ids=[instance.department_id],
+    )
+
+
+@receiver(m2m_changed, sender=Meeting.participants.through)
+def meeting_participants_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # employee.meetings.add(...) and friends
+        rebuild_employee_visibility(instance)
+    else:
+        rebuild_meeting_visibility(instance)
+
+
+@receiver(pre_save, sender=Employee)
+def remember_employee_department(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Employee.objects.filter(pk=instance.pk).values_list("department_id", "is_active").first()
+    instance._previous_department_id, instance._was_active = previous or (None, None)
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    moved = instance.department_id != getattr(instance, "_previous_department_id", None)
+    if created or moved:
+        rebuild_employee_visibility(instance)
+    if created or moved or instance.is_active != getattr(instance, "_was_active", None):
+        publish_employee(instance)
+
+
+@receiver([post_save, post_delete], sender=ShiftPolicy)
+def shift_policy_changed(sender, **kwargs):
+    invalidate_policies()
+
+
+@receiver([post_save, post_delete], sender=Holiday)
+def holiday_changed(sender, **kwargs):
+    invalidate_holidays()
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is None or not TOTALS_FIELDS.issuperset(update_fields):
+        invalidate_dashboards([instance.employee_id])
+    if update_fields is not None and "status" not in update_fields:
+        return
+    # the dashboard rewrites status on every hit; only changes lock a bitmap
+    if created or instance.status != getattr(instance, "_stored_status", None):
+        mark_day(instance.employee_id, instance.date, instance.status)
+        instance._stored_status = instance.status
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    invalidate_dashboards([instance.employee_id])
+    mark_day(instance.employee_id, instance.date, None)
@@ -1,3 +1,1832 @@
-from django.test import TestCase
+import importlib
+import os
+import runpy
+import sys
+import tempfile
+from array import array
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, charts, counters, metrics, routers
+from .analytics import (
+    analytics_report, chronic_late, compute_report, group_sums, invalidate_analytics, lateness_heatmap, load_columns,
+    rolling_averages,
+)
+from .caching import bump_version, get_stamp, get_version, versioned_key
+from .charts import cached_chart_series, chart_series, pick_granularity
+from .announcements import (
+    announcement_read_stats, deactivate_expired_announcements, mark_announcements_read, rebuild_unread_counts,
+)
+from .attendance import (
+    RECOMPUTED_FIELDS, AttendanceConflict, create_daily_absent_records, finalize_attendance, update_attendance,
+)
+from .counters import bump_counters, rebuild_daily_counters
+from .dashboard import dashboard_sections
+from .forms import MeetingForm
+from .ical import feed_token
+from .meetings import (
+    complete_finished_meetings, department_meetings_version, employee_meetings_version, expand_attendees,
+    set_participants, upcoming_meetings_for, visible_meetings,
+)
+from .policies import invalidate_policies, policy_for
+from .presence import PRESENCE_VERSION, PresenceBoard, SlotStream, presence_changed, presence_entry, stream_slots
+from .presence_bitmaps import (
+    absence_streaks, absent_more_than, mark_days, presence_counts, rebuild_presence_bitmaps,
+)
+from .ingest import apply_punch_days, ingest_punches, parse_punch_batch
+from .models import (
+    Announcement, Attendance, BreakSession, DailyAttendanceCounter, Department, Employee, Holiday, Meeting,
+    MeetingVisibility, PresenceBitmap, PunchDevice, PunchEvent, Role, ShiftPolicy,
+)
+from .workdays import (
+    invalidate_holidays, is_working_day, workday_calendar, working_days_between, working_employees,
+)
+
+
+DAY = date(2026, 3, 10)
+
+
+def at(hour, minute=0, day=DAY):
+    return timezone.make_aware(datetime(day.year, day.month, day.day, hour, minute))
+
+
+def make_employee(employee_id="EMP001", department=None):
+    return Employee.objects.create(employee_id=employee_id, department=department, phone="0", password="!")
+
+
+# -----------------------------
+# NIGHTLY FINALIZER
+# -----------------------------
+@override_settings(ATTENDANCE_AUTO_LOGOUT_TIME="19:00")
+class FinalizeAttendanceTests(TestCase):
+    def setUp(self):
+        self.attendance = Attendance.objects.create(
+            employee=make_employee(), date=DAY, status="Present", login_time=time(9),
+        )
+
+    def finalize(self):
+        result = finalize_attendance(DAY + timedelta(days=1))
+        self.attendance.refresh_from_db()
+        return result
+
+    def add_break(self, start, end=None):
+        return BreakSession.objects.create(
+            attendance=self.attendance, start_at=start, end_at=end,
+            duration=end - start if end else timedelta(),
+        )
+
+    def test_day_without_a_break(self):
+        self.assertEqual(self.finalize(), (0, 1))
+        self.assertEqual(self.attendance.logout_time, time(19))
+        self.assertEqual(self.attendance.total_hours, timedelta(hours=10))
+        self.assertEqual(self.attendance.break_time, timedelta())
+        self.assertEqual(self.attendance.net_working_hours, timedelta(hours=10))
+        self.assertTrue(self.attendance.auto_closed)
+
+    def test_open_break_is_closed_at_what_is_left_of_the_cap(self):
+        self.add_break(at(11), at(11, 30))
+        open_break = self.add_break(at(13))
+        self.assertEqual(self.finalize(), (1, 1))
+        open_break.refresh_from_db()
+        self.assertEqual((open_break.end_at, open_break.duration), (at(13, 30), timedelta(minutes=30)))
+        self.assertEqual(self.attendance.break_time, timedelta(hours=1))
+        self.assertEqual(self.attendance.net_working_hours, timedelta(hours=9))
+
+    def test_open_break_never_runs_past_the_auto_logout(self):
+        open_break = self.add_break(at(18, 50))
+        self.finalize()
+        open_break.refresh_from_db()
+        self.assertEqual((open_break.end_at, open_break.duration), (at(19), timedelta(minutes=10)))
+        self.assertEqual(self.attendance.break_time, timedelta(minutes=10))
+
+    def test_break_after_a_late_login_ends_where_it_started(self):
+        Attendance.objects.filter(pk=self.attendance.pk).update(login_time=time(19, 30))
+        open_break = self.add_break(at(19, 40))
+        self.finalize()
+        open_break.refresh_from_db()
+        self.assertEqual((open_break.end_at, open_break.duration), (at(19, 40), timedelta()))
+        self.assertEqual(self.attendance.logout_time, time(19, 30))
+
+
+# -----------------------------
+# PUNCH INGESTION
+# -----------------------------
+class PunchIngestTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name="Ops")
+        self.employee = make_employee(department=self.department)
+        self.device = PunchDevice.objects.create(device_id="GATE-1", api_key="!")
+
+    def punch(self, key, kind, moment):
+        return PunchEvent.objects.create(
+            idempotency_key=key, batch_id="00000000-0000-0000-0000-000000000000", device=self.device,
+            employee=self.employee, kind=kind, occurred_at=moment, work_date=DAY,
+        )
+
+    def test_apply_punch_days_builds_the_day(self):
+        self.punch("a", "login", at(9, 30))
+        self.punch("b", "break_start", at(12))
+        self.punch("c", "break_end", at(12, 20))
+        self.punch("d", "logout", at(18, 30))
+
+        with transaction.atomic():
+            apply_punch_days({(self.employee.pk, DAY)})
+
+        attendance = Attendance.objects.get(employee=self.employee, date=DAY)
+        self.assertEqual(attendance.status, "Present")
+        self.assertEqual(attendance.login_time, time(9, 30))
+        self.assertEqual(attendance.break_time, timedelta(minutes=20))
+        self.assertEqual(attendance.total_hours, timedelta(hours=9))
+        self.assertEqual(attendance.net_working_hours, timedelta(hours=8, minutes=40))
+        self.assertFalse(attendance.is_on_break)
+        self.assertEqual(attendance.break_sessions.get().duration, timedelta(minutes=20))
+        counter = DailyAttendanceCounter.objects.get(date=DAY, department=self.department)
+        self.assertEqual((counter.present, counter.logged_out), (1, 1))
+
+    def test_apply_punch_days_is_idempotent_and_moves_the_version(self):
+        self.punch("a", "login", at(9, 30))
+        self.punch("b", "break_start", at(12))
+        for _ in range(2):
+            with transaction.atomic():
+                apply_punch_days({(self.employee.pk, DAY)})
+
+        attendance = Attendance.objects.get(employee=self.employee, date=DAY)
+        self.assertTrue(attendance.is_on_break)
+        self.assertEqual(attendance.break_sessions.count(), 1)
+        self.assertEqual(attendance.version, 2)
+
+    def test_ingest_skips_duplicates_and_rejects_per_line(self):
+        body = "\n".join([
+            '{"key": "k1", "employee_id": "EMP001", "type": "login", "at": "2026-03-10T09:30:00"}',
+            '{"key": "k1", "employee_id": "EMP001", "type": "login", "at": "2026-03-10T09:30:00"}',
+            '{"key": "k2", "employee_id": "NOBODY", "type": "login", "at": "2026-03-10T09:30:00"}',
+            '{"key": "k3", "employee_id": "EMP001", "type": "nap", "at": "2026-03-10T09:30:00"}',
+            '{"key": "", "employee_id": "EMP001", "type": "login", "at": "2026-03-10T09:30:00"}',
+        ])
+        events, rejected = parse_punch_batch(body)
+        self.assertEqual([r["line"] for r in rejected], [4, 5])
+
+        result = ingest_punches(self.device, events)
+        self.assertEqual(result["accepted"], 1)
+        self.assertEqual(result["duplicates"], 1)
+        self.assertEqual(result["rejected"], [{"line": 3, "error": "Unknown employee"}])
+
+        replay = ingest_punches(self.device, events[:1])
+        self.assertEqual((replay["accepted"], replay["duplicates"]), (0, 1))
+        self.assertEqual(Attendance.objects.get(employee=self.employee, date=DAY).status, "Present")
+
+
+# -----------------------------
+# DAILY COUNTERS
+# -----------------------------
+class BumpCountersTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name="Ops")
+        self.employee = make_employee(department=self.department)
+
+    def counter(self):
+        return DailyAttendanceCounter.objects.get(date=DAY, department=self.department)
+
+    def test_missing_row_is_built_from_the_attendance_table(self):
+        Attendance.objects.create(employee=self.employee, date=DAY, status="Present", login_time=time(9))
+        DailyAttendanceCounter.objects.filter(date=DAY).delete()
+
+        bump_counters(DAY, self.department.pk, present=1)
+
+        # the rebuild already counts the saved row; the delta is not added on top
+        self.assertEqual(self.counter().present, 1)
+
+    def test_concurrent_build_is_counted_again(self):
+        Attendance.objects.create(employee=self.employee, date=DAY, status="Present", login_time=time(9))
+        rebuild = counters.rebuild_daily_counters
+        calls = []
+
+        def racing_rebuild(*args, **kwargs):
+            # the first build loses the race against another request
+            calls.append(args)
+            if len(calls) == 1:
+                raise IntegrityError("daily_counter_department_uniq")
+            return rebuild(*args, **kwargs)
+
+        with mock.patch.object(counters, "rebuild_daily_counters", racing_rebuild):
+            bump_counters(DAY, self.department.pk, present=1)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.counter().present, 1)
+
+    def test_migration_backfills_every_day(self):
+        backfill = importlib.import_module("core.migrations.0022_backfill_daily_counters").backfill_counters
+        other = make_employee("EMP002")
+        Attendance.objects.create(employee=self.employee, date=DAY, status="Present", late_by=timedelta(minutes=5))
+        Attendance.objects.create(employee=other, date=DAY, status="Absent")
+        Attendance.objects.create(employee=other, date=DAY - timedelta(days=1), status="Present", logout_time=time(18))
+        DailyAttendanceCounter.objects.all().delete()
+
+        backfill(django_apps, None)
+
+        counts = {
+            (row.date, row.department_id): {name: getattr(row, name) for name in counters.COUNTER_FIELDS}
+            for row in DailyAttendanceCounter.objects.all()
+        }
+        rebuild_daily_counters([DAY, DAY - timedelta(days=1)])
+        self.assertEqual(counts, {
+            (row.date, row.department_id): {name: getattr(row, name) for name in counters.COUNTER_FIELDS}
+            for row in DailyAttendanceCounter.objects.all()
+        })
+        self.assertEqual(counts[DAY, self.department.pk]["late"], 1)
+
+    def test_existing_row_is_bumped(self):
+        DailyAttendanceCounter.objects.create(date=DAY, department=self.department, absent=1)
+
+        bump_counters(DAY, self.department.pk, present=1, absent=-1, late=0)
+
+        counter = self.counter()
+        self.assertEqual((counter.present, counter.absent, counter.late), (1, 0, 0))
+
+    def test_counters_are_clamped_at_zero(self):
+        # drifted: the row says nobody is absent
+        DailyAttendanceCounter.objects.create(date=DAY, department=self.department, present=1)
+
+        bump_counters(DAY, self.department.pk, absent=-1, logged_out=-3)
+
+        counter = self.counter()
+        self.assertEqual((counter.absent, counter.logged_out), (0, 0))
+
+
+# -----------------------------
+# OPTIMISTIC ATTENDANCE WRITES
+# -----------------------------
+class UpdateAttendanceTests(TestCase):
+    def setUp(self):
+        self.attendance = Attendance.objects.create(employee=make_employee(), date=DAY)
+
+    def write_behind(self, **values):
+        """Another request writes the row, as the views and the ingester do."""
+        Attendance.objects.filter(pk=self.attendance.pk).update(version=F("version") + 1, **values)
+
+    def test_change_is_written_and_moves_the_version(self):
+        def login(attendance):
+            attendance.login_time = time(9)
+            attendance.status = "Present"
+            return ["login_time", "status"], "done"
+
+        self.assertEqual(update_attendance(self.attendance, login), "done")
+        stored = Attendance.objects.get(pk=self.attendance.pk)
+        self.assertEqual((stored.login_time, stored.status, stored.version), (time(9), "Present", 1))
+        self.assertEqual(self.attendance.version, 1)
+
+    def test_no_fields_writes_nothing(self):
+        self.assertEqual(update_attendance(self.attendance, lambda attendance: ([], "noop")), "noop")
+        self.assertEqual(Attendance.objects.get(pk=self.attendance.pk).version, 0)
+
+    def test_conflict_reruns_the_change_on_fresh_values(self):
+        seen = []
+
+        def add_break(attendance):
+            seen.append(attendance.break_time)
+            if len(seen) == 1:
+                self.write_behind(break_time=timedelta(minutes=10))
+            attendance.break_time += timedelta(minutes=5)
+            return ["break_time"], None
+
+        update_attendance(self.attendance, add_break)
+
+        self.assertEqual(seen, [timedelta(), timedelta(minutes=10)])
+        stored = Attendance.objects.get(pk=self.attendance.pk)
+        self.assertEqual((stored.break_time, stored.version), (timedelta(minutes=15), 2))
+
+    def test_gives_up_after_the_allowed_attempts(self):
+        calls = []
+
+        def always_behind(attendance):
+            calls.append(attendance.version)
+            self.write_behind()
+            attendance.status = "Present"
+            return ["status"], None
+
+        with self.assertRaises(AttendanceConflict):
+            update_attendance(self.attendance, always_behind, attempts=3)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(Attendance.objects.get(pk=self.attendance.pk).status, "Absent")
+
+    def test_stale_plain_save_never_moves_the_version_back(self):
+        stale = Attendance.objects.get(pk=self.attendance.pk)
+        self.write_behind()
+        self.write_behind()
+
+        stale.auto_closed = True
+        stale.save(update_fields=["auto_closed"])
+
+        self.assertEqual(stale.version, 3)
+        self.assertEqual(Attendance.objects.get(pk=self.attendance.pk).version, 3)
+
+
+# -----------------------------
+# BREAK SESSION INTEGRITY (migration 0020)
+# -----------------------------
+class BreakSessionConstraintTests(TestCase):
+    def setUp(self):
+        self.attendance = Attendance.objects.create(
+            employee=make_employee(), date=DAY, status="Present", login_time=time(9),
+        )
+
+    def add(self, start, end):
+        return BreakSession.objects.create(attendance=self.attendance, start_at=start, end_at=end)
+
+    def assertRejected(self, write, *args, **kwargs):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            write(*args, **kwargs)
+            if connection.vendor == "postgresql":
+                # the overlap exclusion is deferred to commit
+                with connection.cursor() as cursor:
+                    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def test_one_open_break_per_day(self):
+        self.add(at(12), None)
+        self.assertRejected(self.add, at(15), None)
+
+    def test_break_cannot_end_before_it_starts(self):
+        self.assertRejected(self.add, at(12), at(11, 50))
+
+    def test_overlapping_breaks_are_rejected(self):
+        self.add(at(12), at(12, 30))
+        self.assertRejected(self.add, at(12, 15), at(12, 45))
+        self.assertRejected(self.add, at(11, 45), at(13))
+
+    def test_open_break_overlaps_everything_after_it(self):
+        self.add(at(12), None)
+        self.assertRejected(self.add, at(14), at(14, 10))
+
+    def test_adjacent_and_zero_length_breaks_are_allowed(self):
+        self.add(at(12), at(12, 30))
+        self.add(at(12, 30), at(12, 45))
+        self.add(at(12, 40), at(12, 40))
+        self.assertEqual(self.attendance.break_sessions.count(), 3)
+
+    def test_moving_a_break_onto_another_is_rejected(self):
+        self.add(at(12), at(12, 30))
+        later = self.add(at(14), at(14, 30))
+        later.start_at = at(12, 20)
+        self.assertRejected(later.save, update_fields=["start_at"])
+
+
+# -----------------------------
+# BULK RECOMPUTE
+# -----------------------------
+class RecomputeAttendanceTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.sales = Department.objects.create(name="Sales")
+        self.ana = make_employee("EMP001", department=self.ops)
+        self.ben = make_employee("EMP002", department=self.sales)
+        self.rows = [
+            self.finished_day(employee, DAY + timedelta(days=offset))
+            for employee in (self.ana, self.ben) for offset in range(3)
+        ]
+
+    def tearDown(self):
+        ShiftPolicy.objects.all().delete()
+        invalidate_policies()
+
+    def finished_day(self, employee, day):
+        attendance = Attendance.objects.create(
+            employee=employee, date=day, status="Present", login_time=time(10, 30), logout_time=time(18, 30),
+        )
+        BreakSession.objects.create(
+            attendance=attendance, start_at=at(13, day=day), end_at=at(13, 45, day=day), duration=timedelta(minutes=45),
+        )
+        return attendance
+
+    def scramble(self):
+        # as rows written by an older release would look
+        Attendance.objects.update(
+            total_hours=timedelta(), break_time=timedelta(hours=5), net_working_hours=timedelta(hours=99), late_by=timedelta(),
+        )
+
+    def recompute(self, *args):
+        out = StringIO()
+        call_command("recompute_attendance", str(DAY), str(DAY + timedelta(days=2)), "--workers", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def totals(self, attendance):
+        attendance.refresh_from_db()
+        return [getattr(attendance, name) for name in RECOMPUTED_FIELDS]
+
+    def test_rows_are_rebuilt_from_times_and_breaks(self):
+        self.scramble()
+        self.assertIn("6 attendance row(s) recomputed.", self.recompute())
+        for attendance in self.rows:
+            self.assertEqual(
+                self.totals(attendance),
+                [timedelta(hours=8), timedelta(minutes=45), timedelta(hours=7, minutes=15), timedelta(minutes=20)],
+            )
+
+    def test_each_policy_gets_its_own_limits(self):
+        ShiftPolicy.objects.create(
+            name="Ops early", department=self.ops, grace_time=time(9), break_limit=timedelta(minutes=30),
+        )
+        self.scramble()
+        self.recompute()
+        self.assertEqual(
+            self.totals(self.rows[0]),
+            [timedelta(hours=8), timedelta(minutes=30), timedelta(hours=7, minutes=30), timedelta(hours=1, minutes=30)],
+        )
+        self.assertEqual(self.totals(self.rows[3])[3], timedelta(minutes=20))
+
+    def test_dry_run_reports_without_writing(self):
+        Attendance.objects.filter(pk=self.rows[0].pk).update(late_by=timedelta())
+        self.recompute()
+        Attendance.objects.filter(pk=self.rows[0].pk).update(late_by=timedelta())
+        out = self.recompute("--dry-run")
+        self.assertIn("EMP001 2026-03-10: late_by: 0:00:00 -> 0:20:00", out)
+        self.assertIn("1 attendance row(s) would change.", out)
+        self.assertEqual(self.totals(self.rows[0])[3], timedelta())
+
+    def test_date_chunks_cover_the_range_once(self):
+        self.scramble()
+        out = self.recompute("--split", "date", "--chunk-days", "2")
+        self.assertIn("[1/2] 2026-03-10..2026-03-11, all departments: 4 row(s)", out)
+        self.assertIn("[2/2] 2026-03-12..2026-03-12, all departments: 2 row(s)", out)
+
+    def test_rows_outside_the_range_and_open_days_are_left_alone(self):
+        outside = self.finished_day(self.ana, DAY + timedelta(days=3))
+        open_day = Attendance.objects.create(employee=self.ben, date=DAY - timedelta(days=1), status="Present", login_time=time(11))
+        self.scramble()
+        self.recompute()
+        self.assertEqual(self.totals(outside)[0], timedelta())
+        self.assertEqual(self.totals(open_day)[0], timedelta())
+
+    def test_late_counters_follow_the_new_late_by(self):
+        self.scramble()
+        rebuild_daily_counters([DAY])
+        self.assertEqual(DailyAttendanceCounter.objects.get(date=DAY, department=self.ops).late, 0)
+        self.recompute()
+        self.assertEqual(DailyAttendanceCounter.objects.get(date=DAY, department=self.ops).late, 1)
+
+    def test_backwards_range_is_refused(self):
+        with self.assertRaisesMessage(CommandError, "end must not be before start."):
+            call_command("recompute_attendance", str(DAY), str(DAY - timedelta(days=1)), stdout=StringIO())
+
+
+# -----------------------------
+# ANNOUNCEMENT INBOX
+# -----------------------------
+class AnnouncementReceiptTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.sales = Department.objects.create(name="Sales")
+        self.ana = make_employee("EMP001", department=self.ops)
+        self.ben = make_employee("EMP002", department=self.sales)
+        self.gone = make_employee("EMP003", department=self.ops)
+        Employee.objects.filter(pk=self.gone.pk).update(is_active=False)
+
+    def announce(self, department=None, **fields):
+        return Announcement.objects.create(
+            title="Notice", message="-", department=department, is_for_all=department is None, **fields,
+        )
+
+    def unread(self):
+        return dict(Employee.objects.values_list("employee_id", "unread_announcements"))
+
+    def test_global_announcement_reaches_every_active_employee(self):
+        announcement = self.announce()
+        self.assertEqual(self.unread(), {"EMP001": 1, "EMP002": 1, "EMP003": 0})
+        self.assertEqual(announcement_read_stats([announcement.pk]), {announcement.pk: (0, 2)})
+
+    def test_department_announcement_reaches_its_members(self):
+        self.announce(self.ops)
+        self.assertEqual(self.unread(), {"EMP001": 1, "EMP002": 0, "EMP003": 0})
+
+    def test_moving_to_another_department_moves_the_unread_receipts(self):
+        announcement = self.announce(self.ops)
+        announcement.department = self.sales
+        announcement.save()
+        self.assertEqual(self.unread(), {"EMP001": 0, "EMP002": 1, "EMP003": 0})
+        self.assertEqual(
+            list(announcement.receipts.values_list("employee__employee_id", flat=True)), ["EMP002"]
+        )
+
+    def test_reading_clears_the_counter_once(self):
+        first, second = self.announce(), self.announce()
+        self.assertEqual(mark_announcements_read(self.ana, [first.pk]), 1)
+        self.assertEqual(mark_announcements_read(self.ana, [first.pk]), 0)
+        self.assertEqual(self.unread()["EMP001"], 1)
+        self.assertEqual(announcement_read_stats([first.pk, second.pk]), {first.pk: (1, 2), second.pk: (0, 2)})
+
+    def test_opening_the_inbox_marks_the_feed_read(self):
+        self.announce()
+        self.announce(self.ops)
+        session = self.client.session
+        session["employee_id"] = self.ana.pk
+        session.save()
+        self.assertEqual(self.client.get("/announcements/").status_code, 200)
+        self.assertEqual(self.unread()["EMP001"], 0)
+        self.assertEqual(self.unread()["EMP002"], 1)
+
+    def test_switching_off_and_back_on(self):
+        announcement = self.announce()
+        mark_announcements_read(self.ana, [announcement.pk])
+        announcement.is_active = False
+        announcement.save()
+        self.assertEqual(self.unread(), {"EMP001": 0, "EMP002": 0, "EMP003": 0})
+        announcement.is_active = True
+        announcement.save()
+        self.assertEqual(self.unread(), {"EMP001": 0, "EMP002": 1, "EMP003": 0})
+
+    def test_deleting_retracts_what_is_unread(self):
+        self.announce().delete()
+        self.assertEqual(self.unread(), {"EMP001": 0, "EMP002": 0, "EMP003": 0})
+
+    def test_sweeper_retracts_expired_announcements(self):
+        today = timezone.localdate()
+        self.announce(expiry_date=today - timedelta(days=1))
+        self.announce(expiry_date=today)
+        self.assertEqual(deactivate_expired_announcements(today), 1)
+        self.assertEqual(self.unread(), {"EMP001": 1, "EMP002": 1, "EMP003": 0})
+
+    def test_rebuild_counts_only_visible_unread_receipts(self):
+        today = timezone.localdate()
+        read = self.announce()
+        self.announce(self.ops)
+        # expired but not swept yet
+        self.announce(expiry_date=today - timedelta(days=1))
+        mark_announcements_read(self.ana, [read.pk])
+        Employee.objects.update(unread_announcements=7)
+        rebuild_unread_counts()
+        self.assertEqual(self.unread(), {"EMP001": 1, "EMP002": 1, "EMP003": 0})
+
+
+# -----------------------------
+# MEETING VISIBILITY
+# -----------------------------
+class MeetingVisibilityTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.sales = Department.objects.create(name="Sales")
+        self.ana = make_employee("EMP001", department=self.ops)
+        self.ben = make_employee("EMP002", department=self.sales)
+        self.cara = make_employee("EMP003")
+
+    def meeting(self, title, department=None, day=DAY, start=10, **fields):
+        return Meeting.objects.create(
+            title=title, agenda="-", date=day, start_time=time(start), end_time=time(start + 1),
+            mode="Online", department=department, **fields,
+        )
+
+    def seen_by(self, employee):
+        return [m.title for m in visible_meetings(employee)]
+
+    def visibility(self):
+        return set(MeetingVisibility.objects.values_list("employee__employee_id", "meeting__title"))
+
+    def test_participants_and_department_members_see_the_meeting_once(self):
+        planning = self.meeting("Planning", self.ops)
+        planning.participants.add(self.ana, self.cara)
+        self.meeting("Standup", self.ops, start=9)
+        self.assertEqual(self.seen_by(self.ana), ["Standup", "Planning"])
+        self.assertEqual(self.seen_by(self.cara), ["Planning"])
+        self.assertEqual(self.seen_by(self.ben), [])
+
+    def test_removing_a_participant_hides_the_meeting(self):
+        planning = self.meeting("Planning")
+        planning.participants.add(self.ben, self.cara)
+        planning.participants.remove(self.ben)
+        self.cara.meetings.clear()
+        self.assertEqual(self.visibility(), set())
+
+    def test_moving_department_swaps_the_department_meetings(self):
+        self.meeting("Ops sync", self.ops)
+        self.meeting("Sales sync", self.sales)
+        self.ana.department = self.sales
+        self.ana.save()
+        self.assertEqual(self.seen_by(self.ana), ["Sales sync"])
+
+    def test_rescheduling_and_moving_the_meeting_follow(self):
+        planning = self.meeting("Planning", self.ops)
+        planning.department = self.sales
+        planning.date = DAY + timedelta(days=1)
+        planning.save()
+        self.assertEqual(self.visibility(), {("EMP002", "Planning")})
+        self.assertEqual(list(MeetingVisibility.objects.values_list("date", flat=True)), [DAY + timedelta(days=1)])
+
+    def test_upcoming_meetings_skip_past_and_cancelled_ones(self):
+        self.meeting("Past", self.ops, day=DAY - timedelta(days=1))
+        self.meeting("Cancelled", self.ops, status="Cancelled")
+        self.meeting("Next", self.ops)
+        self.assertEqual([m.title for m in upcoming_meetings_for(self.ana, DAY)], ["Next"])
+
+    def test_migration_backfills_what_the_signals_build(self):
+        backfill = importlib.import_module("core.migrations.0012_meeting_visibility").backfill_visibility
+        self.meeting("Planning", self.ops).participants.add(self.ben)
+        self.meeting("Sales sync", self.sales)
+        expected = self.visibility()
+        MeetingVisibility.objects.all().delete()
+
+        backfill(django_apps, None)
+
+        self.assertEqual(self.visibility(), expected)
+
+
+# -----------------------------
+# MEETING PARTICIPANT EXPANSION
+# -----------------------------
+class ParticipantExpansionTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.sales = Department.objects.create(name="Sales")
+        self.manager_role = Role.objects.create(name="Manager", department=self.ops)
+        self.analyst = Role.objects.create(name="Analyst", department=self.sales)
+        self.ana = make_employee("EMP001", department=self.ops)
+        self.ben = make_employee("EMP002", department=self.sales)
+        self.cara = make_employee("EMP003")
+        self.gone = make_employee("EMP004", department=self.ops)
+        Employee.objects.filter(pk=self.cara.pk).update(role=self.analyst)
+        Employee.objects.filter(pk=self.gone.pk).update(is_active=False)
+
+    def login_manager(self):
+        boss = make_employee("MGR001", department=self.ops)
+        Employee.objects.filter(pk=boss.pk).update(role=self.manager_role)
+        session = self.client.session
+        session["employee_id"] = boss.pk
+        session.save()
+        return boss
+
+    def meeting_data(self, **fields):
+        return {
+            "title": "All hands", "agenda": "-", "date": DAY, "start_time": "10:00", "end_time": "11:00",
+            "mode": "Online", "status": "Scheduled", **fields,
+        }
+
+    def test_departments_and_roles_expand_to_active_members(self):
+        self.assertEqual(
+            expand_attendees(department_ids=[self.ops.pk], role_ids=[self.analyst.pk]), {self.ana.pk, self.cara.pk}
+        )
+        self.assertEqual(expand_attendees(participant_ids=[self.gone.pk]), {self.gone.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(expand_attendees(participant_ids=[self.ben.pk]), {self.ben.pk})
+
+    def test_set_participants_replaces_the_list(self):
+        meeting = Meeting.objects.create(
+            title="Sync", agenda="-", date=DAY, start_time=time(10), end_time=time(11), mode="Online",
+        )
+        set_participants(meeting, {self.ana.pk, self.ben.pk})
+        set_participants(meeting, {self.ben.pk, self.cara.pk})
+        self.assertEqual(set(meeting.participants.values_list("pk", flat=True)), {self.ben.pk, self.cara.pk})
+        self.assertEqual(
+            set(MeetingVisibility.objects.values_list("employee_id", flat=True)), {self.ben.pk, self.cara.pk}
+        )
+
+    def test_clash_check_covers_invited_departments(self):
+        busy = Meeting.objects.create(
+            title="Review", agenda="-", date=DAY, start_time=time(10, 30), end_time=time(11, 30), mode="Online",
+        )
+        busy.participants.add(self.ana)
+        form = MeetingForm(data=self.meeting_data(invite_departments=[self.ops.pk]))
+        self.assertFalse(form.is_valid())
+        self.assertIn(
+            f'EMP001 is busy in meeting #{busy.pk} "Review" on 2026-03-10, 10:30-11:30', form.non_field_errors()
+        )
+
+    def test_add_meeting_invites_departments_and_roles(self):
+        boss = self.login_manager()
+        response = self.client.post(
+            "/management/meetings/add/",
+            self.meeting_data(invite_departments=[self.sales.pk], invite_roles=[self.analyst.pk], participants=[boss.pk]),
+        )
+        self.assertRedirects(response, reverse("meeting_list"), fetch_redirect_response=False)
+        meeting = Meeting.objects.get(title="All hands")
+        self.assertEqual(
+            set(meeting.participants.values_list("employee_id", flat=True)), {"MGR001", "EMP002", "EMP003"}
+        )
+        self.assertEqual([m.title for m in visible_meetings(self.cara)], ["All hands"])
+
+    def test_search_pages_without_counting(self):
+        self.login_manager()
+        Employee.objects.bulk_create([
+            Employee(employee_id=f"T{n:03d}", phone="0", password="!") for n in range(25)
+        ])
+        first = self.client.get("/management/employees/search/", {"q": "t0"}).json()
+        self.assertEqual(len(first["results"]), 20)
+        self.assertTrue(first["has_more"])
+        second = self.client.get("/management/employees/search/", {"q": "t0", "page": 2}).json()
+        self.assertEqual([row["text"] for row in second["results"]], [f"T{n:03d}" for n in range(20, 25)])
+        self.assertFalse(second["has_more"])
+
+    def test_search_is_for_managers_only(self):
+        session = self.client.session
+        session["employee_id"] = self.ana.pk
+        session.save()
+        response = self.client.get("/management/employees/search/")
+        self.assertRedirects(response, reverse("employee_dashboard"), fetch_redirect_response=False)
+
+
+# -----------------------------
+# MEETING SWEEPER
+# -----------------------------
+class MeetingSweeperTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name="Ops")
+        self.employee = make_employee(department=self.department)
+
+    def meeting(self, title, day, start, end, status="Scheduled"):
+        return Meeting.objects.create(
+            title=title, agenda="-", date=day, start_time=time(*start), end_time=time(*end),
+            mode="Online", department=self.department, status=status,
+        )
+
+    def statuses(self):
+        return dict(Meeting.objects.values_list("title", "status"))
+
+    def test_only_finished_scheduled_meetings_are_completed(self):
+        self.meeting("Yesterday", DAY - timedelta(days=1), (16,), (17,))
+        self.meeting("Ended", DAY, (9,), (10,))
+        self.meeting("Running", DAY, (10,), (11,))
+        self.meeting("Tomorrow", DAY + timedelta(days=1), (9,), (10,))
+        self.meeting("Called off", DAY - timedelta(days=1), (9,), (10,), status="Cancelled")
+
+        self.assertEqual(complete_finished_meetings(at(10, 30)), 2)
+        self.assertEqual(self.statuses(), {
+            "Yesterday": "Completed", "Ended": "Completed", "Running": "Scheduled",
+            "Tomorrow": "Scheduled", "Called off": "Cancelled",
+        })
+        self.assertEqual(complete_finished_meetings(at(10, 30)), 0)
+
+    def test_sweep_refreshes_the_meeting_lists(self):
+        self.meeting("Ended", DAY, (9,), (10,))
+        versions = [employee_meetings_version(self.employee.pk), department_meetings_version(self.department.pk)]
+        before = [get_stamp(name) for name in versions]
+        complete_finished_meetings(at(10, 30))
+        for name, stamp in zip(versions, before):
+            self.assertNotEqual(get_stamp(name), stamp, name)
+
+    def test_command_reports_the_count(self):
+        self.meeting("Ended", timezone.localdate() - timedelta(days=1), (9,), (10,))
+        out = StringIO()
+        call_command("sweep_meetings", stdout=out)
+        self.assertIn("Completed 1 finished meeting(s).", out.getvalue())
+
+
+# -----------------------------
+# ATTENDANCE ANALYTICS
+# -----------------------------
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.ana = make_employee("EMP001", department=self.ops)
+        self.ben = make_employee("EMP002", department=self.ops)
+        self.cara = make_employee("EMP003")
+        self.day(self.ana, DAY, late=10, net=8)
+        self.day(self.ana, DAY + timedelta(days=1), late=0, net=7)
+        self.day(self.ana, DAY + timedelta(days=7), late=20, net=6)
+        self.day(self.ben, DAY, late=0, net=8)
+        self.day(self.cara, DAY + timedelta(days=1), late=5, net=9)
+        Attendance.objects.create(employee=self.ben, date=DAY + timedelta(days=1), status="Absent")
+
+    def day(self, employee, day, late, net):
+        return Attendance.objects.create(
+            employee=employee, date=day, status="Present", login_time=time(10), logout_time=time(19),
+            late_by=timedelta(minutes=late), net_working_hours=timedelta(hours=net), break_time=timedelta(hours=1),
+        )
+
+    def test_group_sums(self):
+        self.assertEqual(
+            group_sums(array("l", [3, 1, 3, 2, 1]), array("l", [10, 20, 30, 40, 50])),
+            {1: (2, 70), 2: (1, 40), 3: (2, 40)},
+        )
+        self.assertEqual(group_sums(array("l"), array("l")), {})
+
+    def test_heatmap_averages_per_department_and_weekday(self):
+        heatmap = lateness_heatmap(load_columns(DAY, DAY + timedelta(days=7)))
+        self.assertEqual([row["department"] for row in heatmap], ["No department", "Ops"])
+        ops = heatmap[1]["cells"]
+        self.assertEqual(ops[DAY.weekday()], {"days": 3, "avg_late_minutes": 10.0, "late_rate": 67})
+        self.assertEqual(ops[(DAY + timedelta(days=1)).weekday()], {"days": 1, "avg_late_minutes": 0.0, "late_rate": 0})
+        self.assertEqual(ops[(DAY + timedelta(days=2)).weekday()], {"days": 0, "avg_late_minutes": None, "late_rate": None})
+        self.assertEqual(
+            heatmap[0]["cells"][(DAY + timedelta(days=1)).weekday()],
+            {"days": 1, "avg_late_minutes": 5.0, "late_rate": 100},
+        )
+
+    def test_rolling_averages_slide_over_attended_days(self):
+        cols = load_columns(DAY - timedelta(days=1), DAY + timedelta(days=2))
+        rolling = rolling_averages(cols, DAY, DAY + timedelta(days=2), window=2)
+        self.assertEqual(rolling, {
+            "labels": ["10 Mar", "11 Mar", "12 Mar"],
+            "net_hours": [8.0, 8.0, 8.0],
+            "late_minutes": [5.0, 3.8, 2.5],
+        })
+
+    def test_rolling_window_with_no_attendance_is_empty(self):
+        cols = load_columns(DAY + timedelta(days=3), DAY + timedelta(days=5))
+        rolling = rolling_averages(cols, DAY + timedelta(days=4), DAY + timedelta(days=5), window=2)
+        self.assertEqual(rolling["net_hours"], [None, None])
+
+    def test_chronic_late_ranks_by_late_share(self):
+        cols = load_columns(DAY, DAY + timedelta(days=7))
+        self.assertEqual(chronic_late(cols, min_days=2), [{
+            "employee_id": "EMP001", "department": "Ops", "late_days": 2, "days": 3,
+            "late_rate": 67, "avg_late_minutes": 15.0,
+        }])
+        self.assertEqual([row["employee_id"] for row in chronic_late(cols, min_days=1)], ["EMP003", "EMP001"])
+
+    def test_report_leaves_the_lead_in_out_of_the_period(self):
+        self.day(self.ben, DAY - timedelta(days=1), late=30, net=8)
+        report = compute_report(DAY, DAY + timedelta(days=7))
+        self.assertEqual(report["rows"], 5)
+        self.assertEqual(report["heatmap"][1]["cells"][(DAY - timedelta(days=1)).weekday()]["days"], 0)
+        # the rolling averages do reach back into it
+        self.assertEqual(report["rolling"]["late_minutes"][0], 13.3)
+
+    def test_report_is_cached_until_invalidated(self):
+        end = DAY + timedelta(days=7)
+        with CaptureQueriesContext(connection) as cold:
+            self.assertEqual(analytics_report(DAY, end)["rows"], 5)
+        self.day(self.ben, DAY + timedelta(days=2), late=0, net=8)
+        with CaptureQueriesContext(connection) as warm:
+            self.assertEqual(analytics_report(DAY, end)["rows"], 5)
+        self.assertLess(len(warm), len(cold))
+        invalidate_analytics()
+        self.assertEqual(analytics_report(DAY, end)["rows"], 6)
+
+
+# -----------------------------
+# PRESENCE BITMAPS
+# -----------------------------
+class PresenceBitmapTests(TestCase):
+    def setUp(self):
+        self.ana = make_employee("EMP001")
+        self.ben = make_employee("EMP002")
+
+    def days(self, employee, first, statuses):
+        """One attendance row per status from `first` on; None leaves the day without a row."""
+        for offset, status in enumerate(statuses):
+            if status:
+                Attendance.objects.create(employee=employee, date=first + timedelta(days=offset), status=status)
+
+    def bitmaps(self):
+        return {(b.employee_id, b.year): (b.present_bits, b.absent_bits) for b in PresenceBitmap.objects.all()}
+
+    def test_attendance_writes_keep_the_bitmaps(self):
+        attendance = Attendance.objects.create(employee=self.ana, date=DAY, status="Absent")
+        self.assertEqual(presence_counts(DAY, DAY), {self.ana.pk: (0, 1)})
+        attendance.status = "Present"
+        attendance.save()
+        self.assertEqual(presence_counts(DAY, DAY), {self.ana.pk: (1, 0)})
+        attendance.delete()
+        self.assertEqual(presence_counts(DAY, DAY), {self.ana.pk: (0, 0)})
+
+    def test_mark_days_writes_each_bitmap_once(self):
+        Attendance.objects.create(employee=self.ana, date=DAY - timedelta(days=1), status="Present")
+        marks = [(self.ana.pk, DAY + timedelta(days=n), "Absent") for n in range(5)]
+        marks.append((self.ben.pk, DAY, "Present"))
+        with CaptureQueriesContext(connection) as queries:
+            mark_days(marks)
+        # lock, create the new year, update the existing one
+        statements = [q["sql"].split()[0] for q in queries.captured_queries if "core_presencebitmap" in q["sql"]]
+        self.assertEqual(statements, ["SELECT", "INSERT", "UPDATE"])
+        self.assertEqual(presence_counts(DAY, DAY + timedelta(days=4)), {self.ana.pk: (0, 5), self.ben.pk: (1, 0)})
+
+    def test_rebuild_matches_what_the_signals_wrote(self):
+        self.days(self.ana, DAY, ["Present", "Absent", None, "Present"])
+        self.days(self.ben, DAY, ["Absent", "Absent"])
+        expected = self.bitmaps()
+        PresenceBitmap.objects.all().delete()
+        self.assertEqual(rebuild_presence_bitmaps(DAY.year), 2)
+        self.assertEqual(self.bitmaps(), expected)
+
+    def test_counts_span_years_in_one_query(self):
+        self.days(self.ana, date(2025, 12, 30), ["Absent", "Present", "Absent", "Absent"])
+        with self.assertNumQueries(1):
+            counts = presence_counts(date(2025, 12, 31), date(2026, 1, 2))
+        self.assertEqual(counts, {self.ana.pk: (1, 2)})
+
+    def test_streak_counts_absences_since_the_last_present_day(self):
+        self.days(self.ana, DAY - timedelta(days=5), ["Present", "Absent", "Absent", "Absent", None, "Absent"])
+        self.days(self.ben, DAY - timedelta(days=1), ["Absent", "Present"])
+        self.assertEqual(absence_streaks(DAY), {self.ana.pk: 4})
+        self.assertEqual(absence_streaks(DAY - timedelta(days=3)), {self.ana.pk: 2})
+
+    def test_streak_runs_on_from_the_previous_year(self):
+        self.days(self.ana, date(2025, 12, 29), ["Present", "Absent", "Absent", None, "Absent"])
+        self.assertEqual(absence_streaks(date(2026, 1, 2)), {self.ana.pk: 3})
+
+    def test_frequent_absentees_most_first(self):
+        self.days(self.ana, DAY, ["Absent", "Absent", "Present"])
+        self.days(self.ben, DAY, ["Absent", "Absent", "Absent"])
+        self.assertEqual(
+            absent_more_than(1, DAY, DAY + timedelta(days=2)), [(self.ben.pk, 3), (self.ana.pk, 2)]
+        )
+        self.assertEqual(absent_more_than(2, DAY, DAY + timedelta(days=2)), [(self.ben.pk, 3)])
+
+
+# -----------------------------
+# CHART DATA
+# -----------------------------
+@override_settings(CHART_MAX_POINTS=120)
+class ChartSeriesTests(TestCase):
+    def setUp(self):
+        self.employee = make_employee()
+        # Tue 10 .. Thu 12 March, then Mon 16 March
+        self.day(DAY, total=9, breaks=1, late=10)
+        self.day(DAY + timedelta(days=1), total=8, breaks=0, late=0)
+        Attendance.objects.create(employee=self.employee, date=DAY + timedelta(days=2), status="Absent")
+        self.day(DAY + timedelta(days=6), total=10, breaks=2, late=30)
+
+    def day(self, day, total, breaks, late):
+        Attendance.objects.create(
+            employee=self.employee, date=day, status="Present", login_time=time(10), logout_time=time(10 + total),
+            total_hours=timedelta(hours=total), break_time=timedelta(hours=breaks),
+            net_working_hours=timedelta(hours=total - breaks), late_by=timedelta(minutes=late),
+        )
+
+    def series(self, granularity, start=DAY, end=DAY + timedelta(days=6)):
+        return chart_series(self.employee.pk, start, end, granularity)
+
+    def test_granularity_coarsens_to_stay_under_the_limit(self):
+        for start, requested, expected in (
+            (date(2026, 1, 1), None, "day"),
+            (date(2025, 6, 1), None, "week"),
+            (date(2026, 1, 1), "month", "month"),
+            (date(2020, 1, 1), "day", "month"),
+        ):
+            with self.subTest(start=start, requested=requested):
+                self.assertEqual(pick_granularity(start, DAY, requested), (expected, start))
+
+    def test_range_too_long_by_month_keeps_the_latest_months(self):
+        self.assertEqual(pick_granularity(date(2000, 1, 1), DAY), ("month", date(2016, 4, 1)))
+
+    def test_days_plot_absences_as_zero(self):
+        series = self.series("day")
+        self.assertEqual(series["labels"], ["10 Mar", "11 Mar", "12 Mar", "16 Mar"])
+        self.assertEqual(series["days"], [1, 1, 0, 1])
+        self.assertEqual(series["net_hours"], [8.0, 8.0, 0, 8.0])
+        self.assertEqual(series["late_minutes"], [10, 0, 0, 30])
+
+    def test_weeks_average_over_present_days(self):
+        series = self.series("week")
+        self.assertEqual(series["labels"], ["Wk 09 Mar", "Wk 16 Mar"])
+        self.assertEqual(series["days"], [2, 1])
+        self.assertEqual(series["total_hours"], [8.5, 10.0])
+        self.assertEqual(series["break_hours"], [0.5, 2.0])
+        self.assertEqual(series["late_minutes"], [5, 30])
+
+    def test_months_are_one_bucket_each(self):
+        series = self.series("month", start=date(2026, 2, 1), end=date(2026, 4, 30))
+        self.assertEqual(series["labels"], ["Mar 2026"])
+        self.assertEqual(series["net_hours"], [8.0])
+
+    def test_series_is_cached_until_analytics_change(self):
+        end = DAY + timedelta(days=6)
+        self.assertEqual(cached_chart_series(self.employee.pk, DAY, end)["days"], [1, 1, 0, 1])
+        self.day(DAY + timedelta(days=5), total=8, breaks=1, late=0)
+        self.assertEqual(cached_chart_series(self.employee.pk, DAY, end)["days"], [1, 1, 0, 1])
+        invalidate_analytics()
+        self.assertEqual(cached_chart_series(self.employee.pk, DAY, end)["days"], [1, 1, 0, 1, 1])
+
+    @override_settings(CHART_CACHE_TIMEOUT=300, CHART_HISTORY_CACHE_TIMEOUT=21600)
+    def test_finished_ranges_cache_longer(self):
+        today = timezone.localdate()
+        with mock.patch.object(charts.cache, "get_or_set") as get_or_set:
+            cached_chart_series(self.employee.pk, today - timedelta(days=7), today)
+            cached_chart_series(self.employee.pk, today - timedelta(days=30), today - timedelta(days=7))
+        self.assertEqual([c.kwargs["timeout"] for c in get_or_set.call_args_list], [300, 21600])
+
+    def test_view_validates_the_query(self):
+        session = self.client.session
+        session["employee_id"] = self.employee.pk
+        session.save()
+        with mock.patch.object(routers, "replica_alias", return_value=None):
+            ok = self.client.get("/attendance/chart-data/", {"start": "2020-01-01", "end": "2026-03-16"}).json()
+            bad = self.client.get("/attendance/chart-data/", {"granularity": "year"})
+        self.assertEqual(ok["granularity"], "month")
+        self.assertEqual(ok["days"][-1], 3)
+        self.assertEqual(bad.status_code, 400)
+
+
+# -----------------------------
+# CACHE VERSIONS
+# -----------------------------
+class BumpVersionTests(TestCase):
+    def test_every_bump_is_a_new_version(self):
+        seen = {get_version("things")}
+        for _ in range(200):
+            stamp = bump_version("things")
+            seen.add(stamp)
+        self.assertEqual(len(seen), 201)
+        self.assertEqual(get_version("things"), stamp)
+
+    def test_bump_is_a_single_write(self):
+        # incr() reads then writes outside Redis
+        with mock.patch.object(caching.versions, "incr", side_effect=AssertionError("incr used")), \
+                mock.patch.object(caching.versions, "get", side_effect=AssertionError("read before write")):
+            stamp = bump_version("things")
+        self.assertEqual(get_version("things"), stamp)
+
+    def test_bump_moves_dependent_keys(self):
+        before = versioned_key("report", "things", extra=(1,))
+        bump_version("things")
+        self.assertNotEqual(versioned_key("report", "things", extra=(1,)), before)
+
+
+# -----------------------------
+# EMPLOYEE DASHBOARD SECTIONS
+# -----------------------------
+class DashboardSectionTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.department = Department.objects.create(name="Ops")
+        self.employee = make_employee(department=self.department)
+
+    def sections(self):
+        return dashboard_sections(self.employee, self.today)
+
+    def test_warm_hit_is_one_version_fetch_and_one_cache_read(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.sections()
+        with self.assertNumQueries(2):
+            self.sections()
+        self.assertGreater(len(cold), 2)
+
+    def test_new_announcement_shows_up(self):
+        self.sections()
+        Announcement.objects.create(title="Fire drill", message="-", department=self.department, is_for_all=False)
+        self.assertEqual([a.title for a in self.sections()["announcements"]], ["Fire drill"])
+
+    def test_new_department_meeting_shows_up(self):
+        self.sections()
+        Meeting.objects.create(
+            title="Planning", agenda="-", date=self.today + timedelta(days=1), start_time=time(10),
+            end_time=time(11), mode="Online", department=self.department,
+        )
+        self.assertEqual([m.title for m in self.sections()["upcoming_meetings"]], ["Planning"])
+
+    def test_own_attendance_change_rebuilds_the_chart(self):
+        self.assertEqual(self.sections()["chart"]["labels"], [])
+        Attendance.objects.create(employee=self.employee, date=self.today, status="Absent")
+        self.assertEqual(self.sections()["chart"]["labels"], [self.today.strftime("%d-%b")])
+
+
+# -----------------------------
+# WORKING-DAY BITMAPS
+# -----------------------------
+class WorkdayCalendarTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.sales = Department.objects.create(name="Sales")
+        self.global_days = [date(2023, 12, 25), date(2024, 1, 1), date(2024, 2, 29), date(2024, 12, 25)]
+        self.ops_days = [date(2024, 3, 5), date(2024, 3, 9)]
+        Holiday.objects.bulk_create(
+            [Holiday(name="Company", date=day) for day in self.global_days]
+            + [Holiday(name="Ops offsite", date=day, department=self.ops) for day in self.ops_days]
+        )
+        invalidate_holidays()
+        invalidate_policies()
+
+    def tearDown(self):
+        ShiftPolicy.objects.all().delete()
+        Holiday.objects.all().delete()
+        invalidate_policies()
+        invalidate_holidays()
+
+    def naive(self, start, end, weekdays, holidays):
+        days = (start + timedelta(days=n) for n in range((end - start).days + 1))
+        return sum(1 for day in days if day.weekday() in weekdays and day not in holidays)
+
+    def test_counts_match_a_day_by_day_walk(self):
+        start, end = date(2023, 11, 20), date(2025, 1, 10)
+        for weekdays in (frozenset(range(5)), frozenset({0, 2, 4, 5})):
+            calendar = workday_calendar()
+            for department, holidays in ((None, self.global_days), (self.ops, self.global_days + self.ops_days)):
+                with self.subTest(weekdays=sorted(weekdays), department=department):
+                    self.assertEqual(
+                        calendar.count(start, end, weekdays, department.pk if department else None),
+                        self.naive(start, end, weekdays, set(holidays)),
+                    )
+
+    def test_department_holidays_stay_in_their_department(self):
+        week = (date(2024, 3, 4), date(2024, 3, 10))
+        self.assertEqual(working_days_between(*week, department_id=self.ops.pk), 4)
+        self.assertEqual(working_days_between(*week, department_id=self.sales.pk), 5)
+        self.assertFalse(is_working_day(date(2024, 3, 5), department_id=self.ops.pk))
+        self.assertTrue(is_working_day(date(2024, 3, 5), department_id=self.sales.pk))
+
+    def test_policy_weekdays_are_used(self):
+        ShiftPolicy.objects.create(name="Weekend crew", department=self.sales, working_days="56")
+        self.assertEqual(working_days_between(date(2024, 3, 4), date(2024, 3, 17), department_id=self.sales.pk), 4)
+
+    def test_warm_counts_issue_no_queries(self):
+        working_days_between(date(2023, 1, 1), date(2025, 12, 31))
+        with self.assertNumQueries(0):
+            self.assertEqual(working_days_between(date(2024, 2, 26), date(2024, 3, 3)), 4)
+            self.assertEqual(working_days_between(date(2024, 3, 3), date(2024, 3, 1)), 0)
+
+    def test_working_employees_skip_holidays_and_days_off(self):
+        ana = make_employee("EMP001", department=self.ops)
+        ben = make_employee("EMP002", department=self.sales)
+        self.assertEqual(set(working_employees(date(2024, 3, 5))), {ben})
+        self.assertEqual(set(working_employees(date(2024, 3, 6))), {ana, ben})
+        self.assertEqual(set(working_employees(date(2024, 3, 10))), set())
+        self.assertEqual(set(working_employees(date(2024, 2, 29))), set())
+
+
+# -----------------------------
+# IN-PROCESS POLICY AND HOLIDAY TABLES
+# -----------------------------
+class VersionCheckTests(TestCase):
+    def setUp(self):
+        self.employee = make_employee()
+        invalidate_policies()
+        invalidate_holidays()
+
+    def tearDown(self):
+        # the tables outlive the test's transaction
+        ShiftPolicy.objects.all().delete()
+        Holiday.objects.all().delete()
+        invalidate_policies()
+        invalidate_holidays()
+
+    def lookups(self):
+        return policy_for(self.employee).name, working_days_between(DAY, DAY + timedelta(days=6))
+
+    def change_elsewhere(self):
+        # as another process would: rows plus a version bump, no signals
+        ShiftPolicy.objects.bulk_create([ShiftPolicy(name="Office", working_days="01234")])
+        Holiday.objects.bulk_create([Holiday(name="Founders' Day", date=DAY)])
+        bump_version("shift_policies")
+        bump_version("holidays")
+
+    def test_repeated_lookups_issue_no_queries(self):
+        self.lookups()
+        with self.assertNumQueries(0):
+            for _ in range(20):
+                self.assertEqual(self.lookups(), ("Default", 5))
+
+    def test_change_elsewhere_is_seen_once_the_version_is_checked(self):
+        self.lookups()
+        self.change_elsewhere()
+        self.assertEqual(self.lookups(), ("Default", 5))
+        with override_settings(VERSION_CHECK_SECONDS=0):
+            self.assertEqual(self.lookups(), ("Office", 4))
+
+    def test_local_change_is_seen_at_once(self):
+        self.lookups()
+        ShiftPolicy.objects.create(name="Office", working_days="01234")
+        Holiday.objects.create(name="Founders' Day", date=DAY)
+        self.assertEqual(self.lookups(), ("Office", 4))
+
+
+# -----------------------------
+# LIVE PRESENCE BOARD
+# -----------------------------
+@override_settings(PRESENCE_RECHECK_SECONDS=0)
+class PresenceBoardTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.sales = Department.objects.create(name="Sales")
+        self.employee = make_employee(department=self.ops)
+        self.attendance = Attendance.objects.create(
+            employee=self.employee, date=timezone.localdate(), status="Present", login_time=time(9),
+        )
+        self.board = PresenceBoard()
+
+    def entry(self, department, status_fields=(time(9), None, True, None)):
+        return presence_entry(self.employee.pk, "EMP001", department.pk, *status_fields)
+
+    def test_snapshot_is_seeded_from_the_database(self):
+        seq, entries = self.board.snapshot(self.ops.pk)
+        self.assertEqual([(e["employee_id"], e["status"], e["login_time"]) for e in entries], [("EMP001", "in", "09:00")])
+        self.assertEqual(self.board.snapshot(self.sales.pk), (seq, []))
+
+    def test_changes_are_logged_per_department(self):
+        seq, _ = self.board.snapshot(self.ops.pk)
+        self.board.publish(self.entry(self.ops))
+        [(changed_seq, entry)] = self.board.wait(self.ops.pk, seq, timeout=0)
+        self.assertEqual((changed_seq, entry["status"]), (seq + 1, "break"))
+        self.assertEqual(self.board.wait(self.sales.pk, seq, timeout=0), [])
+        self.assertEqual(self.board.wait(self.ops.pk, changed_seq, timeout=0), [])
+
+    def test_moving_department_reaches_both_boards(self):
+        seq, _ = self.board.snapshot(self.ops.pk)
+        self.board.publish(self.entry(self.sales))
+        self.assertEqual(len(self.board.wait(self.ops.pk, seq, timeout=0)), 1)
+        self.assertEqual(len(self.board.wait(self.sales.pk, seq, timeout=0)), 1)
+        self.assertEqual(self.board.snapshot(self.ops.pk)[1], [])
+
+    @override_settings(PRESENCE_LOG_SIZE=2)
+    def test_sequence_older_than_the_log_asks_for_a_snapshot(self):
+        board = PresenceBoard()
+        seq, _ = board.snapshot(self.ops.pk)
+        for _ in range(3):
+            board.publish(self.entry(self.ops))
+        self.assertIsNone(board.wait(self.ops.pk, seq, timeout=0))
+        self.assertEqual(len(board.wait(self.ops.pk, seq + 1, timeout=0)), 2)
+
+    def test_own_publish_keeps_the_board(self):
+        seq, _ = self.board.snapshot(self.ops.pk)
+        self.board.publish(self.entry(self.ops))
+        self.assertEqual(len(self.board.wait(self.ops.pk, seq, timeout=0)), 1)
+
+    def test_write_elsewhere_reseeds_once_the_stamp_is_checked(self):
+        seq, _ = self.board.snapshot(self.ops.pk)
+        Attendance.objects.filter(pk=self.attendance.pk).update(logout_time=time(17))
+        presence_changed()
+
+        with override_settings(PRESENCE_RECHECK_SECONDS=60):
+            self.assertEqual(self.board.wait(self.ops.pk, seq, timeout=0), [])
+        self.assertIsNone(self.board.wait(self.ops.pk, seq, timeout=0))
+        self.assertEqual(self.board.snapshot(self.ops.pk)[1][0]["status"], "out")
+
+    def test_bulk_writers_bump_the_stamp(self):
+        Attendance.objects.filter(pk=self.attendance.pk).update(date=DAY)
+        for write in (
+            lambda: finalize_attendance(DAY + timedelta(days=1)),
+            lambda: create_daily_absent_records(DAY + timedelta(days=1)),
+        ):
+            before = get_version(PRESENCE_VERSION)
+            with self.subTest(write=write), self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertNotEqual(get_version(PRESENCE_VERSION), before)
+
+    @override_settings(PRESENCE_MAX_STREAMS=2)
+    def test_stream_slots_are_capped_and_given_back_once(self):
+        self.assertTrue(stream_slots.acquire())
+        self.assertTrue(stream_slots.acquire())
+        self.assertFalse(stream_slots.acquire())
+
+        stream = SlotStream(event for event in ["snapshot"])
+        stream.close()
+        stream.close()
+        self.assertTrue(stream_slots.acquire())
+        self.assertFalse(stream_slots.acquire())
+        stream_slots.release()
+        stream_slots.release()
+
+
+# -----------------------------
+# MEETING ROOM CLASHES
+# -----------------------------
+class RoomClashTests(TestCase):
+    def book(self, title, start, end, location="Room A"):
+        return Meeting.objects.create(
+            title=title, agenda="-", date=DAY, start_time=time(*start), end_time=time(*end),
+            mode="Offline", location=location,
+        )
+
+    def double_book(self):
+        if connection.vendor == "postgresql":
+            # rolled back with the test
+            with connection.cursor() as cursor:
+                cursor.execute("ALTER TABLE core_meeting DROP CONSTRAINT meeting_room_no_overlap")
+        first = self.book("Standup", (10,), (11,))
+        second = self.book("Review", (10, 30), (11, 30), location="room a")
+        self.book("Elsewhere", (10,), (11,), location="Room B")
+        return first, second
+
+    def test_form_names_the_meeting_holding_the_room(self):
+        standup = self.book("Standup", (10,), (11,))
+        form = MeetingForm(data={
+            "title": "Review", "agenda": "-", "date": DAY, "start_time": "10:30", "end_time": "11:30",
+            "mode": "Offline", "location": "Room A", "status": "Scheduled",
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn(
+            f'Room A is booked for meeting #{standup.pk} "Standup" on 2026-03-10, 10:00-11:00',
+            form.non_field_errors(),
+        )
+        self.assertIn("Nearest free slot: 11:00-12:00.", form.non_field_errors())
+
+    def test_lost_race_names_the_meeting_that_took_the_room(self):
+        form = MeetingForm(data={
+            "title": "Review", "agenda": "-", "date": DAY, "start_time": "10:30", "end_time": "11:30",
+            "mode": "Offline", "location": "Room A", "status": "Scheduled",
+        })
+        self.assertTrue(form.is_valid())
+        standup = self.book("Standup", (10,), (11,))
+        self.assertEqual(
+            form.room_taken_error(),
+            f'In the meantime, Room A is booked for meeting #{standup.pk} "Standup" on 2026-03-10, 10:00-11:00. '
+            "Please pick another slot.",
+        )
+
+    def test_command_lists_clashes_without_cancelling(self):
+        first, second = self.double_book()
+        out = StringIO()
+        call_command("resolve_room_clashes", stdout=out)
+        self.assertIn(f'meeting {second.pk} "Review"', out.getvalue())
+        self.assertIn(f'clashes with meeting {first.pk} "Standup"', out.getvalue())
+        self.assertFalse(Meeting.objects.filter(status="Cancelled").exists())
+
+    def test_command_cancels_the_later_booking(self):
+        first, second = self.double_book()
+        call_command("resolve_room_clashes", "--cancel-later", stdout=StringIO())
+        self.assertEqual(
+            list(Meeting.objects.filter(status="Cancelled").values_list("pk", flat=True)), [second.pk]
+        )
+
+    def test_migration_refuses_to_constrain_clashing_rooms(self):
+        migration = importlib.import_module("core.migrations.0013_meeting_room_exclusion")
+        first, second = self.double_book()
+        schema_editor = mock.Mock(connection=mock.Mock(vendor="postgresql"))
+        with self.assertRaisesMessage(RuntimeError, "1 offline meeting(s) double-book a room") as caught:
+            migration.add_room_exclusion(django_apps, schema_editor)
+        self.assertIn(f"meeting {second.pk} 'Review'", str(caught.exception))
+        schema_editor.execute.assert_not_called()
+        self.assertFalse(Meeting.objects.filter(status="Cancelled").exists())
+
+
+class FrozenBreakRepairTests(SimpleTestCase):
+    def test_migration_repair_matches_the_live_one(self):
+        from types import SimpleNamespace
+
+        from .breaks import repair_sessions
+
+        frozen = importlib.import_module("core.migrations.0020_breaksession_integrity").repair_sessions
+
+        def sessions():
+            return [
+                SimpleNamespace(start_at=at(8, 50), end_at=at(9, 20), duration=timedelta()),
+                SimpleNamespace(start_at=at(12), end_at=None, duration=timedelta()),
+                SimpleNamespace(start_at=at(12, 10), end_at=at(12), duration=timedelta()),
+                SimpleNamespace(start_at=at(14), end_at=None, duration=timedelta()),
+            ]
+
+        live, migrated = sessions(), sessions()
+        repair_sessions(live, at(9))
+        changed = frozen(migrated, at(9))
+        self.assertEqual(len(changed), 3)
+        self.assertEqual(
+            [(s.start_at, s.end_at, s.duration) for s in migrated],
+            [(s.start_at, s.end_at, s.duration) for s in live],
+        )
+
+
+# -----------------------------
+# ATTENDANCE ADMIN
+# -----------------------------
+class AttendanceAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.today = timezone.localdate()
+        self.ana = make_employee("EMP001")
+        self.ben = make_employee("EMP002")
+        self.recent = Attendance.objects.create(employee=self.ana, date=self.today, status="Present")
+        self.old = Attendance.objects.create(employee=self.ben, date=self.today - timedelta(days=400), status="Absent")
+
+    def listed(self, query=""):
+        with mock.patch.object(routers, "replica_alias", return_value=None):
+            response = self.client.get(f"/admin/core/attendance/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response, {row.pk for row in response.context["cl"].result_list}
+
+    def test_opens_on_the_current_month_without_redirecting(self):
+        _, rows = self.listed()
+        self.assertEqual(rows, {self.recent.pk})
+
+    def test_period_and_date_filters_replace_the_default_month(self):
+        self.assertEqual(self.listed("?period=all")[1], {self.recent.pk, self.old.pk})
+        self.assertEqual(self.listed(f"?date__year={self.old.date.year}&date__month={self.old.date.month}")[1], {self.old.pk})
+
+    def test_employee_filter_uses_the_autocomplete_box(self):
+        response, rows = self.listed(f"?period=all&employee={self.ben.pk}")
+        self.assertEqual(rows, {self.old.pk})
+        self.assertContains(response, 'class="admin-autocomplete"')
+        self.assertContains(response, f'<option value="{self.ben.pk}" selected>EMP002</option>', html=True)
+        self.assertContains(response, '<input type="hidden" name="period" value="all">', html=True)
+        self.assertContains(response, "admin/js/autocomplete.js")
+
+    def test_autocomplete_endpoint_finds_employees(self):
+        response = self.client.get(
+            "/admin/autocomplete/", {"term": "EMP002", "app_label": "core", "model_name": "attendance", "field_name": "employee"},
+        )
+        self.assertEqual(response.json()["results"], [{"id": str(self.ben.pk), "text": "EMP002"}])
+
+    def test_break_sessions_filter_by_the_attendance_employee(self):
+        ana_break = BreakSession.objects.create(attendance=self.recent, start_at=at(12, day=self.today), end_at=None)
+        BreakSession.objects.create(attendance=self.old, start_at=at(12, day=self.old.date), end_at=None)
+        with mock.patch.object(routers, "replica_alias", return_value=None):
+            response = self.client.get(f"/admin/core/breaksession/?employee={self.ana.pk}")
+        self.assertEqual([row.pk for row in response.context["cl"].result_list], [ana_break.pk])
+
+    def test_bad_employee_value_is_rejected(self):
+        with mock.patch.object(routers, "replica_alias", return_value=None):
+            response = self.client.get("/admin/core/attendance/?employee=EMP001")
+        self.assertRedirects(response, "/admin/core/attendance/?e=1", fetch_redirect_response=False)
+
+
+# -----------------------------
+# ATTENDANCE PARTITIONS
+# -----------------------------
+class AttendancePartitionTests(TestCase):
+    def partitions(self):
+        out = StringIO()
+        call_command("attendance_partitions", "list", stdout=out)
+        return out.getvalue().split()
+
+    @skipIf(connection.vendor == "postgresql", "PostgreSQL runs the real conversion")
+    def test_other_databases_are_refused(self):
+        with self.assertRaisesMessage(CommandError, "requires PostgreSQL"):
+            call_command("attendance_partitions", "setup", stdout=StringIO())
+
+    @skipUnless(connection.vendor == "postgresql", "partitioning is PostgreSQL only")
+    def test_setup_keeps_rows_and_break_constraints(self):
+        employee = make_employee()
+        attendance = Attendance.objects.create(employee=employee, date=DAY, status="Present", login_time=time(9))
+        BreakSession.objects.create(attendance=attendance, start_at=at(12), end_at=at(12, 30))
+        with connection.cursor() as cursor:
+            # DDL refuses tables with pending deferred checks
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        call_command("attendance_partitions", "setup", "--ahead", "1", stdout=StringIO())
+
+        partitions = self.partitions()
+        self.assertIn("core_attendance_y2026m03", partitions)
+        self.assertIn("core_breaksession_y2026m03", partitions)
+        self.assertEqual(attendance.break_sessions.get().end_at, at(12, 30))
+        later = Attendance.objects.create(employee=employee, date=DAY + timedelta(days=1), status="Absent")
+        self.assertGreater(later.pk, attendance.pk)
+
+        for write in (
+            lambda: Attendance.objects.create(employee=employee, date=DAY, status="Absent"),
+            lambda: BreakSession.objects.create(attendance=attendance, start_at=at(12, 15), end_at=at(13)),
+            lambda: BreakSession.objects.bulk_create([
+                BreakSession(attendance=attendance, start_at=at(14), end_at=None),
+                BreakSession(attendance=attendance, start_at=at(16), end_at=None),
+            ]),
+        ):
+            with self.subTest(write=write), self.assertRaises(IntegrityError), transaction.atomic():
+                write()
+
+        # the database foreign key is gone; Django still cascades
+        attendance.delete()
+        self.assertFalse(BreakSession.objects.exists())
+
+    @skipUnless(connection.vendor == "postgresql", "partitioning is PostgreSQL only")
+    def test_detach_archives_and_restore_brings_the_month_back(self):
+        attendance = Attendance.objects.create(employee=make_employee(), date=DAY, status="Present", login_time=time(9))
+        BreakSession.objects.create(attendance=attendance, start_at=at(12), end_at=None)
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        call_command("attendance_partitions", "setup", stdout=StringIO())
+        archive_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        today = timezone.localdate()
+        retain = (today.year - DAY.year) * 12 + today.month - DAY.month - 1
+
+        call_command(
+            "attendance_partitions", "detach", "--retain-months", str(retain), "--archive-dir", str(archive_dir),
+            stdout=StringIO(),
+        )
+        self.assertNotIn("core_attendance_y2026m03", self.partitions())
+        self.assertFalse(Attendance.objects.exists())
+
+        for table in ("core_attendance", "core_breaksession"):
+            call_command("attendance_partitions", "restore", str(archive_dir / f"{table}_y2026m03.csv.gz"), stdout=StringIO())
+        self.assertEqual(Attendance.objects.get().pk, attendance.pk)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BreakSession.objects.create(attendance=attendance, start_at=at(15), end_at=None)
+
+
+# -----------------------------
+# SESSION BENCHMARK
+# -----------------------------
+class BenchSessionsTests(TestCase):
+    @override_settings(CACHES={
+        **settings.CACHES, "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    })
+    def test_leaves_other_sessions_and_cache_keys_alone(self):
+        live = SessionStore()
+        live["employee_id"] = 7
+        live.create()
+        caches["sessions"].set("someone.else", "kept")
+
+        out = StringIO()
+        call_command("bench_sessions", "--requests", "3", stdout=out)
+
+        self.assertEqual(caches["sessions"].get("someone.else"), "kept")
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), [live.session_key])
+        for name in settings.SESSION_ENGINES:
+            self.assertIn(name, out.getvalue())
+
+
+# -----------------------------
+# ICS CALENDAR FEEDS
+# -----------------------------
+@override_settings(CALENDAR_FEED_PAST_DAYS=30)
+class MeetingCalendarTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.department = Department.objects.create(name="Ops")
+        self.employee = make_employee(department=self.department)
+        self.old = self.meeting("Retro", self.today - timedelta(days=30))
+        self.url = reverse("meeting_calendar", args=[feed_token(self.employee, "employee", self.employee.pk)])
+
+    def meeting(self, title, day):
+        return Meeting.objects.create(
+            title=title, agenda="-", date=day, start_time=time(10), end_time=time(11),
+            mode="Online", department=self.department,
+        )
+
+    def fetch(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        if response.status_code == 200:
+            response.calendar = b"".join(response.streaming_content).decode()
+        return response
+
+    def test_feed_lists_the_meetings_in_the_window(self):
+        self.meeting("Planning", self.today + timedelta(days=1))
+        self.meeting("Ancient", self.today - timedelta(days=31))
+        response = self.fetch()
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertIn("SUMMARY:Retro", response.calendar)
+        self.assertIn("SUMMARY:Planning", response.calendar)
+        self.assertNotIn("Ancient", response.calendar)
+
+    def test_unchanged_feed_is_not_modified(self):
+        etag = self.fetch()["ETag"]
+        self.assertEqual(self.fetch(if_none_match=etag).status_code, 304)
+
+    def test_new_meeting_changes_the_etag(self):
+        etag = self.fetch()["ETag"]
+        self.meeting("Planning", self.today + timedelta(days=1))
+        response = self.fetch(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("SUMMARY:Planning", response.calendar)
+
+    def test_moving_window_changes_the_etag(self):
+        first = self.fetch()
+        tomorrow = self.today + timedelta(days=1)
+        with mock.patch("django.utils.timezone.localdate", return_value=tomorrow):
+            response = self.fetch(if_none_match=first["ETag"])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("SUMMARY:Retro", response.calendar)
+            self.assertEqual(self.fetch(if_modified_since=first["Last-Modified"]).status_code, 200)
+
+    def test_rotated_key_revokes_the_link(self):
+        self.employee.rotate_calendar_key()
+        self.assertEqual(self.fetch().status_code, 404)
+
+    def test_link_for_another_department_is_refused(self):
+        other = Department.objects.create(name="Sales")
+        url = reverse("meeting_calendar", args=[feed_token(self.employee, "department", other.pk)])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(CALENDAR_FEED_MAX_AGE=-1)
+    def test_expired_link_is_refused(self):
+        self.assertEqual(self.fetch().status_code, 404)
+
+
+# -----------------------------
+# DATABASE CONNECTIONS AND POOL METRICS
+# -----------------------------
+class ConnectionSettingsTests(SimpleTestCase):
+    def load_settings(self, strategy):
+        path = Path(settings.BASE_DIR) / "etams" / "settings.py"
+        with mock.patch.dict(os.environ, {"ETAMS_DB_CONNECTIONS": strategy}):
+            return runpy.run_path(str(path))
+
+    def test_strategy_sets_the_postgresql_connection_options(self):
+        fresh = self.load_settings("fresh")["DATABASES"]["default"]
+        persistent = self.load_settings("persistent")["DATABASES"]["default"]
+        self.assertEqual((fresh["CONN_MAX_AGE"], fresh["CONN_HEALTH_CHECKS"]), (0, False))
+        self.assertEqual((persistent["CONN_MAX_AGE"], persistent["CONN_HEALTH_CHECKS"]), (600, True))
+        self.assertNotIn("pool", persistent.get("OPTIONS", {}))
+
+    def test_unknown_strategy_is_refused(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "is not one of: fresh, persistent, pool."):
+            self.load_settings("bouncer")
+
+    def test_pool_without_psycopg_pool_is_refused(self):
+        with mock.patch.dict(sys.modules, {"psycopg_pool": None}):
+            with self.assertRaisesMessage(ImproperlyConfigured, "needs psycopg_pool"):
+                self.load_settings("pool")
+
+
+class PoolMetricsTests(TestCase):
+    STATS = {
+        "pool_min": 2, "pool_max": 10, "pool_size": 4, "pool_available": 1, "requests_waiting": 2,
+        "requests_num": 120, "requests_queued": 7, "requests_wait_ms": 1500, "connections_num": 5,
+        "connections_lost": 1, "returns_bad": 2,
+    }
+
+    def test_only_pooled_postgresql_databases_are_reported(self):
+        pool = mock.Mock(**{"get_stats.return_value": self.STATS})
+        fake = {
+            "default": mock.Mock(vendor="postgresql", settings_dict={"OPTIONS": {"pool": {"max_size": 10}}}, pool=pool),
+            "replica": mock.Mock(vendor="postgresql", settings_dict={"OPTIONS": {}}),
+            "local": mock.Mock(vendor="sqlite", settings_dict={"OPTIONS": {}}),
+        }
+        with mock.patch.object(metrics, "connections", fake):
+            self.assertEqual(metrics.pool_stats(), {"default": self.STATS})
+
+    @override_settings(DB_CONNECTIONS="pool")
+    def test_pool_stats_are_rendered_per_database(self):
+        with mock.patch.object(metrics, "pool_stats", return_value={"default": self.STATS, "replica": {}}):
+            lines = metrics.render_metrics().splitlines()
+        self.assertIn('etams_db_connections_strategy{strategy="pool"} 1', lines)
+        for line in (
+            'etams_db_pool_in_use{database="default"} 3',
+            'etams_db_pool_waiting{database="default"} 2',
+            'etams_db_pool_wait_seconds_total{database="default"} 1.5',
+            'etams_db_pool_connections_lost_total{database="default"} 3',
+            'etams_db_pool_requests_total{database="replica"} 0',
+            "# TYPE etams_db_pool_requests_total counter",
+        ):
+            self.assertIn(line, lines)
+
+    @override_settings(DB_CONNECTIONS="persistent")
+    def test_without_a_pool_only_the_strategy_is_reported(self):
+        with mock.patch.object(metrics, "pool_stats", return_value={}):
+            text = metrics.render_metrics()
+        self.assertEqual(text.splitlines()[-1], 'etams_db_connections_strategy{strategy="persistent"} 1')
+        self.assertNotIn("etams_db_pool", text)
+
+    def test_endpoint_needs_the_token(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
+        with override_settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.client.get("/metrics/", headers={"Authorization": "Bearer nope"}).status_code, 401)
+            response = self.client.get("/metrics/", headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "etams_db_connections_strategy")
+
+    @skipIf(connection.vendor == "postgresql", "PostgreSQL runs the benchmark")
+    def test_benchmark_needs_postgresql(self):
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("bench_db_connections", stdout=StringIO())
+
+    @skipUnless(connection.vendor == "postgresql", "the benchmark connects to PostgreSQL")
+    def test_benchmark_counts_real_connections(self):
+        out = StringIO()
+        call_command(
+            "bench_db_connections", "--requests", "5", "--strategy", "fresh", "--strategy", "persistent", stdout=out,
+        )
+        connects = {line.split()[0]: int(line.split()[-1]) for line in out.getvalue().splitlines()[1:]}
+        self.assertEqual(connects, {"fresh": 5, "persistent": 1})
+
+
+# -----------------------------
+# READ REPLICA ROUTING
+# -----------------------------
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        patches = [
+            mock.patch.object(routers, "replica_alias", return_value="replica"),
+            mock.patch.object(routers, "health", routers.ReplicaHealth()),
+            mock.patch.object(routers, "replica_lag", return_value=0.0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_reads_stay_on_the_primary_outside_replica_reads(self):
+        self.assertEqual(self.router.db_for_read(Attendance), DEFAULT_DB_ALIAS)
+
+    def test_core_reads_go_to_a_healthy_replica(self):
+        with routers.replica_reads() as block:
+            self.assertEqual(self.router.db_for_read(Attendance), "replica")
+        self.assertTrue(block.used)
+        self.assertEqual(self.router.db_for_write(Attendance), DEFAULT_DB_ALIAS)
+
+    def test_sessions_are_read_from_the_primary(self):
+        with routers.replica_reads() as block:
+            self.assertEqual(self.router.db_for_read(Session), DEFAULT_DB_ALIAS)
+        self.assertFalse(block.used)
+
+    def test_reads_inside_a_transaction_stay_on_the_primary(self):
+        with routers.replica_reads(), mock.patch.object(connection, "in_atomic_block", True):
+            self.assertEqual(self.router.db_for_read(Attendance), DEFAULT_DB_ALIAS)
+
+    def test_no_replica_configured(self):
+        routers.replica_alias.return_value = None
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Attendance), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=5, REPLICA_LAG_CHECK_SECONDS=60)
+    def test_lagging_or_unreachable_replica_is_skipped(self):
+        routers.replica_lag.return_value = 30.0
+        with routers.replica_reads(), self.assertLogs("core.routers", "WARNING"):
+            self.assertEqual(self.router.db_for_read(Attendance), DEFAULT_DB_ALIAS)
+
+        routers.health._checked_at = None
+        routers.replica_lag.side_effect = OperationalError("connection refused")
+        with routers.replica_reads(), self.assertLogs("core.routers", "WARNING"):
+            self.assertEqual(self.router.db_for_read(Attendance), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_LAG_CHECK_SECONDS=60)
+    def test_lag_is_checked_once_per_interval(self):
+        with routers.replica_reads():
+            self.router.db_for_read(Attendance)
+            self.router.db_for_read(Attendance)
+        self.assertEqual(routers.replica_lag.call_count, 1)
+
+    @override_settings(REPLICA_LAG_CHECK_SECONDS=60)
+    def test_failing_replica_falls_back_to_the_primary(self):
+        used = []
+
+        def view():
+            alias = self.router.db_for_read(Attendance)
+            used.append(alias)
+            if alias == "replica":
+                raise OperationalError("server closed the connection unexpectedly")
+            return "rendered"
+
+        with mock.patch.object(routers, "connections", mock.MagicMock()) as connections, \
+                self.assertLogs("core.routers", "WARNING"):
+            connections[DEFAULT_DB_ALIAS].in_atomic_block = False
+            self.assertEqual(routers.with_replica_fallback(view), "rendered")
+            # marked down: the next request does not try the replica again
+            self.assertEqual(routers.with_replica_fallback(view), "rendered")
+        self.assertEqual(used, ["replica", DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+        connections["replica"].close.assert_called_once_with()
+
+    def test_errors_from_the_primary_are_not_retried(self):
+        view = mock.Mock(side_effect=OperationalError("primary down"))
+        with self.assertRaises(OperationalError):
+            routers.with_replica_fallback(view)
+        self.assertEqual(view.call_count, 1)
+
+
+# The settings only define the replica alias when one is configured. The
+# write-path tests need it as a mirror of the test database (TEST MIRROR,
+# as in settings), so that the queries each alias receives can be told
+# apart; it has to exist before the test runner sets the databases up.
+if "replica" not in connections:
+    connections.settings["replica"] = {
+        **connections[DEFAULT_DB_ALIAS].settings_dict,
+        "TEST": {**connections[DEFAULT_DB_ALIAS].settings_dict["TEST"], "MIRROR": DEFAULT_DB_ALIAS},
+    }
+
+
+class ReplicaWritePathTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(routers, "replica_alias", return_value="replica"),
+            mock.patch.object(routers, "health", routers.ReplicaHealth()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.department = Department.objects.create(name="Ops")
+        self.employee = make_employee(department=self.department)
+        make_employee("EMP002", department=self.department)
+
+    def replica_queries(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            with routers.replica_reads():
+                func(*args, **kwargs)
+        return [query["sql"] for query in replica.captured_queries]
+
+    def test_replica_serves_reads(self):
+        self.assertTrue(self.replica_queries(lambda: list(Attendance.objects.all())))
+
+    def test_absent_rows_are_decided_on_the_primary(self):
+        self.assertEqual(self.replica_queries(create_daily_absent_records, DAY), [])
+        self.assertEqual(Attendance.objects.filter(date=DAY, status="Absent").count(), 2)
+        counter = DailyAttendanceCounter.objects.get(date=DAY, department=self.department)
+        self.assertEqual(counter.absent, 2)
+
+    def test_counter_rebuild_counts_on_the_primary(self):
+        Attendance.objects.create(employee=self.employee, date=DAY, status="Present", login_time=time(9))
+        self.assertEqual(self.replica_queries(rebuild_daily_counters, [DAY]), [])
+        self.assertEqual(DailyAttendanceCounter.objects.get(date=DAY, department=self.department).present, 1)
+
+    def test_report_view_reads_the_replica_without_writing(self):
+        session = self.client.session
+        session["employee_id"] = self.employee.pk
+        session.save()
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = self.client.get("/attendance/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica.captured_queries)
+        writes = [q["sql"] for q in primary.captured_queries if "core_attendance" in q["sql"] and "INSERT" in q["sql"]]
+        self.assertEqual(writes, [])
+
+    def test_admin_changelist_leaves_absent_rows_to_the_index(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        response = self.client.get("/admin/core/attendance/", follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Attendance.objects.exists())
+
+        with mock.patch("core.admin.create_daily_absent_records") as create:
+            self.client.get("/admin/")
+        create.assert_called_once_with()
@@ -8,6 +8,7 @@ urlpatterns = [
     path('add-employee/', views.add_employee, name='add_employee'),
     path('my-tasks/', views.assign_task, name='assigned_tasks'),
     path('attendance/', views.attendance_report, name='attendance_report'),
+    path('attendance/chart-data/', views.attendance_chart_data, name='attendance_chart_data'),
     path('task/update/<int:task_id>/', views.update_task_status, name='update_task_status'),
     path('get-roles/', views.get_roles, name='get_roles'),
     path("break/start/", views.start_break, name="start_break"),
@@ -15,6 +16,11 @@ urlpatterns = [
     path("admin-logout/", views.admin_logout, name="admin_logout"),
     path("announcements/", views.announcement_list, name="announcement_list"),
     path("meetings/", views.meeting_list, name="meeting_list"),
+    path("calendar/<str:token>.ics", views.meeting_calendar, name="meeting_calendar"),
+    path("metrics/", views.metrics, name="metrics"),
+
+    # Device punch ingestion
+    path("api/punches/", views.punch_ingest, name="punch_ingest"),
 
 
     # Employee IT reports
@@ -24,10 +30,14 @@ urlpatterns = [
 
     # Management panel
     path("management/dashboard/", views.management_dashboard, name="management_dashboard"),
+    path("management/analytics/", views.attendance_analytics, name="attendance_analytics"),
+    path("management/presence/", views.presence_board, name="presence_board"),
+    path("management/presence/stream/", views.presence_stream, name="presence_stream"),
     path("management/announcements/", views.announcement_list, name="announcement_list"),
     path("management/announcements/add/", views.add_announcement, name="add_announcement"),
     path("management/meetings/", views.meeting_list, name="meeting_list"),
     path("management/meetings/add/", views.add_meeting, name="add_meeting"),
+    path("management/employees/search/", views.employee_search, name="employee_search"),
     path("management/it-reports/", views.management_it_reports, name="management_it_reports"),
     path("management/it-reports/<int:report_id>/update/", views.update_it_report_status, name="update_it_report_status"),
 ]
\ No newline at end of file
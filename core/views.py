@@ -1,13 +1,18 @@
-from django.db import models
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.utils import timezone
-from datetime import datetime, timedelta, date, time
-from django.views.decorators.http import require_POST
-from django.http import JsonResponse, HttpResponse
+from datetime import datetime, timedelta, date, timezone as dt_timezone
+from django.views.decorators.http import require_POST, condition
+from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.urls import reverse
 from django.contrib.auth import logout
-from django.db.models import Q
+from django.db import IntegrityError, connections, transaction
+from django.utils.crypto import constant_time_compare
 import csv
+import json
+from time import monotonic
 
 from .models import (
     Employee, Task, Attendance, Department, Role, BreakSession,
@@ -17,42 +22,37 @@ from .forms import (
     EmployeeForm, TaskForm,
     AnnouncementForm, MeetingForm, ITReportForm
 )
-from .decorators import employee_login_required, manager_required
+from .decorators import employee_login_required, manager_required, device_key_required, reads_from_replica
+from .ingest import parse_punch_batch, ingest_punches
+from .meetings import (
+    visible_meetings, set_participants,
+    employee_meetings_version, department_meetings_version,
+)
+from .ical import feed_token, read_feed_token, feed_meetings, feed_window_start, stream_calendar
+from .caching import get_stamp
+from .policies import default_policy, describe_duration, earliest_start, policy_for
+from .workdays import month_bounds, working_days_for
+from .presence import SlotStream, board, publish_attendance, stream_slots
+from .analytics import WEEKDAYS, analytics_report
+from .charts import GRANULARITIES, cached_chart_series
+from .dashboard import dashboard_sections
+from .metrics import render_metrics
+from .presence_bitmaps import absence_streaks, absent_more_than
+from .attendance import AttendanceConflict, create_daily_absent_records, update_attendance
+from .counters import attendance_flags, company_counters, daily_counters, track_attendance
+from .announcements import (
+    announcement_feed, global_announcement_feed,
+    mark_announcements_read, announcement_read_stats,
+)
 
 
-# -----------------------------
-# AUTO CREATE ABSENT ATTENDANCE
-# -----------------------------
-def create_daily_absent_records():
-    """
-    Create attendance for all active employees for today.
-    Only runs on weekdays (Mon-Fri).
-    Default status = Absent
-    """
-    today = timezone.localdate()
+ATTENDANCE_BUSY = "Your attendance was being updated from another tab. Please try again."
 
-    # Skip Saturday(5) and Sunday(6)
-    if today.weekday() in (5, 6):
-        return
 
-    active_employees = Employee.objects.filter(is_active=True)
-
-    for employee in active_employees:
-        Attendance.objects.get_or_create(
-            employee=employee,
-            date=today,
-            defaults={
-                "status": "Absent",
-                "login_time": None,
-                "logout_time": None,
-                "late_by": timedelta(),
-                "total_hours": timedelta(),
-                "break_time": timedelta(),
-                "net_working_hours": timedelta(),
-                "is_on_break": False,
-                "break_started_at": None,
-            }
-        )
+def _attendance_changed(attendance, employee, before):
+    """Bring the daily counters and the live presence board in line with a saved row."""
+    track_attendance(attendance, employee.department_id, before)
+    publish_attendance(attendance, employee)
 
 
 def admin_logout(request):
@@ -70,13 +70,12 @@ def employee_login(request):
     now = timezone.localtime(timezone.now())
     current_time = now.time()
 
-    is_weekend_off = today.weekday() in (5, 6)  # Sat, Sun
-
-    # Office timing
-    LOGIN_START_TIME = time(10, 0)   # login allowed from 10:00 AM
-    GRACE_TIME = time(10, 10)        # no delay till 10:10 AM
-
-    is_before_login_time = current_time < LOGIN_START_TIME
+    # The page only locks the form while no shift policy allows a login;
+    # a POST re-checks against the employee's own policy
+    policy = default_policy()
+    opening = earliest_start(today)
+    is_weekend_off = opening is None
+    is_before_login_time = opening is not None and current_time < opening.start_time
 
     # AJAX: fetch roles by department
     if request.method == 'GET' and request.GET.get('dept_id'):
@@ -85,14 +84,6 @@ def employee_login(request):
         return JsonResponse(list(roles), safe=False)
 
     if request.method == 'POST':
-        if is_weekend_off:
-            messages.error(request, "Today is off (Saturday/Sunday). Login is disabled.")
-            return redirect('employee_login')
-
-        if is_before_login_time:
-            messages.error(request, "Login starts at 10:00 AM.")
-            return redirect('employee_login')
-
         emp_id = request.POST.get('employee_id', '').strip()
         department_id = request.POST.get('department')
         password = request.POST.get('password', '').strip()
@@ -111,16 +102,23 @@ def employee_login(request):
             messages.error(request, "Invalid password")
             return redirect('employee_login')
 
-        request.session['employee_id'] = employee.id
+        policy = policy_for(employee)
+        if not policy.is_working_day(today):
+            messages.error(request, f"Today ({today.strftime('%A')}) is off. Login is disabled.")
+            return redirect('employee_login')
+
+        if current_time < policy.start_time:
+            messages.error(request, f"Login starts at {policy.start_time.strftime('%I:%M %p')}.")
+            return redirect('employee_login')
 
         login_time = current_time
 
-        # Delay calculation only after 10:10 AM
-        if login_time <= GRACE_TIME:
+        # Delay calculation only after the grace time
+        if login_time <= policy.grace_time:
             late_by = timedelta()
         else:
             dt_login = datetime.combine(today, login_time)
-            dt_grace = datetime.combine(today, GRACE_TIME)
+            dt_grace = datetime.combine(today, policy.grace_time)
             late_by = dt_login - dt_grace
 
         attendance, created = Attendance.objects.get_or_create(
@@ -136,12 +134,24 @@ def employee_login(request):
             }
         )
 
-        if attendance.login_time is None:
+        def record_login(attendance):
+            before = None if created else attendance_flags(attendance)
+            if attendance.login_time is not None:
+                return [], before
             attendance.login_time = login_time
             attendance.status = "Present"
             attendance.late_by = late_by
-            attendance.save(update_fields=["login_time", "status", "late_by"])
+            return ["login_time", "status", "late_by"], before
+
+        try:
+            before = update_attendance(attendance, record_login)
+        except AttendanceConflict:
+            messages.error(request, ATTENDANCE_BUSY)
+            return redirect('employee_login')
 
+        # only a recorded login logs the browser in
+        request.session['employee_id'] = employee.id
+        _attendance_changed(attendance, employee, before)
         messages.success(request, "Login successful.")
         return redirect('employee_dashboard')
 
@@ -151,8 +161,8 @@ def employee_login(request):
         'is_weekend_off': is_weekend_off,
         'today_name': today.strftime("%A"),
         'is_before_login_time': is_before_login_time,
-        'login_start_time': "10:00 AM",
-        'grace_time': "10:10 AM",
+        'login_start_time': (opening or policy).start_time.strftime("%I:%M %p"),
+        'grace_time': policy.grace_time.strftime("%I:%M %p"),
     })
 
 
@@ -201,64 +211,89 @@ def employee_logout(request):
         messages.error(request, "Attendance not found for today.")
         return redirect('employee_dashboard')
 
-    if attendance.is_on_break:
+    # The change functions below may run more than once; break sessions
+    # are only written once the attendance row has been swapped.
+    def end_running_break(attendance):
+        if not attendance.is_on_break:
+            return [], (None, None)
+        before = attendance_flags(attendance)
         bs = attendance.break_sessions.filter(end_at__isnull=True).order_by("-start_at").first()
         if bs:
-            bs.close()
+            bs.close(save=False)
         attendance.is_on_break = False
         attendance.break_started_at = None
-        attendance.save(update_fields=["is_on_break", "break_started_at"])
+        return ["is_on_break", "break_started_at"], (before, bs)
 
-    tz = timezone.get_current_timezone()
-    now = timezone.localtime(timezone.now())
-    logout_time = now.time()
+    min_hours = policy_for(employee).min_hours
 
-    dt_login = timezone.make_aware(datetime.combine(date.today(), attendance.login_time), tz)
-    dt_logout = timezone.make_aware(datetime.combine(date.today(), logout_time), tz)
+    def close_day(attendance):
+        before = attendance_flags(attendance)
+        tz = timezone.get_current_timezone()
+        now = timezone.localtime(timezone.now())
+        logout_time = now.time()
 
-    # total time from login to logout (INCLUDING break time)
-    total_work = dt_logout - dt_login
+        dt_login = timezone.make_aware(datetime.combine(date.today(), attendance.login_time), tz)
+        dt_logout = timezone.make_aware(datetime.combine(date.today(), logout_time), tz)
 
-    total_break = timedelta()
-    for bs in attendance.break_sessions.all():
-        if bs.end_at:
-            total_break += bs.duration
-        else:
-            total_break += (timezone.now() - bs.start_at)
+        # total time from login to logout (INCLUDING break time)
+        total_work = dt_logout - dt_login
 
-    net_work = total_work - total_break
-    if net_work < timedelta():
-        net_work = timedelta()
+        total_break = timedelta()
+        for bs in attendance.break_sessions.all():
+            if bs.end_at:
+                total_break += bs.duration
+            else:
+                total_break += (timezone.now() - bs.start_at)
+
+        net_work = total_work - total_break
+        if net_work < timedelta():
+            net_work = timedelta()
+
+        # check TOTAL time, not net working time
+        if total_work < min_hours:
+            return [], (before, min_hours - total_work)
+
+        attendance.logout_time = logout_time
+        attendance.total_hours = total_work
+        attendance.break_time = total_break
+        attendance.net_working_hours = net_work
+        attendance.status = "Present"
+        attendance.is_on_break = False
+        attendance.break_started_at = None
+        return [
+            "logout_time",
+            "total_hours",
+            "break_time",
+            "net_working_hours",
+            "status",
+            "is_on_break",
+            "break_started_at",
+        ], (before, None)
+
+    try:
+        with transaction.atomic():
+            before, closed = update_attendance(attendance, end_running_break)
+            if closed:
+                closed.save(update_fields=["end_at", "duration"])
+        if before is not None:
+            _attendance_changed(attendance, employee, before)
+        before, remaining = update_attendance(attendance, close_day)
+    except AttendanceConflict:
+        messages.error(request, ATTENDANCE_BUSY)
+        return redirect('employee_dashboard')
 
-    # check TOTAL time, not net working time
-    if total_work < timedelta(hours=8):
-        remaining = timedelta(hours=8) - total_work
+    if remaining is not None:
         rem_sec = int(remaining.total_seconds())
         rh = rem_sec // 3600
         rm = (rem_sec % 3600) // 60
         rs = rem_sec % 60
         messages.error(
             request,
-            f"You can logout after 8 hours total time. Remaining: {rh:02d}:{rm:02d}:{rs:02d}"
+            f"You can logout after {describe_duration(min_hours)} total time. Remaining: {rh:02d}:{rm:02d}:{rs:02d}"
         )
         return redirect('employee_dashboard')
 
-    attendance.logout_time = logout_time
-    attendance.total_hours = total_work
-    attendance.break_time = total_break
-    attendance.net_working_hours = net_work
-    attendance.status = "Present"
-    attendance.is_on_break = False
-    attendance.break_started_at = None
-    attendance.save(update_fields=[
-        "logout_time",
-        "total_hours",
-        "break_time",
-        "net_working_hours",
-        "status",
-        "is_on_break",
-        "break_started_at",
-    ])
+    _attendance_changed(attendance, employee, before)
 
     request.session.flush()
     messages.success(request, "Logout successful. Have a great day!")
@@ -282,8 +317,7 @@ def employee_dashboard(request):
     status = "Present"
     is_on_break = False
 
-    # NEW: break limit config
-    BREAK_LIMIT_SECONDS = 3600
+    policy = policy_for(employee)
     break_limit_reached = False
 
     if attendance and attendance.login_time:
@@ -291,7 +325,7 @@ def employee_dashboard(request):
         now = timezone.localtime(timezone.now())
         dt_login = timezone.make_aware(datetime.combine(date.today(), attendance.login_time), tz)
 
-        office_start = timezone.make_aware(datetime.combine(date.today(), time(10, 10)), tz)
+        office_start = timezone.make_aware(datetime.combine(date.today(), policy.grace_time), tz)
         if dt_login > office_start:
             late_seconds = int((dt_login - office_start).total_seconds())
             h = late_seconds // 3600
@@ -299,93 +333,82 @@ def employee_dashboard(request):
             s = late_seconds % 60
             late_display = f"{h:02d}:{m:02d}:{s:02d}"
 
-        total_break = timedelta()
-        sessions = attendance.break_sessions.all().order_by("start_at")
-        for bs in sessions:
-            if bs.end_at:
-                total_break += bs.duration
-            else:
-                total_break += (timezone.now() - bs.start_at)
-
-        # NEW: if total break >= 1 hour, cap it and stop active break
-        if total_break >= timedelta(hours=1):
-            total_break = timedelta(hours=1)
-            break_limit_reached = True
-
-            if attendance.is_on_break:
-                open_bs = attendance.break_sessions.filter(end_at__isnull=True).order_by("-start_at").first()
-                if open_bs:
-                    used_break = timedelta()
-                    for old_bs in attendance.break_sessions.exclude(id=open_bs.id):
-                        if old_bs.end_at:
-                            used_break += old_bs.duration
-
-                    remaining_break = timedelta(hours=1) - used_break
-                    if remaining_break < timedelta():
-                        remaining_break = timedelta()
-
-                    forced_end = open_bs.start_at + remaining_break
-                    now_dt = timezone.now()
-
-                    if forced_end > now_dt:
-                        forced_end = now_dt
-                    if forced_end < open_bs.start_at:
-                        forced_end = open_bs.start_at
-
-                    open_bs.end_at = forced_end
-                    open_bs.duration = open_bs.end_at - open_bs.start_at
-                    open_bs.save(update_fields=["end_at", "duration"])
-
-                attendance.is_on_break = False
-                attendance.break_started_at = None
-                attendance.save(update_fields=["is_on_break", "break_started_at"])
-
-        break_seconds = int(total_break.total_seconds())
         total_seconds = max(0, int((now - dt_login).total_seconds()))
-        net_seconds = max(0, total_seconds - break_seconds)
 
-        attendance.break_time = total_break
-        attendance.net_working_hours = timedelta(seconds=net_seconds)
-        attendance.total_hours = timedelta(seconds=total_seconds)
-        attendance.status = "Present"
-        attendance.save(update_fields=["break_time", "net_working_hours", "total_hours", "status"])
+        # may run more than once; the capped break is only written once
+        # the attendance row has been swapped
+        def refresh_totals(attendance):
+            before = attendance_flags(attendance)
+            fields = ["break_time", "net_working_hours", "total_hours", "status"]
+            capped = None
+
+            total_break = timedelta()
+            sessions = attendance.break_sessions.all().order_by("start_at")
+            for bs in sessions:
+                if bs.end_at:
+                    total_break += bs.duration
+                else:
+                    total_break += (timezone.now() - bs.start_at)
+
+            # NEW: if total break reaches the cap, cap it and stop active break
+            if total_break >= policy.break_limit:
+                total_break = policy.break_limit
+
+                if attendance.is_on_break:
+                    open_bs = attendance.break_sessions.filter(end_at__isnull=True).order_by("-start_at").first()
+                    if open_bs:
+                        used_break = timedelta()
+                        for old_bs in attendance.break_sessions.exclude(id=open_bs.id):
+                            if old_bs.end_at:
+                                used_break += old_bs.duration
+
+                        remaining_break = policy.break_limit - used_break
+                        if remaining_break < timedelta():
+                            remaining_break = timedelta()
+
+                        forced_end = open_bs.start_at + remaining_break
+                        now_dt = timezone.now()
+
+                        if forced_end > now_dt:
+                            forced_end = now_dt
+                        if forced_end < open_bs.start_at:
+                            forced_end = open_bs.start_at
+
+                        open_bs.end_at = forced_end
+                        open_bs.duration = open_bs.end_at - open_bs.start_at
+                        capped = open_bs
+
+                    attendance.is_on_break = False
+                    attendance.break_started_at = None
+                    fields += ["is_on_break", "break_started_at"]
+
+            net_seconds = max(0, total_seconds - int(total_break.total_seconds()))
+
+            attendance.break_time = total_break
+            attendance.net_working_hours = timedelta(seconds=net_seconds)
+            attendance.total_hours = timedelta(seconds=total_seconds)
+            attendance.status = "Present"
+            return fields, (before, capped)
+
+        try:
+            with transaction.atomic():
+                before, capped = update_attendance(attendance, refresh_totals)
+                if capped:
+                    capped.save(update_fields=["end_at", "duration"])
+            if attendance_flags(attendance) != before:
+                _attendance_changed(attendance, employee, before)
+        except AttendanceConflict:
+            # the page still renders from the stored row; the next refresh
+            # writes the totals
+            pass
 
+        break_seconds = int(attendance.break_time.total_seconds())
+        break_limit_reached = attendance.break_time >= policy.break_limit
         is_on_break = attendance.is_on_break
 
-    last7 = Attendance.objects.filter(employee=employee).order_by("-date")[:7]
-    last7 = list(reversed(last7))
-
-    chart_labels = []
-    chart_total_hours = []
-    chart_break_hours = []
-    chart_late_minutes = []
-
-    for r in last7:
-        chart_labels.append(r.date.strftime("%d-%b"))
-        total_h = (r.total_hours.total_seconds() if r.total_hours else 0) / 3600
-        break_h = (r.break_time.total_seconds() if r.break_time else 0) / 3600
-        late_m = (r.late_by.total_seconds() if r.late_by else 0) / 60
-        chart_total_hours.append(round(total_h, 2))
-        chart_break_hours.append(round(break_h, 2))
-        chart_late_minutes.append(int(late_m))
-
-    today_now = timezone.localdate()
-
-    announcements = Announcement.objects.filter(is_active=True).filter(
-        Q(is_for_all=True) | Q(department=employee.department)
-    ).order_by("-created_at")
-
-    announcements = [
-        a for a in announcements
-        if not a.expiry_date or a.expiry_date >= today_now
-    ][:5]
-
-    upcoming_meetings = Meeting.objects.filter(
-        status="Scheduled",
-        date__gte=today_now
-    ).filter(
-        Q(department=employee.department) | Q(participants=employee)
-    ).distinct().order_by("date", "start_time")[:5]
+    # everything below the live timers comes from the versioned cache
+    sections = dashboard_sections(employee, timezone.localdate())
+    chart = sections["chart"]
 
     return render(request, 'dashboard.html', {
         'employee': employee,
@@ -396,19 +419,21 @@ def employee_dashboard(request):
         'late_display': late_display,
         'status': status,
         'is_on_break': is_on_break,
-        'target_seconds': 8 * 3600,
+        'target_seconds': int(policy.min_hours.total_seconds()),
 
-        'chart_labels': chart_labels,
-        'chart_total_hours': chart_total_hours,
-        'chart_break_hours': chart_break_hours,
-        'chart_late_minutes': chart_late_minutes,
+        'chart_labels': chart["labels"],
+        'chart_total_hours': chart["total_hours"],
+        'chart_break_hours': chart["break_hours"],
+        'chart_late_minutes': chart["late_minutes"],
 
-        'announcements': announcements,
-        'upcoming_meetings': upcoming_meetings,
+        'announcements': sections["announcements"],
+        'upcoming_meetings': sections["upcoming_meetings"],
         'is_manager': employee.is_manager(),
 
         # NEW
-        'break_limit_seconds': BREAK_LIMIT_SECONDS,
+        'break_limit_seconds': int(policy.break_limit.total_seconds()),
+        'target_label': describe_duration(policy.min_hours),
+        'break_limit_label': describe_duration(policy.break_limit),
         'break_limit_reached': break_limit_reached,
     })
 
@@ -425,29 +450,43 @@ def start_break(request):
     if not attendance or not attendance.login_time:
         return JsonResponse({"ok": False, "msg": "Login first."})
 
-    if attendance.is_on_break:
-        return JsonResponse({"ok": False, "msg": "Break already started."})
+    # NEW: total break limit from the shift policy
+    break_limit = policy_for(employee).break_limit
 
-    # NEW: total break limit = 1 hour
-    total_break = timedelta()
-    for bs in attendance.break_sessions.all():
-        if bs.end_at:
-            total_break += bs.duration
-        else:
-            total_break += (timezone.now() - bs.start_at)
+    def begin_break(attendance):
+        if attendance.is_on_break:
+            return [], (None, "Break already started.")
 
-    if total_break >= timedelta(hours=1):
-        attendance.is_on_break = False
-        attendance.break_started_at = None
-        attendance.break_time = timedelta(hours=1)
-        attendance.save(update_fields=["is_on_break", "break_started_at", "break_time"])
-        return JsonResponse({"ok": False, "msg": "Break limit of 1 hour is completed."})
+        before = attendance_flags(attendance)
+        total_break = timedelta()
+        for bs in attendance.break_sessions.all():
+            if bs.end_at:
+                total_break += bs.duration
+            else:
+                total_break += (timezone.now() - bs.start_at)
 
-    now = timezone.now()
-    BreakSession.objects.create(attendance=attendance, start_at=now)
-    attendance.is_on_break = True
-    attendance.break_started_at = now
-    attendance.save(update_fields=["is_on_break", "break_started_at"])
+        if total_break >= break_limit:
+            attendance.is_on_break = False
+            attendance.break_started_at = None
+            attendance.break_time = break_limit
+            return ["is_on_break", "break_started_at", "break_time"], (None, f"Break limit of {describe_duration(break_limit)} is completed.")
+
+        attendance.is_on_break = True
+        attendance.break_started_at = timezone.now()
+        return ["is_on_break", "break_started_at"], (before, None)
+
+    try:
+        with transaction.atomic():
+            before, error = update_attendance(attendance, begin_break)
+            # only the request that flipped is_on_break opens the session
+            if not error:
+                BreakSession.objects.create(attendance=attendance, start_at=attendance.break_started_at)
+    except AttendanceConflict:
+        return JsonResponse({"ok": False, "msg": ATTENDANCE_BUSY})
+    if error:
+        return JsonResponse({"ok": False, "msg": error})
+
+    _attendance_changed(attendance, employee, before)
 
     return JsonResponse({"ok": True})
 
@@ -464,64 +503,83 @@ def end_break(request):
     if not attendance or not attendance.login_time:
         return JsonResponse({"ok": False, "msg": "Login first."})
 
-    # NEW: total break limit = 1 hour
-    total_break = timedelta()
-    for bs in attendance.break_sessions.all():
-        if bs.end_at:
-            total_break += bs.duration
-        else:
-            total_break += (timezone.now() - bs.start_at)
+    # NEW: total break limit from the shift policy
+    break_limit = policy_for(employee).break_limit
+    fields = ["is_on_break", "break_started_at", "break_time"]
 
-    if total_break >= timedelta(hours=1):
-        open_bs = attendance.break_sessions.filter(end_at__isnull=True).order_by("-start_at").first()
-        if open_bs:
-            used_break = timedelta()
-            for old_bs in attendance.break_sessions.exclude(id=open_bs.id):
-                if old_bs.end_at:
-                    used_break += old_bs.duration
+    # may run more than once; the closed session is only written once the
+    # attendance row has been swapped
+    def finish_break(attendance):
+        before = attendance_flags(attendance)
+        total_break = timedelta()
+        for bs in attendance.break_sessions.all():
+            if bs.end_at:
+                total_break += bs.duration
+            else:
+                total_break += (timezone.now() - bs.start_at)
 
-            remaining_break = timedelta(hours=1) - used_break
-            if remaining_break < timedelta():
-                remaining_break = timedelta()
+        if total_break >= break_limit:
+            open_bs = attendance.break_sessions.filter(end_at__isnull=True).order_by("-start_at").first()
+            if open_bs:
+                used_break = timedelta()
+                for old_bs in attendance.break_sessions.exclude(id=open_bs.id):
+                    if old_bs.end_at:
+                        used_break += old_bs.duration
 
-            forced_end = open_bs.start_at + remaining_break
-            now_dt = timezone.now()
+                remaining_break = break_limit - used_break
+                if remaining_break < timedelta():
+                    remaining_break = timedelta()
 
-            if forced_end > now_dt:
-                forced_end = now_dt
-            if forced_end < open_bs.start_at:
-                forced_end = open_bs.start_at
+                forced_end = open_bs.start_at + remaining_break
+                now_dt = timezone.now()
 
-            open_bs.end_at = forced_end
-            open_bs.duration = open_bs.end_at - open_bs.start_at
-            open_bs.save(update_fields=["end_at", "duration"])
+                if forced_end > now_dt:
+                    forced_end = now_dt
+                if forced_end < open_bs.start_at:
+                    forced_end = open_bs.start_at
 
-        attendance.is_on_break = False
-        attendance.break_started_at = None
-        attendance.break_time = timedelta(hours=1)
-        attendance.save(update_fields=["is_on_break", "break_started_at", "break_time"])
-        return JsonResponse({"ok": False, "msg": "Break limit of 1 hour is completed."})
+                open_bs.end_at = forced_end
+                open_bs.duration = open_bs.end_at - open_bs.start_at
 
-    if not attendance.is_on_break:
-        return JsonResponse({"ok": False, "msg": "Break is not running."})
+            attendance.is_on_break = False
+            attendance.break_started_at = None
+            attendance.break_time = break_limit
+            return fields, (before, f"Break limit of {describe_duration(break_limit)} is completed.", open_bs)
 
-    bs = attendance.break_sessions.filter(end_at__isnull=True).order_by("-start_at").first()
-    if bs:
-        bs.close()
+        if not attendance.is_on_break:
+            return [], (None, "Break is not running.", None)
 
-    # NEW: if after closing the break reaches 1 hour, lock break actions
-    total_break = timedelta()
-    for item in attendance.break_sessions.all():
-        if item.end_at:
-            total_break += item.duration
+        bs = attendance.break_sessions.filter(end_at__isnull=True).order_by("-start_at").first()
+        if bs:
+            bs.close(save=False)
 
-    if total_break > timedelta(hours=1):
-        total_break = timedelta(hours=1)
+        # NEW: if after closing the break reaches the cap, lock break actions
+        total_break = timedelta()
+        for item in attendance.break_sessions.all():
+            if bs and item.pk == bs.pk:
+                item = bs
+            if item.end_at:
+                total_break += item.duration
 
-    attendance.is_on_break = False
-    attendance.break_started_at = None
-    attendance.break_time = total_break
-    attendance.save(update_fields=["is_on_break", "break_started_at", "break_time"])
+        if total_break > break_limit:
+            total_break = break_limit
+
+        attendance.is_on_break = False
+        attendance.break_started_at = None
+        attendance.break_time = total_break
+        return fields, (before, None, bs)
+
+    try:
+        with transaction.atomic():
+            before, error, closed = update_attendance(attendance, finish_break)
+            if closed:
+                closed.save(update_fields=["end_at", "duration"])
+    except AttendanceConflict:
+        return JsonResponse({"ok": False, "msg": ATTENDANCE_BUSY})
+    if before is not None:
+        _attendance_changed(attendance, employee, before)
+    if error:
+        return JsonResponse({"ok": False, "msg": error})
 
     return JsonResponse({"ok": True})
 
@@ -529,6 +587,45 @@ def end_break(request):
 
 
 
+# -----------------------------
+# DEVICE PUNCH INGESTION (NDJSON batches)
+# -----------------------------
+@csrf_exempt
+@require_POST
+@device_key_required
+def punch_ingest(request):
+    # read the stream directly: request.body would apply the site-wide
+    # DATA_UPLOAD_MAX_MEMORY_SIZE instead of the batch limit
+    limit = settings.PUNCH_BATCH_MAX_BYTES
+    too_large = JsonResponse({"ok": False, "msg": f"Batch too large (max {limit} bytes)."}, status=413)
+    try:
+        declared = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        declared = 0
+    if declared > limit:
+        return too_large
+    raw = request.read(limit + 1)
+    if len(raw) > limit:
+        return too_large
+
+    try:
+        body = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return JsonResponse({"ok": False, "msg": "Body must be UTF-8 encoded."}, status=400)
+
+    events, rejected = parse_punch_batch(body)
+    if len(events) > settings.PUNCH_BATCH_MAX_EVENTS:
+        return JsonResponse(
+            {"ok": False, "msg": f"Batch too large (max {settings.PUNCH_BATCH_MAX_EVENTS} events)."},
+            status=413,
+        )
+
+    result = ingest_punches(request.punch_device, events)
+    result["rejected"] = sorted(rejected + result["rejected"], key=lambda r: r["line"])
+    result["ok"] = True
+    return JsonResponse(result)
+
+
 # -----------------------------
 # ADD EMPLOYEE
 # -----------------------------
@@ -550,15 +647,16 @@ def add_employee(request):
 # ATTENDANCE REPORT
 # -----------------------------
 @employee_login_required
+@reads_from_replica
 def attendance_report(request):
-    create_daily_absent_records()
-
     employee = Employee.objects.get(id=request.session['employee_id'])
 
     month = request.GET.get("month", "")
     export = request.GET.get("export", "")
 
     qs = employee.attendance.all().order_by("-date")
+    today = timezone.localdate()
+    period_start = period_end = None
 
     if month:
         try:
@@ -566,11 +664,19 @@ def attendance_report(request):
             y = int(y)
             m = int(m)
             qs = qs.filter(date__year=y, date__month=m)
+            period_start, period_end = month_bounds(y, m)
         except:
             pass
 
     records = list(qs.order_by("date"))
 
+    # attendance rate against the working days of the period (up to today)
+    if period_start is None and records:
+        period_start, period_end = records[0].date, today
+    working_days = working_days_for(employee, period_start, min(period_end, today)) if period_start else 0
+    present_days = sum(1 for r in records if r.status == "Present" and r.date <= today)
+    attendance_rate = round(100 * present_days / working_days) if working_days else 0
+
     for r in records:
         r.total_hours_fmt = format_td(r.total_hours)
         r.break_time_fmt = format_td(r.break_time)
@@ -596,23 +702,11 @@ def attendance_report(request):
             ])
         return response
 
-    chart_labels = []
-    chart_total = []
-    chart_break = []
-    chart_net = []
-    chart_late_minutes = []
-
-    for r in records:
-        chart_labels.append(r.date.strftime("%d %b"))
-        total_h = (r.total_hours.total_seconds() if r.total_hours else 0) / 3600
-        break_h = (r.break_time.total_seconds() if r.break_time else 0) / 3600
-        net_h = (r.net_working_hours.total_seconds() if r.net_working_hours else 0) / 3600
-        late_m = int((r.late_by.total_seconds() if r.late_by else 0) / 60)
-
-        chart_total.append(round(total_h, 2))
-        chart_break.append(round(break_h, 2))
-        chart_net.append(round(net_h, 2))
-        chart_late_minutes.append(late_m)
+    # the chart loads its points from attendance_chart_data, which
+    # downsamples long ranges
+    chart_query = ""
+    if period_start:
+        chart_query = f"start={period_start.isoformat()}&end={min(period_end, today).isoformat()}"
 
     months = []
     seen = set()
@@ -628,14 +722,41 @@ def attendance_report(request):
         "records": records,
         "month": month,
         "months": months,
-        "chart_labels": chart_labels,
-        "chart_total": chart_total,
-        "chart_break": chart_break,
-        "chart_net": chart_net,
-        "chart_late_minutes": chart_late_minutes,
+        "working_days": working_days,
+        "present_days": present_days,
+        "attendance_rate": attendance_rate,
+        "chart_query": chart_query,
     })
 
 
+# -----------------------------
+# CHART DATA (JSON)
+# -----------------------------
+@employee_login_required
+@reads_from_replica
+def attendance_chart_data(request):
+    """
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD&granularity=day|week|month, defaulting
+    to the last 30 days by day. Coarser buckets are used when the range
+    would exceed CHART_MAX_POINTS.
+    """
+    today = timezone.localdate()
+    try:
+        end = date.fromisoformat(request.GET["end"]) if request.GET.get("end") else today
+        start = date.fromisoformat(request.GET["start"]) if request.GET.get("start") else end - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({"ok": False, "msg": "Dates must be YYYY-MM-DD."}, status=400)
+    if end < start:
+        return JsonResponse({"ok": False, "msg": "end must not be before start."}, status=400)
+
+    granularity = request.GET.get("granularity") or None
+    if granularity is not None and granularity not in GRANULARITIES:
+        return JsonResponse({"ok": False, "msg": f"granularity must be one of {', '.join(GRANULARITIES)}."}, status=400)
+
+    series = cached_chart_series(request.session['employee_id'], start, end, granularity)
+    return JsonResponse({"ok": True, **series})
+
+
 # -----------------------------
 # AJAX: GET ROLES
 # -----------------------------
@@ -686,17 +807,29 @@ def my_it_reports(request):
 # MANAGEMENT DASHBOARD
 # -----------------------------
 @manager_required
+@reads_from_replica
 def management_dashboard(request):
     employee = Employee.objects.get(id=request.session['employee_id'])
     today = timezone.localdate()
 
     total_employees = Employee.objects.filter(is_active=True).count()
-    present_today = Attendance.objects.filter(date=today, status="Present").count()
-    absent_today = Attendance.objects.filter(date=today, status="Absent").count()
+    counters = company_counters(today)
+    present_today = counters["present"]
+    absent_today = counters["absent"]
     pending_tasks = Task.objects.filter(is_completed=False).count()
     open_it_reports = ITReport.objects.filter(status__in=["Open", "In Progress"]).count()
     upcoming_meetings = Meeting.objects.filter(status="Scheduled", date__gte=today).order_by("date", "start_time")[:5]
-    latest_announcements = Announcement.objects.filter(is_active=True).order_by("-created_at")[:5]
+    latest_announcements = global_announcement_feed(limit=5)
+    read_stats = announcement_read_stats([a.id for a in latest_announcements])
+    announcement_stats = []
+    for a in latest_announcements:
+        read, recipients = read_stats.get(a.id, (0, 0))
+        announcement_stats.append({
+            'announcement': a,
+            'read': read,
+            'recipients': recipients,
+            'read_rate': round(100 * read / recipients) if recipients else 0,
+        })
 
     return render(request, 'management_dashboard.html', {
         'employee': employee,
@@ -707,9 +840,154 @@ def management_dashboard(request):
         'open_it_reports': open_it_reports,
         'upcoming_meetings': upcoming_meetings,
         'latest_announcements': latest_announcements,
+        'announcement_stats': announcement_stats,
+        'absence_alerts': absence_alerts(today),
+        'late_today': counters["late"],
+        'on_break_now': counters["on_break"],
+        'department_counters': sorted(
+            daily_counters(today).values(),
+            key=lambda row: row.department.name if row.department else "",
+        ),
     })
 
 
+def absence_alerts(today, limit=5):
+    """Frequent absentees this month and the longest running absence streaks."""
+    threshold = settings.ABSENCE_ALERT_THRESHOLD
+    frequent = absent_more_than(threshold, today.replace(day=1), today)[:limit]
+    streaks = sorted(absence_streaks(today).items(), key=lambda item: item[1], reverse=True)
+    streaks = [(pk, n) for pk, n in streaks if n > 1][:limit]
+    names = Employee.objects.in_bulk([pk for pk, _ in frequent + streaks])
+    return {
+        'threshold': threshold,
+        'frequent': [(names[pk], n) for pk, n in frequent if pk in names],
+        'streaks': [(names[pk], n) for pk, n in streaks if pk in names],
+    }
+
+
+# -----------------------------
+# ATTENDANCE ANALYTICS
+# -----------------------------
+ANALYTICS_PERIODS = (30, 90, 180, 365)
+
+
+@manager_required
+@reads_from_replica
+def attendance_analytics(request):
+    employee = Employee.objects.get(id=request.session['employee_id'])
+    try:
+        days = int(request.GET.get("days", ANALYTICS_PERIODS[0]))
+    except ValueError:
+        days = ANALYTICS_PERIODS[0]
+    if days not in ANALYTICS_PERIODS:
+        days = ANALYTICS_PERIODS[0]
+
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    report = analytics_report(start, end)
+
+    return render(request, 'analytics.html', {
+        'employee': employee,
+        'days': days,
+        'periods': ANALYTICS_PERIODS,
+        'start': start,
+        'end': end,
+        'weekdays': WEEKDAYS,
+        'report': report,
+    })
+
+
+# -----------------------------
+# LIVE PRESENCE BOARD (Server-Sent Events)
+# -----------------------------
+def _presence_department(request, employee):
+    # managers watch their own department; only superusers may pick another
+    if not request.user.is_superuser:
+        return employee.department_id
+    try:
+        return int(request.GET.get("department") or employee.department_id)
+    except (TypeError, ValueError):
+        return employee.department_id
+
+
+@manager_required
+def presence_board(request):
+    employee = Employee.objects.get(id=request.session['employee_id'])
+    departments = Department.objects.all()
+    if not request.user.is_superuser:
+        departments = departments.filter(pk=employee.department_id)
+    return render(request, 'presence_board.html', {
+        'employee': employee,
+        'departments': departments,
+        'department_id': _presence_department(request, employee),
+    })
+
+
+def _sse(event, data, seq=None):
+    lines = [f"id: {seq}"] if seq is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+@manager_required
+def presence_stream(request):
+    """
+    One long-lived event stream per manager: a snapshot of the department
+    first, then one "presence" event per change. The stream ends after
+    PRESENCE_STREAM_SECONDS and the browser reconnects with Last-Event-ID,
+    which resumes from the change log when it still covers that id.
+
+    At most PRESENCE_MAX_STREAMS streams run per process; beyond that the
+    browser is told to come back later. Streams hold no database
+    connection while they wait.
+    """
+    employee = Employee.objects.get(id=request.session['employee_id'])
+    department_id = _presence_department(request, employee)
+    try:
+        last_seq = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_seq = None
+
+    if not stream_slots.acquire():
+        response = HttpResponse(
+            f"retry: {settings.PRESENCE_BUSY_RETRY_SECONDS * 1000}\n\nevent: busy\ndata: {{}}\n\n",
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        return response
+
+    def events():
+        yield "retry: 3000\n\n"
+        deadline = monotonic() + settings.PRESENCE_STREAM_SECONDS
+        seq = last_seq
+        changes = None if seq is None else board.wait(department_id, seq, timeout=0)
+        while True:
+            if changes is None:
+                seq, entries = board.snapshot(department_id)
+            # checking the shared stamp or reseeding the board may have
+            # used the database
+            connections.close_all()
+            if changes is None:
+                yield _sse("snapshot", entries, seq)
+            elif changes:
+                for seq, entry in changes:
+                    yield _sse("presence", entry, seq)
+            else:
+                yield ": keepalive\n\n"
+
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return
+            changes = board.wait(department_id, seq, timeout=min(remaining, settings.PRESENCE_HEARTBEAT_SECONDS))
+
+    # give the request's connection back before the long wait
+    connections.close_all()
+    response = StreamingHttpResponse(SlotStream(events()), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @manager_required
 def add_announcement(request):
     employee = Employee.objects.get(id=request.session['employee_id'])
@@ -719,6 +997,7 @@ def add_announcement(request):
         if form.is_valid():
             announcement = form.save(commit=False)
             announcement.created_by = employee
+            # receipts and unread counters follow from the save (signals)
             announcement.save()
             messages.success(request, "Announcement created successfully.")
             return redirect('announcement_list')
@@ -741,16 +1020,45 @@ def add_meeting(request):
         if form.is_valid():
             meeting = form.save(commit=False)
             meeting.created_by = employee
-            meeting.save()
-            form.save_m2m()
-            messages.success(request, "Meeting scheduled successfully.")
-            return redirect('meeting_list')
+            try:
+                with transaction.atomic():
+                    meeting.save()
+                    set_participants(meeting, form.participant_ids())
+            except IntegrityError:
+                # room exclusion constraint: someone booked it in the meantime
+                form.add_error(None, form.room_taken_error())
+            else:
+                messages.success(request, "Meeting scheduled successfully.")
+                return redirect('meeting_list')
     else:
         form = MeetingForm()
 
     return render(request, 'add_meeting.html', {'form': form})
 
 
+@manager_required
+def employee_search(request):
+    """Paged employee lookup for the participant picker."""
+    PAGE_SIZE = 20
+    q = request.GET.get('q', '').strip()
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+
+    employees = Employee.objects.filter(is_active=True).order_by('employee_id')
+    if q:
+        employees = employees.filter(employee_id__icontains=q)
+
+    offset = (page - 1) * PAGE_SIZE
+    # one extra row tells us whether there is a next page without a COUNT(*)
+    rows = list(employees.values_list('id', 'employee_id')[offset:offset + PAGE_SIZE + 1])
+    return JsonResponse({
+        'results': [{'id': pk, 'text': code} for pk, code in rows[:PAGE_SIZE]],
+        'has_more': len(rows) > PAGE_SIZE,
+    })
+
+
 # -----------------------------
 # MANAGEMENT: IT REPORTS
 # -----------------------------
@@ -779,10 +1087,9 @@ def update_it_report_status(request, report_id):
 def announcement_list(request):
     employee = Employee.objects.get(id=request.session['employee_id'])
 
-    announcements = Announcement.objects.filter(
-        models.Q(is_for_all=True) | models.Q(department=employee.department),
-        is_active=True
-    ).order_by("-created_at")
+    announcements = announcement_feed(employee.department_id)
+    if employee.unread_announcements:
+        mark_announcements_read(employee, [a.id for a in announcements])
 
     return render(request, "announcement_list.html", {
         "announcements": announcements
@@ -793,11 +1100,90 @@ def announcement_list(request):
 def meeting_list(request):
     employee = Employee.objects.get(id=request.session['employee_id'])
 
-    meetings = Meeting.objects.filter(
-        models.Q(participants=employee) | models.Q(department=employee.department)
-    ).distinct().order_by("date", "start_time")
+    meetings = visible_meetings(employee)
+
+    calendar_url = request.build_absolute_uri(
+        reverse("meeting_calendar", args=[feed_token(employee, "employee", employee.id)])
+    )
+    department_calendar_url = None
+    if employee.department_id:
+        department_calendar_url = request.build_absolute_uri(
+            reverse("meeting_calendar", args=[feed_token(employee, "department", employee.department_id)])
+        )
 
     return render(request, "meeting_list.html", {
-        "meetings": meetings
+        "meetings": meetings,
+        "calendar_url": calendar_url,
+        "department_calendar_url": department_calendar_url,
     })
-    
+
+
+# -----------------------------
+# ICS CALENDAR FEEDS
+# -----------------------------
+def _calendar_feed(request, token):
+    # the conditional-request helpers and the view share one token check
+    if not hasattr(request, "_calendar_feed"):
+        request._calendar_feed = read_feed_token(token)
+    return request._calendar_feed
+
+
+def _calendar_stamp(request, token):
+    feed = _calendar_feed(request, token)
+    if feed is None:
+        return None
+    kind, pk = feed
+    if kind == "employee":
+        return get_stamp(employee_meetings_version(pk))
+    return get_stamp(department_meetings_version(pk))
+
+
+def _calendar_etag(request, token):
+    # old meetings drop out of the feed as the window moves, with no stamp bump
+    stamp = _calendar_stamp(request, token)
+    return f"{stamp}-{feed_window_start():%Y%m%d}" if stamp else None
+
+
+def _calendar_last_modified(request, token):
+    stamp = _calendar_stamp(request, token)
+    if not stamp:
+        return None
+    changed = datetime.fromtimestamp(stamp / 1_000_000, tz=dt_timezone.utc)
+    moved = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+    return max(changed, moved)
+
+
+@condition(etag_func=_calendar_etag, last_modified_func=_calendar_last_modified)
+def meeting_calendar(request, token):
+    feed = _calendar_feed(request, token)
+    if feed is None:
+        raise Http404("Unknown calendar feed.")
+    kind, pk = feed
+
+    if kind == "employee":
+        owner = Employee.objects.filter(pk=pk, is_active=True).values_list("employee_id", flat=True).first()
+    else:
+        owner = Department.objects.filter(pk=pk).values_list("name", flat=True).first()
+    if owner is None:
+        raise Http404("Unknown calendar feed.")
+
+    response = StreamingHttpResponse(
+        stream_calendar(feed_meetings(kind, pk), f"ETAMS meetings - {owner}", request.get_host().split(":")[0]),
+        content_type="text/calendar; charset=utf-8",
+    )
+    response["Content-Disposition"] = 'inline; filename="meetings.ics"'
+    response["Cache-Control"] = "private, max-age=0, must-revalidate"
+    return response
+
+
+# -----------------------------
+# METRICS (Prometheus)
+# -----------------------------
+def metrics(request):
+    """Per-process database pool metrics for the scraper holding METRICS_TOKEN."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404("Metrics are disabled.")
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse("Invalid metrics token.", status=401, content_type="text/plain")
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
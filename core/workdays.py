@@ -0,0 +1,160 @@
+import threading
+import time as monotonic_clock
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from .caching import bump_version, get_version
+from .models import Employee, Holiday
+from .policies import policy_groups, policy_table
+
+
+VERSION_NAME = "holidays"
+
+
+# -----------------------------
+# YEAR BITMAPS
+# -----------------------------
+# A year is an int with bit n set when day n of the year (Jan 1 = bit 0)
+# is a working day. Working days in a range are then one AND plus a
+# popcount, whatever the length of the range.
+
+def year_length(year):
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def day_bit(day):
+    return day.timetuple().tm_yday - 1
+
+
+def span_mask(lo, hi):
+    """Bits lo..hi inclusive."""
+    return ((1 << (hi + 1)) - 1) ^ ((1 << lo) - 1)
+
+
+class WorkdayCalendar:
+    """
+    Per-year holiday sets and working-day bitmaps, built on first use and
+    dropped when a holiday changes (the "holidays" cache version moves).
+    The version is looked up at most every VERSION_CHECK_SECONDS. Bitmaps
+    are keyed by the policy's working weekdays, so a policy change simply
+    produces a new key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._version = None
+        self._holidays = {}
+        self._weekday_masks = {}
+        self._bitmaps = {}
+
+    def _check_version(self, force=False):
+        now = monotonic_clock.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < settings.VERSION_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        version = get_version(VERSION_NAME)
+        if force or version != self._version:
+            with self._lock:
+                self._holidays, self._bitmaps = {}, {}
+                self._version = version
+
+    def holidays(self, year):
+        """{department_id or None: bitmask of holiday days} for the year."""
+        if year not in self._holidays:
+            masks = defaultdict(int)
+            for department_id, day in Holiday.objects.filter(date__year=year).values_list("department_id", "date"):
+                masks[department_id] |= 1 << day_bit(day)
+            self._holidays[year] = dict(masks)
+        return self._holidays[year]
+
+    def _weekday_mask(self, year, weekdays):
+        key = (year, weekdays)
+        if key not in self._weekday_masks:
+            first = date(year, 1, 1).weekday()
+            mask = 0
+            for n in range(year_length(year)):
+                if (first + n) % 7 in weekdays:
+                    mask |= 1 << n
+            self._weekday_masks[key] = mask
+        return self._weekday_masks[key]
+
+    def bitmap(self, year, weekdays, department_id=None):
+        key = (year, weekdays, department_id)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            holidays = self.holidays(year)
+            off = holidays.get(None, 0) | (holidays.get(department_id, 0) if department_id else 0)
+            bitmap = self._weekday_mask(year, weekdays) & ~off
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+    def count(self, start, end, weekdays, department_id=None):
+        if end < start:
+            return 0
+        total = 0
+        for year in range(start.year, end.year + 1):
+            lo = day_bit(start) if year == start.year else 0
+            hi = day_bit(end) if year == end.year else year_length(year) - 1
+            total += (self.bitmap(year, weekdays, department_id) & span_mask(lo, hi)).bit_count()
+        return total
+
+    def refresh(self, force=False):
+        self._check_version(force)
+        return self
+
+
+_calendar = WorkdayCalendar()
+
+
+def workday_calendar():
+    return _calendar.refresh()
+
+
+def invalidate_holidays():
+    bump_version(VERSION_NAME)
+    _calendar.refresh(force=True)
+
+
+# -----------------------------
+# QUERIES
+# -----------------------------
+def working_days_between(start, end, department_id=None, role_id=None):
+    """Working days from start to end inclusive for a department/role."""
+    policy = policy_table().lookup(department_id, role_id)
+    return workday_calendar().count(start, end, policy.working_days, department_id)
+
+
+def working_days_for(employee, start, end):
+    return working_days_between(start, end, employee.department_id, employee.role_id)
+
+
+def is_working_day(day, department_id=None, role_id=None):
+    return working_days_between(day, day, department_id, role_id) == 1
+
+
+def working_employees(day):
+    """Active employees for whom `day` is a working day and not a holiday."""
+    holidays = workday_calendar().holidays(day.year)
+    bit = 1 << day_bit(day)
+    if holidays.get(None, 0) & bit:
+        return Employee.objects.none()
+
+    # Q() matches everyone, so the groups are collected rather than OR-ed
+    # onto an empty Q
+    groups = [condition for policy, condition in policy_groups(prefix="") if policy.is_working_day(day)]
+    if not groups:
+        return Employee.objects.none()
+    working = groups[0]
+    for condition in groups[1:]:
+        working |= condition
+    off_departments = [pk for pk, mask in holidays.items() if pk is not None and mask & bit]
+    return Employee.objects.filter(working, is_active=True).exclude(department_id__in=off_departments)
+
+
+def month_bounds(year, month):
+    first = date(year, month, 1)
+    last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return first, last
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.routers.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'etams.urls'
@@ -211,3 +215,230 @@ JAZZMIN_UI_TWEAKS = {
 }
 USE_TZ = True
 TIME_ZONE = "Asia/Kolkata"
+
+
+# Attendance partitioning (PostgreSQL only, see `manage.py attendance_partitions`).
+# `setup` converts the tables once: primary keys become (id, month column),
+# the database foreign key from BreakSession to Attendance is dropped (Django
+# still cascades deletes) and the BreakSession constraints of migration 0020
+# are kept per monthly partition.
+ATTENDANCE_PARTITION_AHEAD_MONTHS = 3
+ATTENDANCE_RETENTION_MONTHS = 24
+ATTENDANCE_ARCHIVE_DIR = BASE_DIR / "archive"
+
+# Nightly finalizer (`manage.py finalize_attendance`): logout time written
+# for employees who never logged out.
+ATTENDANCE_AUTO_LOGOUT_TIME = "19:00"
+
+# Device punch ingestion (`POST /api/punches/`)
+PUNCH_BATCH_MAX_EVENTS = 10000
+# read by the punch view itself; the site-wide upload limit stays at 2.5 MB
+PUNCH_BATCH_MAX_BYTES = 5 * 1024 * 1024
+
+# Cache (versioned feeds). Invalidation works by bumping version keys, often
+# from management commands running in another process, so every cache here
+# must be shared by all processes; the system check refuses locmem outside
+# DEBUG. ETAMS_CACHE_URL (redis://...) uses Redis, which also makes version
+# bumps atomic; otherwise the database holds the cache (run `manage.py
+# createcachetable` once). Version keys live in their own "versions" cache,
+# which is never culled.
+CACHE_URL = os.environ.get('ETAMS_CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'etams',
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'etams-versions',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'etams_cache',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'etams_cache_versions',
+            # one row per employee / department / feed; culling one would
+            # bring stale entries back, so the table is never culled
+            'OPTIONS': {'MAX_ENTRIES': 2 ** 31 - 1},
+        },
+    }
+CACHES['sessions'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': BASE_DIR / '.cache' / 'sessions',
+} if not CACHE_URL else {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': CACHE_URL,
+    'KEY_PREFIX': 'etams-sessions',
+}
+
+# Sessions. ETAMS_SESSION_BACKEND picks the strategy:
+#   db             - django_session table on every request (default)
+#   cached_db      - read through the "sessions" cache, write-through to the DB
+#   signed_cookies - no server storage; the cookie only carries employee_id
+# cached_db needs a cache that every worker process shares: a logout only
+# clears the cache it runs against, so a per-process cache would keep the
+# session alive in the other workers. The "sessions" cache therefore lives
+# in Redis, or on local disk (shared by the workers of one host), and the system check
+# refuses cached_db on a locmem cache. `manage.py bench_sessions` compares
+# the backends.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = os.environ.get('ETAMS_SESSION_BACKEND', 'db')
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"ETAMS_SESSION_BACKEND={SESSION_BACKEND!r} is not one of: {', '.join(SESSION_ENGINES)}."
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_COOKIE_HTTPONLY = True
+
+ANNOUNCEMENT_FEED_TIMEOUT = 60 * 60
+
+# Meeting scheduling window used when suggesting a free slot
+MEETING_DAY_START = "09:00"
+MEETING_DAY_END = "20:00"
+
+# Meetings older than this many days are left out of the .ics feeds
+CALENDAR_FEED_PAST_DAYS = 30
+# .ics feed links stop working after this many seconds; the meetings page
+# always shows fresh ones
+CALENDAR_FEED_MAX_AGE = 365 * 24 * 60 * 60
+
+# Shift policies are held in process memory; each process reloads them when
+# a policy changes (via the cache version) or at the latest after this
+# many seconds, which covers caches not shared between processes.
+SHIFT_POLICY_TTL = 60
+# Shift policies and holiday calendars look up their cache version at most
+# this often; a change made in another process shows up within this time.
+VERSION_CHECK_SECONDS = 5
+
+# Live presence board (Server-Sent Events). Streams close after
+# PRESENCE_STREAM_SECONDS and the browser reconnects; a comment line is
+# sent every PRESENCE_HEARTBEAT_SECONDS so proxies keep the connection.
+PRESENCE_STREAM_SECONDS = 300
+PRESENCE_HEARTBEAT_SECONDS = 15
+PRESENCE_LOG_SIZE = 5000
+# each process checks the shared presence stamp at most this often, and
+# reseeds its board from the database after PRESENCE_RESEED_SECONDS anyway
+PRESENCE_RECHECK_SECONDS = 5
+PRESENCE_RESEED_SECONDS = 300
+# streams served at once per process; further boards retry after
+# PRESENCE_BUSY_RETRY_SECONDS
+PRESENCE_MAX_STREAMS = 4
+PRESENCE_BUSY_RETRY_SECONDS = 30
+
+# Attendance analytics: reports are cached per period for this long, and
+# the chronic-late ranking ignores employees with fewer attended days.
+ANALYTICS_CACHE_TIMEOUT = 10 * 60
+ANALYTICS_MIN_DAYS = 5
+
+# Management dashboard lists employees absent more days than this in the
+# current month
+ABSENCE_ALERT_THRESHOLD = 3
+
+# Attendance chart data: longer ranges switch to week/month buckets to stay
+# under CHART_MAX_POINTS; ranges that ended before yesterday cache longer
+CHART_MAX_POINTS = 120
+CHART_CACHE_TIMEOUT = 300
+CHART_HISTORY_CACHE_TIMEOUT = 6 * 60 * 60
+
+# Attendance writes from the employee views compare-and-swap on
+# Attendance.version and re-read / retry this many times before giving up
+ATTENDANCE_WRITE_ATTEMPTS = 3
+
+# validate_break_sessions scans this many days before today by default
+BREAK_VALIDATION_DAYS = 7
+
+# Chart, announcements and meetings on the employee dashboard are cached
+# per employee and invalidated by version bumps; this only bounds how long
+# today's running totals in the chart may lag behind the live timers
+DASHBOARD_SECTION_TIMEOUT = 5 * 60
+
+# Read replica for reports, exports, analytics and the big admin
+# changelists. ETAMS_REPLICA_HOST points a 'replica' connection at a
+# streaming standby of the default database; for local testing,
+# ETAMS_REPLICA_NAME alone uses another database on the same server (e.g.
+# CREATE DATABASE employee_db_replica TEMPLATE employee_db) and
+# ETAMS_REPLICA_SQLITE a copy of a SQLite file. Without either, everything
+# reads from 'default'.
+REPLICA_DB_ALIAS = 'replica'
+if os.environ.get('ETAMS_REPLICA_SQLITE'):
+    DATABASES[REPLICA_DB_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['ETAMS_REPLICA_SQLITE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+elif os.environ.get('ETAMS_REPLICA_HOST') or os.environ.get('ETAMS_REPLICA_NAME'):
+    DATABASES[REPLICA_DB_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('ETAMS_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('ETAMS_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('ETAMS_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# a lagging or unreachable replica is skipped until the next check
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_LAG_CHECK_SECONDS = 10
+# browsers that wrote something read from the primary for this long
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'etams_primary'
+
+# Database connections. ETAMS_DB_CONNECTIONS picks the strategy:
+#   fresh      - connect on every request (Django default)
+#   persistent - keep one connection per worker thread for CONN_MAX_AGE
+#   pool       - psycopg connection pool per process (needs psycopg[pool]);
+#                sized by DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE
+# Persistent and pooled connections are health-checked before reuse or on
+# checkout. Pool usage is exported on /metrics/ and `manage.py
+# bench_db_connections` compares the strategies against the database.
+DB_CONNECTIONS = os.environ.get('ETAMS_DB_CONNECTIONS', 'fresh')
+DB_PERSISTENT_MAX_AGE = 600
+DB_POOL_MIN_SIZE = int(os.environ.get('ETAMS_DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.environ.get('ETAMS_DB_POOL_MAX_SIZE', 10))
+# seconds a request waits for a free pooled connection before failing
+DB_POOL_TIMEOUT = 10
+
+DB_CONNECTION_PROFILES = {
+    'fresh': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': DB_PERSISTENT_MAX_AGE, 'CONN_HEALTH_CHECKS': True},
+    'pool': {
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pool': {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }},
+    },
+}
+if DB_CONNECTIONS not in DB_CONNECTION_PROFILES:
+    raise ImproperlyConfigured(
+        f"ETAMS_DB_CONNECTIONS={DB_CONNECTIONS!r} is not one of: {', '.join(DB_CONNECTION_PROFILES)}."
+    )
+if DB_CONNECTIONS == 'pool':
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError as exc:
+        raise ImproperlyConfigured(
+            "ETAMS_DB_CONNECTIONS=pool needs psycopg_pool; install psycopg[pool] from requirements.txt."
+        ) from exc
+for _database in DATABASES.values():
+    if _database['ENGINE'] == 'django.db.backends.postgresql':
+        _database.update(DB_CONNECTION_PROFILES[DB_CONNECTIONS])
+
+# /metrics/ (Prometheus text format) answers only requests carrying
+# "Authorization: Bearer <METRICS_TOKEN>"; unset disables the endpoint
+METRICS_TOKEN = os.environ.get('ETAMS_METRICS_TOKEN', '')